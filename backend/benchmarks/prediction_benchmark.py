@@ -0,0 +1,221 @@
+"""Latency, throughput and peak memory of the price prediction hot path.
+
+Run from the backend directory, no database or network needed:
+
+    python -m benchmarks.prediction_benchmark --batch-sizes 1 10 100 1000 10000 --output prediction.json
+
+A model is trained on synthetic quotes into a temporary directory (or --model
+points at an existing one) and scored through AIService.predict_price,
+predict_prices and predict_frame, and through POST /api/quotes/predict-price
+and /api/quotes/predict-price/batch via an in-process ASGI client. The quotes
+router is mounted on a bare app so the rate limiter and database startup stay
+out of the numbers. Run it once per --model-format and --engine to compare
+them across releases.
+
+Peak RSS is the process high-water mark after each scenario, so it only ever
+grows; compare the first scenario that reaches a batch size across runs.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+import httpx
+from fastapi import FastAPI
+from benchmarks.training_benchmark import synthetic_quotes
+from quote_ai.api.routers import quotes
+from quote_ai.services.ai_service import AIService
+from quote_ai.services.model_training import ModelTrainingService, ESTIMATORS
+from quote_ai.utils.config import Settings
+
+SCENARIOS = ('predict_price', 'predict_prices', 'predict_frame', 'endpoint', 'endpoint_batch')
+MODEL_FORMATS = ('artifact', 'joblib')
+ENGINES = ('sklearn', 'compiled')
+COMPLEXITY_NAMES = {1: 'low', 2: 'medium', 3: 'high'}
+# Every measurement is repeated at least this often, however large the batch
+MIN_REPEATS = 5
+
+def spec_records(n_rows: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Request payloads shaped like ProductSpecificationBase"""
+    df = synthetic_quotes(n_rows, seed=seed).drop(columns='price')
+    df['machining_complexity'] = df['machining_complexity'].map(COMPLEXITY_NAMES)
+    df['description'] = 'Benchmark profile'
+    df['profile_type'] = 'custom'
+    return df.to_dict(orient='records')
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def summarize(latencies: List[float], batch_size: int, wall_time: float) -> Dict[str, Any]:
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'repeats': len(latencies),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'rows_per_s': round(batch_size * len(latencies) / wall_time, 1),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def time_calls(call: Callable[[], Any], repeats: int) -> Tuple[List[float], float]:
+    call()  # warm up lazy imports and caches outside the measurement
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - begin)
+    return latencies, time.perf_counter() - start
+
+async def time_requests(client: httpx.AsyncClient, path: str, payloads: List[Any],
+                        concurrency: int) -> Tuple[List[float], float]:
+    latencies = []
+
+    async def post(payload):
+        begin = time.perf_counter()
+        response = await client.post(path, json=payload)
+        response.raise_for_status()
+        await response.aread()
+        latencies.append(time.perf_counter() - begin)
+
+    await post(payloads[0])
+    latencies.clear()
+    start = time.perf_counter()
+    # Waves of concurrent requests, which is what the micro-batcher coalesces
+    for offset in range(0, len(payloads), concurrency):
+        await asyncio.gather(*(post(payload) for payload in payloads[offset:offset + concurrency]))
+    return latencies, time.perf_counter() - start
+
+def build_service(args, model_dir: str) -> AIService:
+    model_path = args.model
+    if model_path is None:
+        model_path = os.path.join(model_dir, 'price_predictor')
+        if args.model_format == 'joblib':
+            model_path += '.joblib'
+        trainer = ModelTrainingService(Settings(model_path=model_path))
+        trainer.train_model(synthetic_quotes(args.training_rows), search='halving_grid', estimator=args.estimator)
+    settings = Settings(
+        model_path=model_path,
+        environment='test',
+        inference_engine=args.engine,
+        prediction_cache_size=args.cache_size,
+        prediction_batch_window_ms=args.batch_window_ms
+    )
+    return AIService(settings)
+
+async def run_endpoints(service: AIService, records: List[Dict[str, Any]], batch_sizes: List[int],
+                        scenarios: List[str], repeats_for: Callable[[int], int],
+                        concurrency: int) -> List[Dict[str, Any]]:
+    app = FastAPI()
+    app.include_router(quotes.router, prefix="/api")
+    quotes._ai_service = service
+    results = []
+    # No lifespan, the service above is already loaded and warm
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        if 'endpoint' in scenarios:
+            payloads = [records[i % len(records)] for i in range(repeats_for(1))]
+            latencies, wall_time = await time_requests(client, "/api/quotes/predict-price", payloads, concurrency)
+            results.append({'scenario': 'endpoint', 'batch_size': 1, 'concurrency': concurrency,
+                            **summarize(latencies, 1, wall_time)})
+        if 'endpoint_batch' in scenarios:
+            for size in batch_sizes:
+                payloads = [records[:size]] * repeats_for(size)
+                latencies, wall_time = await time_requests(client, "/api/quotes/predict-price/batch", payloads, 1)
+                results.append({'scenario': 'endpoint_batch', 'batch_size': size,
+                                **summarize(latencies, size, wall_time)})
+    return results
+
+def run(args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as model_dir:
+        service = build_service(args, model_dir)
+        snapshot = service.model_registry.current()
+        records = spec_records(max(args.batch_sizes + [args.iterations]))
+        frame = pd.DataFrame.from_records(records)
+
+        def repeats_for(size: int) -> int:
+            return max(MIN_REPEATS, args.iterations // size)
+
+        results = []
+        if 'predict_price' in args.scenarios:
+            rows = iter(records * (repeats_for(1) // len(records) + 2))
+            latencies, wall_time = time_calls(lambda: service.predict_price(next(rows)), repeats_for(1))
+            results.append({'scenario': 'predict_price', 'batch_size': 1, **summarize(latencies, 1, wall_time)})
+        for size in args.batch_sizes:
+            if 'predict_prices' in args.scenarios:
+                batch = records[:size]
+                latencies, wall_time = time_calls(lambda: service.predict_prices(batch), repeats_for(size))
+                results.append({'scenario': 'predict_prices', 'batch_size': size,
+                                **summarize(latencies, size, wall_time)})
+            if 'predict_frame' in args.scenarios:
+                specs = frame.iloc[:size]
+                latencies, wall_time = time_calls(lambda: service.predict_frame(specs), repeats_for(size))
+                results.append({'scenario': 'predict_frame', 'batch_size': size,
+                                **summarize(latencies, size, wall_time)})
+        results.extend(asyncio.run(run_endpoints(
+            service, records, args.batch_sizes, args.scenarios, repeats_for, args.concurrency
+        )))
+        for entry in results:
+            print(json.dumps(entry), file=sys.stderr)
+
+        return {
+            'benchmark': 'prediction',
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'model': {
+                'format': 'artifact' if snapshot.source and os.path.isdir(snapshot.source) else 'joblib',
+                # What actually serves, the compiled engine falls back to sklearn when verification fails
+                'engine': 'compiled' if snapshot.compiled is not None else 'sklearn',
+                'model_type': type(snapshot.model).__name__,
+                'version': snapshot.version,
+                'intervals': snapshot.intervals is not None
+            },
+            'settings': {
+                'inference_engine': args.engine,
+                'prediction_cache_size': args.cache_size,
+                'prediction_batch_window_ms': args.batch_window_ms
+            },
+            'results': results
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10_000])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=2000,
+                        help=f"rows scored per scenario and batch size, at least {MIN_REPEATS} calls each")
+    parser.add_argument('--model', help="benchmark this model path instead of training one")
+    parser.add_argument('--model-format', choices=MODEL_FORMATS, default='artifact')
+    parser.add_argument('--engine', choices=ENGINES, default='sklearn')
+    parser.add_argument('--estimator', choices=ESTIMATORS, default='gradient_boosting')
+    parser.add_argument('--training-rows', type=int, default=2000)
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help="prediction cache entries, off by default so every call scores")
+    parser.add_argument('--batch-window-ms', type=float, default=Settings().prediction_batch_window_ms)
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent single-row endpoint requests")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    warnings.simplefilter('ignore')
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
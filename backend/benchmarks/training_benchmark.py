@@ -0,0 +1,105 @@
+"""Wall time and holdout RMSE of each training strategy on synthetic quote data.
+
+Run from the backend directory:
+
+    python -m benchmarks.training_benchmark --sizes 10000 100000 1000000 --output training.json
+
+Every run goes through ModelTrainingService.train_model, so the timings include
+the interval companions and writing the model artifact, like a real retrain.
+Exact GradientBoostingRegressor fits scale badly with rows, so its strategies
+are skipped above --gbr-max-rows unless that is raised.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+from quote_ai.services.feature_encoder import known_categories
+from quote_ai.services.model_training import ModelTrainingService, SEARCH_STRATEGIES, ESTIMATORS
+from quote_ai.utils.config import Settings
+
+RATE_PER_KG = {'6060': 5.5, '6063': 5.8, '6082': 6.5}
+TREATMENT_FACTOR = {'raw': 1.0, 'anodized': 1.15, 'painted': 1.2}
+
+def synthetic_quotes(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Quotes priced by weight, alloy, treatment and complexity with multiplicative noise"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'weight_per_meter': rng.uniform(0.5, 8.0, n_rows),
+        'total_length': rng.uniform(10.0, 2000.0, n_rows),
+        'machining_complexity': rng.integers(1, 4, n_rows),
+        'surface_treatment': rng.choice(known_categories('surface_treatment'), n_rows),
+        'alloy': rng.choice(known_categories('alloy'), n_rows)
+    })
+    rate = df['alloy'].map(RATE_PER_KG).fillna(6.0)
+    treatment = df['surface_treatment'].map(TREATMENT_FACTOR).fillna(1.0)
+    complexity = 1.0 + 0.12 * (df['machining_complexity'] - 1) ** 1.5
+    setup_cost = 250.0 * df['machining_complexity']
+    df['price'] = (df['weight_per_meter'] * df['total_length'] * rate * treatment * complexity + setup_cost) \
+        * rng.lognormal(0.0, 0.08, n_rows)
+    return df
+
+def run_strategy(df: pd.DataFrame, search: str, estimator: str, model_dir: str) -> Dict[str, Any]:
+    settings = Settings(model_path=os.path.join(model_dir, f"{estimator}-{search}"))
+    service = ModelTrainingService(settings)
+    start = time.perf_counter()
+    metrics = service.train_model(df, search=search, estimator=estimator)
+    wall_time = time.perf_counter() - start
+    return {
+        'wall_time_s': round(wall_time, 3),
+        'rmse': float(np.sqrt(metrics['mse'])),
+        'r2': float(metrics['r2']),
+        'interval_coverage': float(metrics['interval_coverage']),
+        'best_params': {name: (value.item() if isinstance(value, np.generic) else value)
+                        for name, value in metrics['best_params'].items()}
+    }
+
+def run(sizes: List[int], searches: List[str], estimators: List[str], gbr_max_rows: int) -> Dict[str, Any]:
+    results = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        for n_rows in sizes:
+            df = synthetic_quotes(n_rows)
+            for estimator in estimators:
+                for search in searches:
+                    entry = {'rows': n_rows, 'estimator': estimator, 'search': search}
+                    if estimator == 'gradient_boosting' and gbr_max_rows and n_rows > gbr_max_rows:
+                        entry['skipped'] = f"more than --gbr-max-rows={gbr_max_rows} rows"
+                    else:
+                        entry.update(run_strategy(df, search, estimator, model_dir))
+                    print(json.dumps(entry), file=sys.stderr)
+                    results.append(entry)
+    return {
+        'benchmark': 'training',
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--searches', nargs='+', choices=SEARCH_STRATEGIES, default=list(SEARCH_STRATEGIES))
+    parser.add_argument('--estimators', nargs='+', choices=ESTIMATORS, default=list(ESTIMATORS))
+    parser.add_argument('--gbr-max-rows', type=int, default=100_000,
+                        help="skip GradientBoostingRegressor above this many rows, 0 never skips")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    warnings.simplefilter('ignore')
+    report = run(args.sizes, args.searches, args.estimators, args.gbr_max_rows)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from quote_ai.db.database import engine, Base
-from .routers import customers, quotes
+from .routers import customers, quotes, models, llm
 from .middleware import RateLimitMiddleware
+from quote_ai.services.training_jobs import get_training_job_manager
+from quote_ai.services.llm_http import get_llm_clients
+from quote_ai.services.llm_cache import get_llm_cache
 from sqlalchemy.exc import OperationalError
 from sqlalchemy import text
 import logging
@@ -58,6 +62,8 @@ app.add_middleware(
 # Include routers
 app.include_router(customers.router, prefix="/api")
 app.include_router(quotes.router, prefix="/api")
+app.include_router(models.router, prefix="/api")
+app.include_router(llm.router, prefix="/api")
 
 @app.on_event("startup")
 async def startup_event():
@@ -73,10 +79,46 @@ async def startup_event():
         logger.error(f"❌ Failed to create database tables: {str(e)}")
         raise
 
+    # Load and warm up the price model once so requests never pay for deserialization.
+    # Without an artifact this starts background training and serves fallback prices.
+    ai_service = quotes.get_ai_service()
+    ai_service.warmup()
+    if ai_service.model_registry.ready:
+        logger.info("✅ Price prediction model loaded")
+    else:
+        logger.warning("⚠️ No trained price model yet, serving fallback prices while training")
+
+    # Keep-alive connection pools shared by every LLM call
+    await get_llm_clients().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the training worker processes and close the LLM connection pools with the API"""
+    get_training_job_manager().shutdown()
+    await get_llm_clients().close()
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        llm_cache.close()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Quote AI System API"}
 
+@app.get("/health")
+async def health():
+    """Liveness plus price model readiness; 503 until any pricer can serve"""
+    status = quotes.get_ai_service().model_status()
+    body = {
+        "status": "ok" if status["ready"] else "degraded",
+        "model_ready": status["ready"],
+        "fallback_pricing": status["fallback"],
+        "training_in_progress": status["training_in_progress"],
+        "model_version": status["version"]
+    }
+    if not status["loaded"]:
+        return JSONResponse(status_code=503, content=dict(body, status="unavailable"))
+    return body
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
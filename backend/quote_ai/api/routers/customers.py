@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from quote_ai.core import schemas, models
 from quote_ai.db.database import get_db
+from quote_ai.services.customer_features import get_customer_feature_store
 
 router = APIRouter(
     prefix="/customers",
@@ -65,6 +66,11 @@ def delete_customer(
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    # The foreign key cascades, but SQLite only enforces it when asked to
+    db.query(models.CustomerPricingFeatures)\
+        .filter(models.CustomerPricingFeatures.customer_id == customer_id)\
+        .delete()
     db.delete(db_customer)
     db.commit()
+    get_customer_feature_store().refresh(db, [customer_id])
     return {"message": "Customer deleted successfully"} 
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from quote_ai.services.llm_http import get_llm_clients
+from quote_ai.services.llm_cache import get_llm_cache
+from quote_ai.services.llm_gateway import get_llm_gateway
+
+router = APIRouter(
+    prefix="/llm",
+    tags=["llm"]
+)
+
+@router.get("/stats", response_model=Dict[str, Any])
+def get_llm_stats():
+    """Report request counts, connection pool usage, response cache hit rate and admission control of the LLM providers"""
+    cache = get_llm_cache()
+    return {
+        **get_llm_clients().stats(),
+        "cache": {"enabled": True, **cache.stats()} if cache is not None else {"enabled": False},
+        "gateway": get_llm_gateway().stats()
+    }
+
+@router.delete("/cache", response_model=Dict[str, Any])
+def clear_llm_cache():
+    """Drop every cached LLM response"""
+    cache = get_llm_cache()
+    return {"removed": cache.clear() if cache is not None else 0}
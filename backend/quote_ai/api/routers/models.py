@@ -0,0 +1,57 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+from quote_ai.api.routers.quotes import get_ai_service
+from quote_ai.core.schemas import ShadowModelRequest, TrainingJobRequest
+from quote_ai.services.training_jobs import get_training_job_manager
+
+router = APIRouter(
+    prefix="/models",
+    tags=["models"]
+)
+
+@router.get("/status", response_model=Dict[str, Any])
+def get_model_status():
+    """Report the live price model version and prediction cache counters"""
+    ai_service = get_ai_service()
+    return ai_service.model_status()
+
+@router.post("/train", response_model=Dict[str, Any], status_code=202)
+def train_model(request: TrainingJobRequest):
+    """Queue a retraining job, it runs in a separate process and publishes the model when done"""
+    job = get_training_job_manager().submit(request.model_dump(exclude_none=True))
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+def get_training_job(job_id: str):
+    """Report a training job's progress, metrics and log tail"""
+    job = get_training_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job.to_dict()
+
+@router.get("/drift", response_model=Dict[str, Any])
+def get_input_drift():
+    """PSI and KS scores of recent prediction inputs against the live model's training data"""
+    return get_ai_service().model_registry.drift_monitor.report()
+
+@router.get("/shadow", response_model=Dict[str, Any])
+def get_shadow_status():
+    """Report the shadow model and how its prices differ from the live model's"""
+    return get_ai_service().model_registry.shadow_status()
+
+@router.put("/shadow", response_model=Dict[str, Any])
+def load_shadow_model(request: ShadowModelRequest):
+    """Shadow a saved model artifact version against live traffic"""
+    registry = get_ai_service().model_registry
+    try:
+        registry.load_shadow_version(request.version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return registry.shadow_status()
+
+@router.delete("/shadow", response_model=Dict[str, Any])
+def unload_shadow_model():
+    """Stop shadow scoring"""
+    registry = get_ai_service().model_registry
+    registry.clear_shadow()
+    return registry.shadow_status()
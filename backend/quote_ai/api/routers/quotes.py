@@ -1,17 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Body
-from fastapi.responses import Response, JSONResponse, FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Body, Query
+from fastapi.responses import Response, JSONResponse, FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Tuple, get_args
 from quote_ai.core import schemas, models
-from quote_ai.db.database import get_db
+from quote_ai.db.database import get_db, SessionLocal
 from quote_ai.services.ai_service import AIService
 from quote_ai.services.pdf_service import PDFService
 from quote_ai.services.file_service import FileService
+from quote_ai.services.model_registry import get_model_registry
+from quote_ai.services.customer_features import QuoteContribution, get_customer_feature_store
+from quote_ai.services.quote_index import (
+    get_quote_index, index_snapshot, quote_document, quote_metadata, remove_from_index
+)
 from quote_ai.utils.config import get_settings
 import os
+import io
+import json
 import uuid
 import logging
-from datetime import datetime
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
 from pydantic import BaseModel
 
 # Define request body model for file processing
@@ -29,10 +39,19 @@ router = APIRouter(
     tags=["quotes"]
 )
 
+# Process-wide AI service, shared so the model and API clients are built once
+_ai_service = None
+
 def get_ai_service():
-    # Call get_settings() to get the actual Settings instance
-    actual_settings = get_settings()
-    return AIService(settings=actual_settings)
+    global _ai_service
+    if _ai_service is None:
+        # Call get_settings() to get the actual Settings instance
+        actual_settings = get_settings()
+        _ai_service = AIService(
+            settings=actual_settings,
+            model_registry=get_model_registry(actual_settings)
+        )
+    return _ai_service
 
 def get_pdf_service():
     return PDFService()
@@ -44,9 +63,15 @@ def get_file_service():
     # Assuming default "uploads" is fine for now
     return FileService()
 
+def _index_snapshot(db_quote: models.Quote) -> Tuple[int, str, Dict[str, Any]]:
+    """What the similarity index needs from a quote, read while its session is open"""
+    document = quote_document(db_quote.product_specs, db_quote.communication_contexts)
+    return db_quote.id, document, quote_metadata(db_quote)
+
 @router.post("/", response_model=schemas.Quote)
 def create_quote(
     quote: schemas.QuoteCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     # Create product specification
@@ -70,9 +95,16 @@ def create_quote(
     # Set relationships
     db_product_spec.quote_id = db_quote.id
     db_comm_context.quote_id = db_quote.id
-    
+
+    # Customer aggregates move in the same transaction as the quote
+    feature_store = get_customer_feature_store()
+    customer_ids = feature_store.apply(db, None, QuoteContribution.of(db_quote, [db_product_spec]))
+
     db.commit()
+    feature_store.refresh(db, customer_ids)
     db.refresh(db_quote)
+    # Embedded after the response, creating a quote does not wait for it
+    background_tasks.add_task(index_snapshot, *_index_snapshot(db_quote))
     return db_quote
 
 @router.get("/", response_model=List[schemas.Quote])
@@ -129,6 +161,7 @@ def read_quote(
 def update_quote(
     quote_id: str,
     quote: schemas.QuoteUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     try:
@@ -139,17 +172,24 @@ def update_quote(
     if db_quote is None:
         raise HTTPException(status_code=404, detail="Quote not found")
     
+    before = QuoteContribution.of(db_quote)
     update_data = quote.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_quote, key, value)
-    
+
+    feature_store = get_customer_feature_store()
+    customer_ids = feature_store.apply(db, before, QuoteContribution.of(db_quote))
     db.commit()
+    feature_store.refresh(db, customer_ids)
     db.refresh(db_quote)
+    # Search hits report the price and status, keep them current
+    background_tasks.add_task(index_snapshot, *_index_snapshot(db_quote))
     return db_quote
 
 @router.delete("/{quote_id}")
 def delete_quote(
     quote_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     try:
@@ -160,18 +200,127 @@ def delete_quote(
     if db_quote is None:
         raise HTTPException(status_code=404, detail="Quote not found")
     
+    feature_store = get_customer_feature_store()
+    customer_ids = feature_store.apply(db, QuoteContribution.of(db_quote), None)
     db.delete(db_quote)
     db.commit()
+    feature_store.refresh(db, customer_ids)
+    background_tasks.add_task(remove_from_index, quote_id_int)
     return {"message": "Quote deleted successfully"}
 
+@router.post("/similar", response_model=List[schemas.SimilarQuote])
+def find_similar_quotes(request: schemas.SimilarQuoteRequest):
+    """The k past quotes closest to a description or quote request, with their prices"""
+    text = "\n".join(part for part in (
+        request.text,
+        quote_document(
+            [request.product_specs] if request.product_specs else [],
+            [request.communication_context] if request.communication_context else []
+        )
+    ) if part)
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Provide text, product_specs or communication_context to search by")
+    return get_quote_index().search(text, request.k)
+
+@router.get("/similar/stats", response_model=Dict[str, Any])
+def get_similar_quotes_stats():
+    """Size and search latency of the quote similarity index"""
+    return get_quote_index().stats()
+
+@router.post("/similar/rebuild", response_model=Dict[str, Any])
+def rebuild_similar_quotes_index(db: Session = Depends(get_db)):
+    """Index every stored quote, for databases that predate the index"""
+    return {"indexed": get_quote_index().rebuild(db)}
+
+@router.get("/{quote_id}/similar", response_model=List[schemas.SimilarQuote])
+def find_quotes_similar_to(quote_id: str, k: int = Query(5, ge=1, le=50), db: Session = Depends(get_db)):
+    """The k past quotes closest to a stored quote, excluding itself"""
+    try:
+        quote_id_int = int(quote_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid quote ID format")
+    db_quote = db.query(models.Quote).filter(models.Quote.id == quote_id_int).first()
+    if db_quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    _, document, _ = _index_snapshot(db_quote)
+    return get_quote_index().search(document, k, exclude_quote_id=quote_id_int)
+
 @router.post("/predict-price", response_model=schemas.PricePrediction)
-def predict_price(
-    specs: schemas.ProductSpecificationBase
+async def predict_price(
+    specs: schemas.PricePredictionRequest
 ):
     ai_service = get_ai_service()
-    prediction = ai_service.predict_price(specs.model_dump())
+    # Goes through the micro-batcher so bursts share one model call off the event loop
+    prediction = await ai_service.predict_price_async(specs.model_dump())
     return prediction
 
+# Rows serialized per chunk when streaming batch predictions back
+BATCH_STREAM_CHUNK_SIZE = 1000
+
+def _stream_predictions(predictions: Dict[str, np.ndarray]) -> Iterator[str]:
+    """Yield batch predictions as NDJSON lines, in input order"""
+    total = len(predictions['predicted_price'])
+    for start in range(0, total, BATCH_STREAM_CHUNK_SIZE):
+        stop = min(start + BATCH_STREAM_CHUNK_SIZE, total)
+        yield "".join(
+            json.dumps({"index": index, **AIService.prediction_row(predictions, index)}) + "\n"
+            for index in range(start, stop)
+        )
+
+def _read_spec_upload(file: UploadFile) -> pd.DataFrame:
+    """Parse and validate a CSV or NDJSON upload of product specifications"""
+    _, ext = os.path.splitext((file.filename or "").lower())
+    content = file.file.read()
+    try:
+        if ext == '.csv' or file.content_type == 'text/csv':
+            specs = pd.read_csv(io.BytesIO(content), dtype={'alloy': str})
+        elif ext in ('.ndjson', '.jsonl') or file.content_type == 'application/x-ndjson':
+            specs = pd.read_json(io.BytesIO(content), lines=True, dtype={'alloy': str})
+        else:
+            raise HTTPException(status_code=400, detail="Upload must be a .csv or .ndjson file")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse upload: {str(e)}")
+
+    spec_fields = schemas.ProductSpecificationBase.model_fields
+    required = ['alloy', 'weight_per_meter', 'total_length', 'surface_treatment', 'machining_complexity']
+    missing = [column for column in required if column not in specs.columns]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing columns: {', '.join(missing)}")
+
+    # Validate the whole frame at once instead of building a model per row
+    invalid = np.zeros(len(specs), dtype=bool)
+    for column in ('alloy', 'surface_treatment', 'machining_complexity'):
+        allowed = get_args(spec_fields[column].annotation)
+        invalid |= ~specs[column].astype(str).isin(allowed).to_numpy()
+    for column in ('weight_per_meter', 'total_length'):
+        specs[column] = pd.to_numeric(specs[column], errors='coerce')
+        invalid |= specs[column].isna().to_numpy()
+    if invalid.any():
+        rows = np.flatnonzero(invalid)[:10].tolist()
+        raise HTTPException(status_code=422, detail=f"Invalid specification rows: {rows}")
+    return specs
+
+@router.post("/predict-price/batch")
+def predict_price_batch(
+    specs: List[schemas.PricePredictionRequest]
+):
+    """Score many specifications in one pass, streamed back as NDJSON in input order"""
+    ai_service = get_ai_service()
+    predictions = ai_service.predict_frame(
+        pd.DataFrame.from_records([spec.model_dump() for spec in specs])
+    )
+    return StreamingResponse(_stream_predictions(predictions), media_type="application/x-ndjson")
+
+@router.post("/predict-price/batch/upload")
+def predict_price_batch_upload(file: UploadFile = File(...)):
+    """Score a CSV or NDJSON file of specifications, streamed back as NDJSON"""
+    specs = _read_spec_upload(file)
+    ai_service = get_ai_service()
+    predictions = ai_service.predict_frame(specs)
+    return StreamingResponse(_stream_predictions(predictions), media_type="application/x-ndjson")
+
 @router.get("/{quote_id}/pdf")
 def generate_quote_pdf(quote_id: str, db: Session = Depends(get_db)):
     try:
@@ -212,7 +361,8 @@ def generate_quote_pdf(quote_id: str, db: Session = Depends(get_db)):
             "weight_per_meter": spec.weight_per_meter,
             "total_length": spec.total_length,
             "surface_treatment": spec.surface_treatment,
-            "machining_complexity": spec.machining_complexity
+            "machining_complexity": spec.machining_complexity,
+            "customer_id": db_quote.customer_id
         }
 
     # Get communication context (handle as list)
@@ -265,14 +415,15 @@ def generate_quote_pdf(quote_id: str, db: Session = Depends(get_db)):
 @router.post("/generate", response_model=schemas.QuoteGenerationResponse)
 async def generate_quote(
     quote_data: schemas.QuoteGenerationRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    bypass_cache: bool = False
 ):
     ai_service = get_ai_service()
     pdf_service = get_pdf_service()
     
     try:
         # Generate quote text
-        quote_text = await ai_service.generate_quote_text(quote_data.dict())
+        quote_text = await ai_service.generate_quote_text(quote_data.dict(), bypass_cache=bypass_cache)
         
         # Generate PDF in background
         background_tasks.add_task(
@@ -289,6 +440,92 @@ async def generate_quote(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _save_generated_quote(db: Session, request: schemas.QuoteGenerationRequest,
+                          quote_data: dict, quote_text: str) -> models.Quote:
+    """Store a generated quote as a draft, with the prices it was generated for"""
+    db_quote = models.Quote(
+        title=f"Quote: {request.product_specs.description}",
+        reference_number=f"GEN-{uuid.uuid4().hex[:12].upper()}",
+        validity_date=datetime.utcnow() + timedelta(days=30),
+        customer_id=request.customer_id,
+        predicted_price=quote_data.get('predicted_price'),
+        final_price=quote_data.get('final_price'),
+        quote_text=quote_text
+    )
+    db_quote.product_specs = [models.ProductSpecification(**request.product_specs.model_dump())]
+    db_quote.communication_contexts = [
+        models.CommunicationContext(**request.communication_context.model_dump())
+    ]
+    db.add(db_quote)
+    db.flush()
+    feature_store = get_customer_feature_store()
+    customer_ids = feature_store.apply(db, None, QuoteContribution.of(db_quote))
+    db.commit()
+    feature_store.refresh(db, customer_ids)
+    return db_quote
+
+@router.post("/generate/stream")
+async def generate_quote_stream(
+    request: schemas.QuoteGenerationRequest,
+    bypass_cache: bool = False
+):
+    """Stream the quote text as server-sent events while the model writes it.
+
+    `token` events carry text pieces in order; once the completion finished the
+    quote is saved as a draft and a `done` event carries its id and full text.
+    Failures after the first token arrive as an `error` event. The quote is
+    saved with a session of its own, request-scoped ones are closed by the
+    time the body streams.
+    """
+    ai_service = get_ai_service()
+    quote_data = request.model_dump()
+    pieces = ai_service.stream_quote_text(quote_data, bypass_cache=bypass_cache)
+    # Wait for the first piece so pricing and provider errors still get a proper status code
+    try:
+        first = await pieces.__anext__()
+    except StopAsyncIteration:
+        first = ""
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events() -> AsyncIterator[str]:
+        text = [first]
+        db = SessionLocal()
+        try:
+            if first:
+                yield _sse("token", {"text": first})
+            async for piece in pieces:
+                text.append(piece)
+                yield _sse("token", {"text": piece})
+            quote_text = "".join(text)
+            db_quote = await run_in_threadpool(_save_generated_quote, db, request, quote_data, quote_text)
+            yield _sse("done", {
+                "quote_id": db_quote.id,
+                "reference_number": db_quote.reference_number,
+                "predicted_price": quote_data.get('predicted_price'),
+                "final_price": quote_data.get('final_price'),
+                "quote_text": quote_text
+            })
+            # Indexed once the client has its quote
+            await run_in_threadpool(lambda: index_snapshot(*_index_snapshot(db_quote)))
+        except Exception as e:
+            logging.error(f"Error streaming quote generation: {str(e)}")
+            yield _sse("error", {"detail": getattr(e, 'detail', str(e))})
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/files/upload", response_model=dict)
 async def upload_file(file: UploadFile = File(...), file_service: FileService = Depends(get_file_service)):
     # Keep the simple upload endpoint, maybe modify later if needed
@@ -385,7 +622,8 @@ def delete_file(filename: str):
 async def process_quote_file(
     file_path: str = Body(...),
     product_specs: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    bypass_cache: bool = False
 ):
     try:
         # Get AI service for context extraction
@@ -399,7 +637,7 @@ async def process_quote_file(
             raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
         
         # Extract context using both PDF text and product specifications
-        context = await ai_service.extract_context(text, product_specs)
+        context = await ai_service.extract_context(text, product_specs, bypass_cache=bypass_cache)
         
         return {
             "file_path": file_path,
@@ -407,4 +645,55 @@ async def process_quote_file(
         }
     except Exception as e:
         logging.error(f"Error processing quote file: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+
+@router.post("/process-file/stream")
+async def process_quote_file_stream(
+    file_path: str = Body(...),
+    product_specs: dict = Body(...),
+    bypass_cache: bool = False
+):
+    """Stream the context extracted from a file as server-sent events.
+
+    A `field` event carries each context field as soon as the model finished
+    writing it, so a form can be prefilled while extraction runs; a `done`
+    event then carries the whole context. Failures after the first field
+    arrive as an `error` event.
+    """
+    ai_service = get_ai_service()
+    # PDF parsing is blocking, keep it off the event loop
+    text = await run_in_threadpool(get_pdf_service().extract_text, file_path)
+    if not text:
+        raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
+
+    fields = ai_service.stream_extract_context(text, product_specs, bypass_cache=bypass_cache)
+    # Wait for the first field so provider errors still get a proper status code
+    try:
+        first = await fields.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events() -> AsyncIterator[str]:
+        context = {}
+        try:
+            if first is not None:
+                context[first[0]] = first[1]
+                yield _sse("field", {"name": first[0], "value": first[1]})
+            async for name, value in fields:
+                context[name] = value
+                yield _sse("field", {"name": name, "value": value})
+            yield _sse("done", {"file_path": file_path, "extracted_context": context})
+        except Exception as e:
+            logging.error(f"Error streaming context extraction: {str(e)}")
+            yield _sse("error", {"detail": getattr(e, 'detail', str(e))})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -37,6 +37,8 @@ class Quote(Base):
     predicted_price = Column(Float, nullable=True)
     final_price = Column(Float, nullable=True)
     status = Column(String, default="draft")
+    # Text produced by quote generation, saved once the completion finished
+    quote_text = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -49,6 +51,19 @@ class Quote(Base):
         self.created_at = get_current_time()
         self.updated_at = self.created_at
 
+class CustomerPricingFeatures(Base):
+    """Running per-customer aggregates, adjusted on every quote write so reads never aggregate"""
+    __tablename__ = "customer_pricing_features"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    quote_count = Column(Integer, nullable=False, default=0)
+    # Quotes with a price and a known weight, and the sum of their price per kg
+    priced_quote_count = Column(Integer, nullable=False, default=0)
+    price_per_kg_sum = Column(Float, nullable=False, default=0.0)
+    accepted_quote_count = Column(Integer, nullable=False, default=0)
+    last_quote_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=get_current_time, onupdate=get_current_time)
+
 class ProductSpecification(Base):
     __tablename__ = "product_specifications"
 
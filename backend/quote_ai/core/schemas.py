@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, ConfigDict, Field
-from typing import Optional, List, Literal
+from pydantic import BaseModel, EmailStr, ConfigDict, Field, field_validator
+from typing import Any, Optional, List, Literal
+import json
 from datetime import datetime
 
 class CustomerBase(BaseModel):
@@ -39,6 +40,10 @@ class ProductSpecificationBase(BaseModel):
 class ProductSpecificationCreate(ProductSpecificationBase):
     pass
 
+class PricePredictionRequest(ProductSpecificationBase):
+    # Lets models trained with customer features price for a known customer
+    customer_id: Optional[int] = None
+
 class ProductSpecification(ProductSpecificationBase):
     id: int
     quote_id: int
@@ -52,6 +57,35 @@ class CommunicationContextBase(BaseModel):
     custom_requests: Optional[str] = None
     past_agreements: Optional[str] = None
 
+class ExtractedContext(BaseModel):
+    """Context extracted from a document by the LLM, normalized from whatever JSON it answered with"""
+    context_text: str = ""
+    extracted_urgency: Literal['low', 'medium', 'high'] = 'medium'
+    custom_requests: str = ""
+    past_agreements: str = ""
+
+    @field_validator('context_text', 'custom_requests', 'past_agreements', mode='before')
+    @classmethod
+    def _as_text(cls, value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return "\n".join(item if isinstance(item, str) else json.dumps(item) for item in value)
+        if isinstance(value, dict):
+            return json.dumps(value)
+        return str(value)
+
+    @field_validator('extracted_urgency', mode='before')
+    @classmethod
+    def _normalize_urgency(cls, value: Any) -> str:
+        urgency = str(value or "").strip().lower()
+        return urgency if urgency in ('low', 'medium', 'high') else 'medium'
+
+    @classmethod
+    def validate_field(cls, name: str, value: Any) -> Any:
+        """Validate one field on its own, as it arrives from a stream"""
+        return getattr(cls.model_validate({name: value}), name)
+
 class CommunicationContextCreate(CommunicationContextBase):
     pass
 
@@ -85,6 +119,7 @@ class QuoteUpdate(BaseModel):
 
 class Quote(QuoteBase):
     id: int
+    quote_text: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     product_specs: List[ProductSpecification] = []
@@ -97,6 +132,18 @@ class Quote(QuoteBase):
 class PricePrediction(BaseModel):
     predicted_price: float
     confidence: float
+    lower_bound: Optional[float] = None
+    upper_bound: Optional[float] = None
+
+class TrainingJobRequest(BaseModel):
+    search: Optional[Literal['grid', 'halving_grid', 'halving_random']] = None
+    estimator: Optional[Literal['gradient_boosting', 'hist_gradient_boosting']] = None
+    export_training_data: bool = False
+    # Incremental modes retrain on quotes finalized since the last run instead of searching again
+    mode: Literal['full', 'warm_start', 'window'] = 'full'
+
+class ShadowModelRequest(BaseModel):
+    version: str
 
 class QuoteGenerationRequest(BaseModel):
     customer_id: int
@@ -108,6 +155,23 @@ class QuoteGenerationResponse(BaseModel):
     message: str
     quote_text: str
 
+class SimilarQuoteRequest(BaseModel):
+    # Free text, a quote request, or both
+    text: Optional[str] = None
+    product_specs: Optional[ProductSpecificationCreate] = None
+    communication_context: Optional[CommunicationContextCreate] = None
+    k: int = Field(5, ge=1, le=50)
+
+class SimilarQuote(BaseModel):
+    quote_id: int
+    similarity: float
+    reference_number: Optional[str] = None
+    customer_id: Optional[int] = None
+    final_price: Optional[float] = None
+    predicted_price: Optional[float] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class FileUploadResponse(BaseModel):
     file_path: str
 
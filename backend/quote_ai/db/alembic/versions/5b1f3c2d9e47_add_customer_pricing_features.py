@@ -0,0 +1,63 @@
+"""Add customer pricing features
+
+Revision ID: 5b1f3c2d9e47
+Revises: 04a5eae8ba51
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f3c2d9e47'
+down_revision: Union[str, None] = '04a5eae8ba51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('customer_pricing_features',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('quote_count', sa.Integer(), nullable=False),
+        sa.Column('priced_quote_count', sa.Integer(), nullable=False),
+        sa.Column('price_per_kg_sum', sa.Float(), nullable=False),
+        sa.Column('accepted_quote_count', sa.Integer(), nullable=False),
+        sa.Column('last_quote_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id')
+    )
+    # Backfill from the existing quotes, with the same definitions CustomerFeatureStore maintains
+    op.execute("""
+        INSERT INTO customer_pricing_features (
+            customer_id, quote_count, priced_quote_count, price_per_kg_sum,
+            accepted_quote_count, last_quote_at, updated_at
+        )
+        SELECT q.customer_id,
+               COUNT(*),
+               COUNT(k.price_per_kg),
+               COALESCE(SUM(k.price_per_kg), 0),
+               SUM(CASE WHEN q.status = 'approved' THEN 1 ELSE 0 END),
+               MAX(q.created_at),
+               CURRENT_TIMESTAMP
+        FROM quotes q
+        LEFT JOIN (
+            SELECT s.quote_id,
+                   MAX(COALESCE(p.final_price, p.predicted_price)) / SUM(s.weight_per_meter * s.total_length)
+                       AS price_per_kg
+            FROM product_specifications s
+            JOIN quotes p ON p.id = s.quote_id
+            WHERE COALESCE(p.final_price, p.predicted_price) IS NOT NULL
+            GROUP BY s.quote_id
+            HAVING SUM(s.weight_per_meter * s.total_length) > 0
+        ) k ON k.quote_id = q.id
+        WHERE q.customer_id IS NOT NULL
+        GROUP BY q.customer_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('customer_pricing_features')
@@ -0,0 +1,26 @@
+"""Add generated quote text
+
+Revision ID: 8c2e4a6f1d35
+Revises: 5b1f3c2d9e47
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e4a6f1d35'
+down_revision: Union[str, None] = '5b1f3c2d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('quotes', sa.Column('quote_text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('quotes', 'quote_text')
@@ -1,15 +1,29 @@
-import os
-import joblib
+import math
 import numpy as np
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 import openai
-from openai import OpenAI, AsyncOpenAI
-from pydantic import BaseModel
-from datetime import datetime
+from openai import AsyncOpenAI
 import json
 import asyncio
+import threading
 from quote_ai.utils.config import Settings
-from quote_ai.core.models import Quote, ProductSpecification, CommunicationContext
+from quote_ai.services.model_registry import ModelRegistry, ModelSnapshot
+from quote_ai.services.feature_encoder import FeatureEncoder, encode_complexity, predict_encoded
+from quote_ai.services.prediction_cache import PredictionCache
+from quote_ai.services.prediction_intervals import IntervalModel
+from quote_ai.services.prediction_batcher import PredictionBatcher
+from quote_ai.services.fallback_pricer import FallbackPricer
+from quote_ai.services.model_artifact import save_model
+from quote_ai.services.drift_monitor import DriftReference
+from quote_ai.services.customer_features import CustomerFeatureStore, get_customer_feature_store
+from quote_ai.services.llm_http import LLMHttpClients, get_llm_clients
+from quote_ai.services.llm_cache import LLMResponseCache, get_llm_cache
+from quote_ai.services.llm_gateway import LLMGateway, LLMProviderError, LLMUnavailableError, get_llm_gateway
+from quote_ai.services.tokens import count_tokens, split_by_tokens
+from quote_ai.services.prompt_builder import PromptBuilder
+from quote_ai.services.json_stream import JSONObjectStreamParser
+from quote_ai.core.schemas import ExtractedContext
+from quote_ai.services.model_training import ModelTrainingError
 from dotenv import load_dotenv
 import pandas as pd
 from sklearn.ensemble import GradientBoostingRegressor
@@ -21,38 +35,164 @@ import logging
 
 load_dotenv()
 
+# Largest batch scored with the compiled tree engine before handing over to sklearn
+COMPILED_MAX_ROWS = 4
+# Below this many rows specs are encoded one by one rather than through a DataFrame
+FRAME_ENCODE_MIN_ROWS = 256
+# Quote text returned instead of calling an LLM in the test environment
+TEST_QUOTE_TEXT = "This is a test quote text"
+TEST_CONTEXT = {
+    "extracted_urgency": "medium",
+    "custom_requests": "Test context",
+    "past_agreements": "None"
+}
+# Extraction should be reproducible (and so cacheable), quote text may vary in wording
+EXTRACTION_TEMPERATURE = 0.0
+QUOTE_TEXT_TEMPERATURE = 0.7
+QUOTE_SYSTEM_PROMPT = "You are a professional quote generator."
+EXTRACTION_SYSTEM_PROMPT = "You are a helpful assistant that extracts context from product specifications and PDFs for quote generation."
+# Instructions come before the request details so every prompt shares a cacheable prefix
+EXTRACTION_INSTRUCTIONS = """
+Analyze the product specifications and PDF content below to extract relevant context for quote generation.
+
+Please extract the following information:
+1. Any additional product requirements or specifications
+2. Urgency level (High, Medium, Low)
+3. Any custom requests or special requirements
+4. Any past agreements or references
+5. Any other relevant context for quote generation
+
+Format the response as a JSON object with these keys:
+- context_text: A summary of the extracted context
+- extracted_urgency: The urgency level
+- custom_requests: Any custom requirements
+- past_agreements: Any past agreements or references
+"""
+QUOTE_INSTRUCTIONS = """
+Generate a professional quote document from the details below. It should include:
+1. A formal introduction
+2. Detailed product specifications
+3. Price breakdown and justification, including:
+   - Base price calculation
+   - Confidence level in the prediction
+   - Final price with margin
+4. Terms and conditions
+5. Validity period (30 days from quote date)
+6. Contact information
+7. Any special notes or considerations from the communication context
+"""
+# Reduce step of chunked context extraction: the most urgent chunk decides, text fields are joined
+URGENCY_RANK = {"low": 0, "medium": 1, "high": 2}
+CONTEXT_TEXT_FIELDS = ("context_text", "custom_requests", "past_agreements")
+
 class AIService:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, model_registry: Optional[ModelRegistry] = None,
+                 customer_features: Optional[CustomerFeatureStore] = None,
+                 llm_clients: Optional[LLMHttpClients] = None,
+                 llm_cache: Optional[LLMResponseCache] = None,
+                 llm_gateway: Optional[LLMGateway] = None):
         self.settings = settings
         self.logger = logging.getLogger(__name__)
         self.model_path = settings.model_path
-        self.model = None
-        self.load_model()
+        # Without a shared registry the service gets a private one that never hot-reloads
+        self.model_registry = model_registry or ModelRegistry(
+            self.model_path,
+            inference_engine=settings.inference_engine
+        )
+        self.prediction_cache = None
+        if settings.prediction_cache_size > 0:
+            self.prediction_cache = PredictionCache(
+                maxsize=settings.prediction_cache_size,
+                ttl=settings.prediction_cache_ttl
+            )
+            # Entries are keyed on the model version, clearing just frees them sooner
+            self.model_registry.subscribe(lambda snapshot: self.prediction_cache.clear())
+        # Only read when the live model was trained with customer features
+        self.customer_features = customer_features or get_customer_feature_store(settings)
+        self.training_thread: Optional[threading.Thread] = None
+        self.prediction_batcher = None
+        if settings.prediction_batch_window_ms > 0:
+            self.prediction_batcher = PredictionBatcher(
+                self.predict_prices,
+                max_batch_size=settings.prediction_batch_max_size,
+                max_wait_ms=settings.prediction_batch_window_ms
+            )
+        if self.model_registry.snapshot is None:
+            self.load_model()
         
-        # Initialize AI clients based on provider
+        # Initialize AI clients based on provider, sharing the app-scoped connection pools
+        self.llm_clients = llm_clients or get_llm_clients(settings)
+        self.llm_cache = llm_cache or get_llm_cache(settings)
+        self.llm_gateway = llm_gateway or get_llm_gateway(settings)
         if settings.environment == "test":
-            # In test environment, we'll set up mock clients that will be replaced by the test fixtures
-            self.client = OpenAI(api_key="test_key")
+            # In test environment, we'll set up a mock client that will be replaced by the test fixtures
             self.async_client = AsyncOpenAI(api_key="test_key")
         elif settings.ai_provider == "openai":
             if not settings.openai_api_key:
                 raise ValueError("OpenAI API key not found in environment variables")
-            self.client = OpenAI(api_key=settings.openai_api_key)
-            self.async_client = AsyncOpenAI(api_key=settings.openai_api_key)
+            self.async_client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=self.llm_clients.openai_http_client(),
+                # Retries belong to the LLM gateway, which jitters them and tracks provider health
+                max_retries=0
+            )
         elif settings.ai_provider == "ollama":
             self.ollama_base_url = settings.ollama_base_url
             self.ollama_model = settings.ollama_model
         else:
             raise ValueError(f"Unsupported AI provider: {settings.ai_provider}")
 
+    @property
+    def model(self):
+        """The price model currently published in the registry"""
+        snapshot = self.model_registry.current()
+        return snapshot.model if snapshot is not None else None
+
+    @model.setter
+    def model(self, model):
+        self.model_registry.publish(model)
+
+    @property
+    def training_in_progress(self) -> bool:
+        return self.training_thread is not None and self.training_thread.is_alive()
+
     def load_model(self):
         """Load the trained price prediction model"""
         try:
-            self.model = joblib.load(self.model_path)
+            self.model_registry.load()
             self.logger.info("Successfully loaded price prediction model")
         except FileNotFoundError:
-            self.logger.warning("No trained model found. Training with sample data...")
+            # Never train inside a request: serve the rule-of-thumb pricer and
+            # train in the background, the registry swaps the model in when done
+            self.logger.warning("No trained model found. Serving fallback prices while training with sample data...")
+            self.model_registry.publish(FallbackPricer())
+            self._start_background_training()
+
+    def _start_background_training(self):
+        if self.training_in_progress:
+            return
+        self.training_thread = threading.Thread(
+            target=self._train_in_background,
+            name="price-model-cold-start",
+            daemon=True
+        )
+        self.training_thread.start()
+
+    def _train_in_background(self):
+        try:
             self._train_with_sample_data()
+        except Exception as e:
+            self.logger.error(f"Background model training failed: {str(e)}")
+
+    def warmup(self):
+        """Run one prediction so lazy imports and code paths are primed before traffic"""
+        self.predict_prices([{
+            'weight_per_meter': 1.0,
+            'total_length': 1.0,
+            'machining_complexity': 'medium',
+            'surface_treatment': 'raw',
+            'alloy': '6060'
+        }])
 
     def _train_with_sample_data(self):
         """Create and train model with sample data"""
@@ -76,315 +216,683 @@ class AIService:
             self.logger.info(f"Model trained successfully with data from {historical_data_path}")
         except Exception as e:
             self.logger.error(f"Error training model: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error training model: {str(e)}")
+            raise ModelTrainingError(f"Error training model: {str(e)}") from e
 
     def _train_model(self, df: pd.DataFrame):
         """Internal method to train the model"""
         # Feature engineering
-        X = pd.get_dummies(df[['weight_per_meter', 'total_length', 'machining_complexity', 
-                              'surface_treatment', 'alloy']])
+        encoder = FeatureEncoder.default()
+        X = encoder.to_frame(encoder.encode_frame(df))
         y = df['price']
         
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
-        # Train model
-        self.model = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, max_depth=3)
-        self.model.fit(X_train, y_train)
+        # Train model and its prediction interval companions
+        params = {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 3}
+        model = GradientBoostingRegressor(**params)
+        model.fit(X_train, y_train)
+        intervals = IntervalModel.fit(X_train, y_train, params)
         
         # Evaluate model
-        y_pred = self.model.predict(X_test)
+        y_pred = model.predict(X_test)
         mse = mean_squared_error(y_test, y_pred)
         r2 = r2_score(y_test, y_pred)
         
         self.logger.info(f"Model evaluation - MSE: {mse:.2f}, R2: {r2:.2f}")
         
-        # Save model
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        joblib.dump(self.model, self.model_path)
+        # Save model and swap it in for serving
+        drift_reference = DriftReference.from_frame(df)
+        source = save_model(self.model_path, model, intervals, metrics={"mse": mse, "r2": r2},
+                            drift_reference=drift_reference.to_dict(),
+                            retention=self.settings.model_artifact_retention)
+        self.model_registry.publish(model, source=source, intervals=intervals, drift_reference=drift_reference)
 
     def predict_price(self, quote_data: dict) -> dict:
+        self.model_registry.drift_monitor.observe(quote_data)
         try:
-            # Convert machining complexity to numeric
-            complexity_map = {'low': 1, 'medium': 2, 'high': 3}
-            machining_complexity = complexity_map.get(quote_data['machining_complexity'].lower(), 2)
-            
-            # Create features DataFrame with the same structure as training data
-            features = pd.DataFrame([{
-                'weight_per_meter': float(quote_data['weight_per_meter']),
-                'total_length': float(quote_data['total_length']),
-                'machining_complexity': machining_complexity,
-                'surface_treatment': quote_data['surface_treatment'],
-                'alloy': quote_data['alloy']
-            }])
-            
-            # Create dummy variables using the same method as training
-            features = pd.get_dummies(features[['weight_per_meter', 'total_length', 'machining_complexity',
-                                              'surface_treatment', 'alloy']])
-            
-            # Get the feature names from the trained model
-            model_features = self.model.feature_names_in_
-            
-            # Add missing dummy columns with value 0
-            for col in model_features:
-                if col not in features.columns:
-                    features[col] = 0
-            
-            # Ensure columns are in the same order as during training
-            features = features[model_features]
-            
-            # Make prediction
-            predicted_price = float(self.model.predict(features)[0])
-            confidence = self._calculate_confidence(features)
-            
-            return {
-                'predicted_price': predicted_price,
-                'confidence': confidence
-            }
+            # Pin one snapshot for the whole call in case a reload swaps it mid-way
+            snapshot = self._current_snapshot()
+            cache_key = None
+            if self.prediction_cache is not None:
+                cache_key = PredictionCache.make_key(
+                    snapshot.version, quote_data, snapshot.encoder.uses_customer_features
+                )
+                cached = self.prediction_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            features = snapshot.encoder.encode(self._with_customer_features(snapshot, quote_data))
+            predictions = self._score(snapshot, features)
+            result = self.prediction_row(predictions, 0)
+            if cache_key is not None:
+                self.prediction_cache.put(cache_key, result)
+            return result
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error predicting price: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    def _calculate_confidence(self, features: pd.DataFrame) -> float:
-        """Calculate prediction confidence based on feature similarity to training data"""
-        # This is a simplified confidence calculation
-        # In a real implementation, you might use distance to training data or prediction intervals
-        return 0.85
+    async def predict_price_async(self, quote_data: dict) -> dict:
+        """Predict a price from async code without blocking the event loop.
 
-    async def extract_context(self, text: str, product_specs: dict) -> dict:
-        """Extract context from text using AI."""
-        try:
-            # Format product specifications for the prompt
-            product_specs_text = "\n".join([
-                f"{key}: {value}" for key, value in product_specs.items()
-            ])
-            
-            # Create a prompt that includes both PDF text and product specifications
-            prompt = f"""
-            Analyze the following product specifications and PDF content to extract relevant context for quote generation:
-
-            Product Specifications:
-            {product_specs_text}
-
-            PDF Content:
-            {text}
-
-            Please extract the following information:
-            1. Any additional product requirements or specifications
-            2. Urgency level (High, Medium, Low)
-            3. Any custom requests or special requirements
-            4. Any past agreements or references
-            5. Any other relevant context for quote generation
-
-            Format the response as a JSON object with these keys:
-            - context_text: A summary of the extracted context
-            - extracted_urgency: The urgency level
-            - custom_requests: Any custom requirements
-            - past_agreements: Any past agreements or references
-            """
+        Cache hits return immediately, everything else is coalesced with other
+        concurrent requests by the micro-batcher and scored in a worker thread.
+        """
+        if self.prediction_batcher is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self.predict_price, quote_data)
 
-            if self.settings.environment == "test":
-                return {
-                    "extracted_urgency": "medium",
-                    "custom_requests": "Test context",
-                    "past_agreements": "None"
-                }
-            
-            if self.settings.ai_provider == "openai":
-                try:
-                    response = await self.async_client.chat.completions.create(
-                        model=self.settings.openai_model,
-                        messages=[
-                            {"role": "system", "content": "You are a helpful assistant that extracts context from product specifications and PDFs for quote generation."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        response_format={"type": "json_object"},
-                        timeout=30.0  # 30 second timeout
-                    )
-                    return self._parse_context(response.choices[0].message.content)
-                except Exception as e:
-                    self.logger.error(f"OpenAI API error: {str(e)}")
-                    raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
-            
-            elif self.settings.ai_provider == "ollama":
-                max_retries = 3
-                retry_delay = 2  # seconds
-                
-                for attempt in range(max_retries):
-                    try:
-                        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
-                            async with session.post(
-                                f"{self.ollama_base_url}/api/generate",
-                                json={
-                                    "model": self.ollama_model,
-                                    "prompt": prompt,
-                                    "stream": False,
-                                    "format": "json"
-                                }
-                            ) as response:
-                                if response.status != 200:
-                                    error_text = await response.text()
-                                    self.logger.error(f"Ollama API error: {error_text}")
-                                    if attempt < max_retries - 1:
-                                        await asyncio.sleep(retry_delay)
-                                        continue
-                                    raise HTTPException(status_code=500, detail=f"Ollama API error: {error_text}")
-                                
-                                result = await response.json()
-                                return self._parse_context(result.get("response", ""))
-                    except asyncio.TimeoutError:
-                        self.logger.error(f"Timeout while connecting to Ollama service (attempt {attempt + 1}/{max_retries})")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(retry_delay)
-                            continue
-                        raise HTTPException(status_code=504, detail="Timeout while connecting to AI service")
-                    except Exception as e:
-                        self.logger.error(f"Ollama API error: {str(e)}")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(retry_delay)
-                            continue
-                        raise HTTPException(status_code=500, detail=f"Ollama API error: {str(e)}")
-            
-            else:
-                raise ValueError(f"Unsupported AI provider: {self.settings.ai_provider}")
+        self.model_registry.drift_monitor.observe(quote_data)
+        snapshot = self._current_snapshot()
+        cache_key = None
+        if self.prediction_cache is not None:
+            try:
+                cache_key = PredictionCache.make_key(
+                    snapshot.version, quote_data, snapshot.encoder.uses_customer_features
+                )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        result = await self.prediction_batcher.predict(quote_data)
+        if cache_key is not None:
+            self.prediction_cache.put(cache_key, result)
+        return result
+
+    def predict_prices(self, quotes_data: List[dict]) -> List[dict]:
+        """Predict prices for many specifications with a single model call"""
+        # Not fed to the drift monitor, the micro-batcher scores specs predict_price_async already counted
+        if not quotes_data:
+            return []
+        if len(quotes_data) >= FRAME_ENCODE_MIN_ROWS:
+            predictions = self._predict_frame(pd.DataFrame.from_records(quotes_data))
+        else:
+            try:
+                snapshot = self._current_snapshot()
+                features = np.vstack([
+                    snapshot.encoder.encode(self._with_customer_features(snapshot, spec)) for spec in quotes_data
+                ])
+                predictions = self._score(snapshot, features)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logging.error(f"Error predicting price: {str(e)}")
+                raise HTTPException(status_code=500, detail=str(e))
+        return [self.prediction_row(predictions, i) for i in range(len(quotes_data))]
+
+    def predict_frame(self, specs: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Vectorized price prediction over a frame of product specifications"""
+        self.model_registry.drift_monitor.observe_frame(specs)
+        return self._predict_frame(specs)
 
+    def _predict_frame(self, specs: pd.DataFrame) -> Dict[str, np.ndarray]:
+        if len(specs) == 0:
+            return {key: np.empty(0) for key in ('predicted_price', 'confidence', 'lower_bound', 'upper_bound')}
+        try:
+            snapshot = self._current_snapshot()
+            if snapshot.encoder.uses_customer_features:
+                specs = self.customer_features.join_frame(specs)
+            features = snapshot.encoder.encode_frame(specs)
+            return self._score(snapshot, features)
+        except HTTPException:
+            raise
         except Exception as e:
-            self.logger.error(f"Error extracting context: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error extracting context: {str(e)}")
+            logging.error(f"Error predicting price: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
 
-    def _parse_context(self, text: str) -> Dict[str, Any]:
-        """Parse the extracted context into structured data"""
-        # This is a simplified parser. In a real implementation, you might use more sophisticated parsing
+    def _with_customer_features(self, snapshot: ModelSnapshot, spec: dict) -> dict:
+        """The spec plus its customer's cached aggregates, if the model reads them"""
+        if not snapshot.encoder.uses_customer_features:
+            return spec
+        return {**spec, **self.customer_features.features_for(spec.get('customer_id'))}
+
+    @staticmethod
+    def prediction_row(predictions: Dict[str, np.ndarray], i: int) -> dict:
+        """Pull one row out of vectorized predictions, bounds are None without intervals"""
+        lower = predictions['lower_bound'][i]
+        upper = predictions['upper_bound'][i]
         return {
-            "extracted_urgency": "medium",
-            "custom_requests": text,
-            "past_agreements": ""
+            'predicted_price': float(predictions['predicted_price'][i]),
+            'confidence': float(predictions['confidence'][i]),
+            'lower_bound': None if np.isnan(lower) else float(lower),
+            'upper_bound': None if np.isnan(upper) else float(upper)
         }
 
-    async def generate_quote_text(self, quote_data: dict) -> str:
-        """Generate quote text using AI"""
+    def model_status(self) -> Dict[str, Any]:
+        """Describe the model being served and how well the prediction cache is doing"""
+        snapshot = self.model_registry.snapshot
+        return {
+            "loaded": snapshot is not None,
+            "ready": self.model_registry.ready,
+            "fallback": snapshot is not None and snapshot.fallback,
+            "training_in_progress": self.training_in_progress,
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at.isoformat() if snapshot else None,
+            "source": snapshot.source if snapshot else None,
+            "model_type": type(snapshot.model).__name__ if snapshot else None,
+            "compiled": snapshot is not None and snapshot.compiled is not None,
+            "intervals": snapshot is not None and snapshot.intervals is not None,
+            "prediction_cache": self.prediction_cache.stats() if self.prediction_cache else None,
+            "prediction_batcher": self.prediction_batcher.stats() if self.prediction_batcher else None
+        }
+
+    def _current_snapshot(self) -> ModelSnapshot:
+        snapshot = self.model_registry.current()
+        if snapshot is None or snapshot.model is None:
+            raise HTTPException(status_code=503, detail="Price prediction model is not loaded")
+        return snapshot
+
+    def _score(self, snapshot: ModelSnapshot, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """Run the model and its interval companions over an encoded feature matrix"""
+        # The compiled engine wins on single rows, sklearn's Cython loop on larger batches
+        use_compiled = snapshot.compiled is not None and len(features) <= COMPILED_MAX_ROWS
+        predictor = snapshot.compiled if use_compiled else snapshot.model
+        predicted_prices = np.asarray(predict_encoded(predictor, features), dtype=float)
+        # Off the request path, the shadow model scores a reference to the same features later
+        self.model_registry.submit_shadow(snapshot, features, predicted_prices)
+
+        intervals = snapshot.intervals
+        if use_compiled and snapshot.compiled_intervals is not None:
+            intervals = snapshot.compiled_intervals
+        if intervals is None:
+            lower = upper = np.full(len(predicted_prices), np.nan)
+            if snapshot.fallback:
+                confidence = np.full(len(predicted_prices), FallbackPricer.CONFIDENCE)
+            else:
+                confidence = np.full(len(predicted_prices), self._calculate_confidence(features))
+        else:
+            lower, upper = intervals.predict(features)
+            confidence = intervals.confidence(predicted_prices, lower, upper)
+
+        return {
+            'predicted_price': predicted_prices,
+            'confidence': confidence,
+            'lower_bound': lower,
+            'upper_bound': upper
+        }
+
+    def _calculate_confidence(self, features: np.ndarray) -> float:
+        """Fallback confidence for models trained without interval companions"""
+        return 0.85
+
+    async def extract_context(self, text: str, product_specs: Optional[dict] = None, bypass_cache: bool = False) -> dict:
+        """Extract context from text using AI.
+
+        Long documents are split into token-bounded chunks that are extracted
+        concurrently (map) and merged into one context (reduce), so latency
+        follows the slowest chunk rather than the document size.
+        """
         try:
             if self.settings.environment == "test":
-                return "This is a test quote text"
-            
-            # Extract product specifications for price prediction
-            product_specs = quote_data.get('product_specs', {})
-            price_data = {
-                'weight_per_meter': float(product_specs.get('weight_per_meter', 0)),
-                'total_length': float(product_specs.get('total_length', 0)),
-                'machining_complexity': product_specs.get('machining_complexity', 'medium'),
-                'surface_treatment': product_specs.get('surface_treatment', 'raw'),
-                'alloy': product_specs.get('alloy', '6060')
-            }
+                return dict(TEST_CONTEXT)
+            if self.settings.ai_provider not in ("openai", "ollama"):
+                raise ValueError(f"Unsupported AI provider: {self.settings.ai_provider}")
 
-            # Get predicted price
-            price_prediction = self.predict_price(price_data)
-            predicted_price = price_prediction['predicted_price']
-            confidence = price_prediction['confidence']
+            product_specs_text = self._format_product_specs(product_specs)
+            model = self._quote_model()
+            chunks = split_by_tokens(text, self.settings.context_chunk_tokens, model) or [""]
+            limit = asyncio.Semaphore(self.settings.context_max_concurrent_chunks)
 
-            # Calculate final price
-            final_price = predicted_price * (1 + (1 - confidence) * 0.1)  # Add 10% margin for low confidence
+            async def extract(chunk: str) -> Dict[str, Any]:
+                async with limit:
+                    return await self._extract_chunk_context(chunk, product_specs_text, model, bypass_cache)
 
-            # Update quote_data with the calculated prices
-            quote_data['predicted_price'] = predicted_price
-            quote_data['final_price'] = final_price
-            quote_data['price_confidence'] = confidence
+            partials = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+            if len(chunks) > 1:
+                self.logger.info(
+                    f"Extracted context from {len(chunks)} chunks of up to {self.settings.context_chunk_tokens} tokens"
+                )
+            return self._merge_contexts(partials)
 
-            prompt = self._prepare_quote_prompt(quote_data)
-            
-            if self.settings.ai_provider == "openai":
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error extracting context: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error extracting context: {str(e)}")
+
+    async def _extract_chunk_context(self, chunk: str, product_specs_text: str, model: str,
+                                     bypass_cache: bool) -> Dict[str, Any]:
+        """Extract context from one chunk of the document"""
+        prompt = self._extraction_prompt(chunk, product_specs_text, model)
+        system_prompt = EXTRACTION_SYSTEM_PROMPT
+        cache_key = self._llm_cache_key(model, [system_prompt, prompt], EXTRACTION_TEMPERATURE, bypass_cache)
+        cached = await self._cached_llm_response(cache_key)
+        if cached is not None:
+            return self._parse_context(cached)
+
+        if self.settings.ai_provider == "openai":
+            async def complete() -> str:
                 response = await self.async_client.chat.completions.create(
-                    model="gpt-4",
+                    model=model,
                     messages=[
-                        {"role": "system", "content": "You are a professional quote generator."},
+                        {"role": "system", "content": system_prompt},
                         {"role": "user", "content": prompt}
                     ],
-                    temperature=0.7
+                    response_format={"type": "json_object"},
+                    temperature=EXTRACTION_TEMPERATURE,
+                    timeout=30.0  # 30 second timeout
                 )
                 return response.choices[0].message.content
+        else:  # Ollama
+            async def complete() -> str:
+                session = await self.llm_clients.ollama_session()
+                async with session.post(
+                    f"{self.ollama_base_url}/api/generate",
+                    json={
+                        "model": model,
+                        "prompt": prompt,
+                        "stream": False,
+                        "format": "json",
+                        "options": {"temperature": EXTRACTION_TEMPERATURE}
+                    }
+                ) as response:
+                    await self._raise_for_ollama_status(response)
+                    return (await response.json()).get("response", "")
+
+        try:
+            # Bounded concurrency, jittered retries of transient failures and the circuit breaker
+            content = await self.llm_gateway.call(self.settings.ai_provider, complete)
+        except Exception as e:
+            raise self._llm_http_error(e, "Error extracting context")
+        self._log_token_usage("Context extraction", model, [system_prompt, prompt], content)
+        await self._store_llm_response(cache_key, model, EXTRACTION_TEMPERATURE, content)
+        return self._parse_context(content)
+
+    @staticmethod
+    def _format_product_specs(product_specs: Optional[dict]) -> str:
+        return "\n".join([f"{key}: {value}" for key, value in (product_specs or {}).items()])
+
+    def _extraction_prompt(self, chunk: str, product_specs_text: str, model: str) -> str:
+        # The document is the first thing trimmed when the prompt is over budget
+        return (
+            PromptBuilder(self.settings.extraction_prompt_max_tokens, model)
+            .add("instructions", EXTRACTION_INSTRUCTIONS, static=True, trimmable=False)
+            .add("product_specs", f"Product Specifications:\n{product_specs_text}", priority=1)
+            .add("document", f"PDF Content:\n{chunk}", priority=0)
+            .build()
+            .text
+        )
+
+    def _parse_context(self, text: str) -> Dict[str, Any]:
+        """Parse the model's JSON answer into a validated ExtractedContext"""
+        parser = JSONObjectStreamParser()
+        fields = parser.feed(text or "")
+        if not parser.started:
+            # Not the JSON object asked for, keep the raw answer
+            return ExtractedContext(custom_requests=text or "").model_dump()
+        return ExtractedContext.model_validate(dict(fields)).model_dump()
+
+    @staticmethod
+    def _merge_contexts(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reduce per-chunk contexts into one: the highest urgency wins, text fields are joined"""
+        urgencies = [str(partial.get("extracted_urgency", "")).strip().lower() for partial in partials]
+        urgencies = [urgency for urgency in urgencies if urgency in URGENCY_RANK]
+        merged: Dict[str, Any] = {
+            "extracted_urgency": max(urgencies, key=URGENCY_RANK.get) if urgencies else "medium"
+        }
+        for field in CONTEXT_TEXT_FIELDS:
+            values = []
+            for partial in partials:
+                value = partial.get(field)
+                if isinstance(value, (list, dict)):
+                    value = json.dumps(value)
+                value = str(value).strip() if value is not None else ""
+                if value and value.lower() not in ("none", "n/a") and value not in values:
+                    values.append(value)
+            merged[field] = "\n".join(values)
+        # Keys outside the schema keep the first chunk's value
+        for partial in partials:
+            for key, value in partial.items():
+                merged.setdefault(key, value)
+        return merged
+
+    async def stream_extract_context(self, text: str, product_specs: Optional[dict] = None,
+                                     bypass_cache: bool = False) -> AsyncIterator[Tuple[str, Any]]:
+        """Extract context like extract_context, yielding (field, value) pairs as each field completes.
+
+        The model's JSON is parsed while it streams, so a field is yielded as
+        soon as its value closed. Every ExtractedContext field is yielded once,
+        those the model left out with their defaults at the end. A document
+        longer than one chunk needs the reduce step, so its fields are yielded
+        once all chunks are merged.
+        """
+        try:
+            if self.settings.environment == "test":
+                for item in ExtractedContext.model_validate(TEST_CONTEXT).model_dump().items():
+                    yield item
+                return
+            if self.settings.ai_provider not in ("openai", "ollama"):
+                raise ValueError(f"Unsupported AI provider: {self.settings.ai_provider}")
+
+            product_specs_text = self._format_product_specs(product_specs)
+            model = self._quote_model()
+            chunks = split_by_tokens(text, self.settings.context_chunk_tokens, model) or [""]
+            if len(chunks) > 1:
+                for item in (await self.extract_context(text, product_specs, bypass_cache)).items():
+                    if item[0] in ExtractedContext.model_fields:
+                        yield item
+                return
+
+            prompt = self._extraction_prompt(chunks[0], product_specs_text, model)
+            cache_key = self._llm_cache_key(model, [EXTRACTION_SYSTEM_PROMPT, prompt], EXTRACTION_TEMPERATURE, bypass_cache)
+            cached = await self._cached_llm_response(cache_key)
+            if cached is not None:
+                for item in self._parse_context(cached).items():
+                    yield item
+                return
+
+            if self.settings.ai_provider == "openai":
+                async def open_stream() -> AsyncIterator[str]:
+                    stream = await self.async_client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=EXTRACTION_TEMPERATURE,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            else:  # Ollama, newline-delimited JSON messages
+                async def open_stream() -> AsyncIterator[str]:
+                    session = await self.llm_clients.ollama_session()
+                    async with session.post(
+                        f"{self.ollama_base_url}/api/generate",
+                        json={
+                            "model": model,
+                            "prompt": prompt,
+                            "stream": True,
+                            "format": "json",
+                            "options": {"temperature": EXTRACTION_TEMPERATURE}
+                        },
+                        timeout=aiohttp.ClientTimeout(total=None, sock_read=self.settings.llm_request_timeout)
+                    ) as response:
+                        await self._raise_for_ollama_status(response)
+                        async for line in response.content:
+                            if not line.strip():
+                                continue
+                            message = json.loads(line)
+                            if message.get("response"):
+                                yield message["response"]
+                            if message.get("done"):
+                                break
+
+            parser = JSONObjectStreamParser()
+            pieces = []
+            emitted = set()
+            async for piece in self.llm_gateway.stream(self.settings.ai_provider, open_stream):
+                pieces.append(piece)
+                for name, value in parser.feed(piece):
+                    if name in ExtractedContext.model_fields and name not in emitted:
+                        emitted.add(name)
+                        yield name, ExtractedContext.validate_field(name, value)
+            content = "".join(pieces)
+            self._log_token_usage("Context extraction stream", model, [EXTRACTION_SYSTEM_PROMPT, prompt], content)
+            await self._store_llm_response(cache_key, model, EXTRACTION_TEMPERATURE, content)
+            # Fields the model left out, or all of them when it did not answer with JSON
+            for name, value in self._parse_context(content).items():
+                if name not in emitted:
+                    yield name, value
+        except Exception as e:
+            raise self._llm_http_error(e, "Error extracting context")
+
+    async def generate_quote_text(self, quote_data: dict, bypass_cache: bool = False) -> str:
+        """Generate quote text using AI"""
+        try:
+            if self.settings.environment == "test":
+                return TEST_QUOTE_TEXT
+
+            prompt = await self._price_quote(quote_data)
+            model = self._quote_model()
+            cache_key = self._llm_cache_key(model, [QUOTE_SYSTEM_PROMPT, prompt], QUOTE_TEXT_TEMPERATURE, bypass_cache)
+            cached = await self._cached_llm_response(cache_key)
+            if cached is not None:
+                return cached
+
+            if self.settings.ai_provider == "openai":
+                async def complete() -> str:
+                    response = await self.async_client.chat.completions.create(
+                        model=model,
+                        messages=self._quote_messages(prompt),
+                        temperature=QUOTE_TEXT_TEMPERATURE
+                    )
+                    return response.choices[0].message.content
             else:  # Ollama
-                async with aiohttp.ClientSession() as session:
+                async def complete() -> str:
+                    session = await self.llm_clients.ollama_session()
                     async with session.post(
                         f"{self.ollama_base_url}/api/chat",
                         json={
-                            "model": self.ollama_model,
-                            "messages": [
-                                {"role": "system", "content": "You are a professional quote generator."},
-                                {"role": "user", "content": prompt}
-                            ],
-                            "temperature": 0.7
+                            "model": model,
+                            "messages": self._quote_messages(prompt),
+                            "temperature": QUOTE_TEXT_TEMPERATURE,
+                            # /api/chat streams unless told otherwise
+                            "stream": False
                         }
                     ) as response:
-                        if response.status != 200:
-                            raise HTTPException(status_code=500, detail="Failed to get response from Ollama")
+                        await self._raise_for_ollama_status(response)
                         return (await response.json())["message"]["content"]
+            content = await self.llm_gateway.call(self.settings.ai_provider, complete)
+            self._log_token_usage("Quote text", model, [QUOTE_SYSTEM_PROMPT, prompt], content)
+            await self._store_llm_response(cache_key, model, QUOTE_TEXT_TEMPERATURE, content)
+            return content
         except Exception as e:
-            self.logger.error(f"Error generating quote text: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error generating quote text: {str(e)}")
+            raise self._llm_http_error(e, "Error generating quote text")
 
-    def _prepare_quote_prompt(self, quote_data: dict) -> str:
-        """Prepare the prompt for quote text generation"""
-        # Extract product specifications for price prediction
+    async def stream_quote_text(self, quote_data: dict, bypass_cache: bool = False) -> AsyncIterator[str]:
+        """Generate quote text like generate_quote_text, yielding pieces as soon as the model produces them.
+
+        The quote is priced before the first piece and the prices are written into quote_data.
+        A cached completion is yielded as a single piece.
+        """
+        try:
+            prompt = await self._price_quote(quote_data)
+            if self.settings.environment == "test":
+                for i, word in enumerate(TEST_QUOTE_TEXT.split(" ")):
+                    yield word if i == 0 else f" {word}"
+                return
+
+            model = self._quote_model()
+            cache_key = self._llm_cache_key(model, [QUOTE_SYSTEM_PROMPT, prompt], QUOTE_TEXT_TEMPERATURE, bypass_cache)
+            cached = await self._cached_llm_response(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+            if self.settings.ai_provider == "openai":
+                async def open_stream() -> AsyncIterator[str]:
+                    stream = await self.async_client.chat.completions.create(
+                        model=model,
+                        messages=self._quote_messages(prompt),
+                        temperature=QUOTE_TEXT_TEMPERATURE,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            else:  # Ollama, newline-delimited JSON messages
+                async def open_stream() -> AsyncIterator[str]:
+                    session = await self.llm_clients.ollama_session()
+                    async with session.post(
+                        f"{self.ollama_base_url}/api/chat",
+                        json={
+                            "model": model,
+                            "messages": self._quote_messages(prompt),
+                            "temperature": QUOTE_TEXT_TEMPERATURE,
+                            "stream": True
+                        },
+                        # Long completions are fine as long as tokens keep arriving
+                        timeout=aiohttp.ClientTimeout(total=None, sock_read=self.settings.llm_request_timeout)
+                    ) as response:
+                        await self._raise_for_ollama_status(response)
+                        async for line in response.content:
+                            if not line.strip():
+                                continue
+                            message = json.loads(line)
+                            content = message.get("message", {}).get("content")
+                            if content:
+                                yield content
+                            if message.get("done"):
+                                break
+
+            pieces = []
+            async for piece in self.llm_gateway.stream(self.settings.ai_provider, open_stream):
+                pieces.append(piece)
+                yield piece
+            # Only complete streams are logged and cached, an abandoned one never gets here
+            self._log_token_usage("Quote text stream", model, [QUOTE_SYSTEM_PROMPT, prompt], "".join(pieces))
+            await self._store_llm_response(cache_key, model, QUOTE_TEXT_TEMPERATURE, "".join(pieces))
+        except Exception as e:
+            raise self._llm_http_error(e, "Error generating quote text")
+
+    async def _price_quote(self, quote_data: dict) -> str:
+        """Predict the quote's prices into quote_data and build the generation prompt"""
+        # Get predicted price
+        price_prediction = await self.predict_price_async(self._price_data(quote_data))
+        predicted_price = price_prediction['predicted_price']
+        confidence = price_prediction['confidence']
+
+        # Calculate final price
+        final_price = predicted_price * (1 + (1 - confidence) * 0.1)  # Add 10% margin for low confidence
+
+        # Update quote_data with the calculated prices
+        quote_data['predicted_price'] = predicted_price
+        quote_data['final_price'] = final_price
+        quote_data['price_confidence'] = confidence
+        return self._prepare_quote_prompt(quote_data)
+
+    @staticmethod
+    def _price_data(quote_data: dict) -> dict:
+        """The product specifications and customer the price model reads, with its defaults"""
         product_specs = quote_data.get('product_specs', {})
-        price_data = {
+        return {
             'weight_per_meter': float(product_specs.get('weight_per_meter', 0)),
             'total_length': float(product_specs.get('total_length', 0)),
             'machining_complexity': product_specs.get('machining_complexity', 'medium'),
             'surface_treatment': product_specs.get('surface_treatment', 'raw'),
-            'alloy': product_specs.get('alloy', '6060')
+            'alloy': product_specs.get('alloy', '6060'),
+            'customer_id': quote_data.get('customer_id')
         }
 
-        # Get predicted price
-        price_prediction = self.predict_price(price_data)
-        predicted_price = price_prediction['predicted_price']
-        confidence = price_prediction['confidence']
+    @staticmethod
+    def _quote_messages(prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": QUOTE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
 
-        # Calculate final price (you can adjust this formula based on your business logic)
-        final_price = predicted_price * (1 + (1 - confidence) * 0.1)  # Add 10% margin for low confidence
+    @staticmethod
+    async def _raise_for_ollama_status(response: aiohttp.ClientResponse):
+        if response.status != 200:
+            raise LLMProviderError("ollama", response.status, await response.text())
 
-        return f"""
-Generate a professional quote document with the following details:
+    def _llm_http_error(self, error: Exception, context: str) -> HTTPException:
+        """Map an LLM call failure onto the HTTP error the API answers with"""
+        if isinstance(error, HTTPException):
+            return error
+        self.logger.error(f"{context}: {str(error)}")
+        if isinstance(error, LLMUnavailableError):
+            # Shed load instead of queueing it, clients should come back later
+            return HTTPException(status_code=503, detail=str(error),
+                                 headers={"Retry-After": str(math.ceil(error.retry_after))})
+        if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError)):
+            return HTTPException(status_code=504, detail="Timeout while connecting to AI service")
+        return HTTPException(status_code=500, detail=f"{context}: {str(error)}")
 
-Customer Information:
-- Company: {quote_data.get('customer', {}).get('company_name', 'N/A')}
-- Contact: {quote_data.get('customer', {}).get('contact_person', 'N/A')}
-- Email: {quote_data.get('customer', {}).get('email', 'N/A')}
+    def _quote_model(self) -> str:
+        return self.settings.openai_model if self.settings.ai_provider == "openai" else self.settings.ollama_model
 
-Product Specifications:
-- Description: {product_specs.get('description', 'N/A')}
-- Profile Type: {product_specs.get('profile_type', 'N/A')}
-- Alloy: {product_specs.get('alloy', 'N/A')}
-- Weight per meter: {product_specs.get('weight_per_meter', 'N/A')} kg
-- Total Length: {product_specs.get('total_length', 'N/A')} m
-- Surface Treatment: {product_specs.get('surface_treatment', 'N/A')}
-- Machining Complexity: {product_specs.get('machining_complexity', 'N/A')}
+    def _llm_cache_key(self, model: str, prompts: List[str], temperature: float,
+                       bypass_cache: bool) -> Optional[str]:
+        """Cache key of an LLM call, None when the call must not use the cache"""
+        if self.llm_cache is None:
+            return None
+        if bypass_cache:
+            self.llm_cache.bypassed += 1
+            return None
+        if not self.llm_cache.cacheable(temperature):
+            return None
+        return LLMResponseCache.make_key(self.settings.ai_provider, model, "\n".join(prompts), temperature)
 
-Communication Context:
-{quote_data.get('communication_context', {}).get('context_text', 'N/A')}
+    def _log_token_usage(self, operation: str, model: str, prompts: List[str], completion: str):
+        """Log prompt and completion token counts of one LLM call, counted with the model's encoder"""
+        prompt_tokens = sum(count_tokens(prompt, model) for prompt in prompts)
+        self.logger.info(
+            f"{operation} with {model}: {prompt_tokens} prompt tokens, "
+            f"{count_tokens(completion, model)} completion tokens"
+        )
 
-Pricing Analysis:
-- Predicted Base Price: {predicted_price:.2f} SEK
-- Prediction Confidence: {confidence:.2%}
-- Final Price (including margin): {final_price:.2f} SEK
+    async def _cached_llm_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """Look a completion up in the LLM cache, in a worker thread since SQLite reads block"""
+        if cache_key is None:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self.llm_cache.get, cache_key)
 
-Please generate a professional quote document that includes:
-1. A formal introduction
-2. Detailed product specifications
-3. Price breakdown and justification, including:
-   - Base price calculation
-   - Confidence level in the prediction
-   - Final price with margin
-4. Terms and conditions
-5. Validity period (30 days from quote date)
-6. Contact information
-7. Any special notes or considerations from the communication context
-"""
+    async def _store_llm_response(self, cache_key: Optional[str], model: str, temperature: float, response: str):
+        if cache_key is not None and response:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.llm_cache.put, cache_key, self.settings.ai_provider, model, temperature, response
+            )
+
+    def _prepare_quote_prompt(self, quote_data: dict) -> str:
+        """Prepare the prompt for quote text generation"""
+        product_specs = quote_data.get('product_specs', {})
+
+        if 'price_confidence' in quote_data:
+            # generate_quote_text already priced this quote
+            predicted_price = quote_data['predicted_price']
+            confidence = quote_data['price_confidence']
+            final_price = quote_data['final_price']
+        else:
+            # Get predicted price
+            price_prediction = self.predict_price(self._price_data(quote_data))
+            predicted_price = price_prediction['predicted_price']
+            confidence = price_prediction['confidence']
+
+            # Calculate final price (you can adjust this formula based on your business logic)
+            final_price = predicted_price * (1 + (1 - confidence) * 0.1)  # Add 10% margin for low confidence
+
+        customer = quote_data.get('customer', {})
+        # Pricing and who the quote is for are never trimmed, a long communication context is trimmed first
+        return (
+            PromptBuilder(self.settings.quote_prompt_max_tokens, self._quote_model())
+            .add("instructions", QUOTE_INSTRUCTIONS, static=True, trimmable=False)
+            .add("customer", "\n".join([
+                "Customer Information:",
+                f"- Company: {customer.get('company_name', 'N/A')}",
+                f"- Contact: {customer.get('contact_person', 'N/A')}",
+                f"- Email: {customer.get('email', 'N/A')}"
+            ]), trimmable=False)
+            .add("product", "\n".join([
+                "Product Specifications:",
+                f"- Description: {product_specs.get('description', 'N/A')}",
+                f"- Profile Type: {product_specs.get('profile_type', 'N/A')}",
+                f"- Alloy: {product_specs.get('alloy', 'N/A')}",
+                f"- Weight per meter: {product_specs.get('weight_per_meter', 'N/A')} kg",
+                f"- Total Length: {product_specs.get('total_length', 'N/A')} m",
+                f"- Surface Treatment: {product_specs.get('surface_treatment', 'N/A')}",
+                f"- Machining Complexity: {product_specs.get('machining_complexity', 'N/A')}"
+            ]), priority=1)
+            .add("pricing", "\n".join([
+                "Pricing Analysis:",
+                f"- Predicted Base Price: {predicted_price:.2f} SEK",
+                f"- Prediction Confidence: {confidence:.2%}",
+                f"- Final Price (including margin): {final_price:.2f} SEK"
+            ]), trimmable=False)
+            .add("communication_context", (
+                "Communication Context:\n"
+                f"{quote_data.get('communication_context', {}).get('context_text', 'N/A')}"
+            ), priority=0)
+            .build()
+            .text
+        )
 
     def _encode_complexity(self, complexity: str) -> int:
         """Encode machining complexity into numerical values"""
-        complexity_map = {
-            'low': 1,
-            'medium': 2,
-            'high': 3
-        }
-        return complexity_map.get(complexity.lower(), 2) 
\ No newline at end of file
+        return encode_complexity(complexity) 
\ No newline at end of file
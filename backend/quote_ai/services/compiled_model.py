@@ -0,0 +1,121 @@
+import logging
+from typing import Any, List, Optional
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+from quote_ai.services.feature_encoder import predict_encoded
+
+logger = logging.getLogger(__name__)
+
+class CompiledEnsemble:
+    """A fitted GradientBoostingRegressor flattened into contiguous node arrays.
+
+    All trees live in the same feature/threshold/left/right/value arrays. Leaves
+    point back at themselves, so every tree is walked in lockstep for exactly
+    max_depth steps with a few vectorized numpy ops and no per-tree Python loop.
+    Values are pre-multiplied by the learning rate.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, value: np.ndarray, roots: np.ndarray,
+                 init_value: float, max_depth: int, n_features: int,
+                 feature_names: Optional[List[str]] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.init_value = float(init_value)
+        self.max_depth = int(max_depth)
+        # Mirror sklearn's attributes so the FeatureEncoder can be built from either
+        self.n_features_in_ = int(n_features)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @staticmethod
+    def supports(model: Any) -> bool:
+        """Whether a model can be compiled by this engine"""
+        return isinstance(model, GradientBoostingRegressor) and hasattr(model, 'estimators_')
+
+    @classmethod
+    def compile(cls, model: GradientBoostingRegressor) -> "CompiledEnsemble":
+        """Flatten the fitted trees of a GradientBoostingRegressor"""
+        if not cls.supports(model):
+            raise TypeError(f"Cannot compile model of type {type(model).__name__}")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_[:, 0]:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0] * model.learning_rate)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        n_features = model.n_features_in_
+        init_value = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0, 0]
+        feature_names = getattr(model, 'feature_names_in_', None)
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            init_value=init_value,
+            max_depth=max_depth,
+            n_features=n_features,
+            feature_names=list(feature_names) if feature_names is not None else None
+        )
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict for a 2D feature matrix, matching GradientBoostingRegressor.predict"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if X.shape[0] == 1:
+            # Single row: walk all trees at once over a 1D node vector
+            x = X[0]
+            nodes = self.roots
+            for _ in range(self.max_depth):
+                go_left = x[self.feature[nodes]] <= self.threshold[nodes]
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            return np.array([self.init_value + self.value[nodes].sum()])
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.init_value + self.value[nodes].sum(axis=1)
+
+    def verify(self, model: Any, X: np.ndarray, tolerance: float = 1e-6) -> bool:
+        """Check the compiled predictions against sklearn on sample rows"""
+        expected = np.asarray(predict_encoded(model, X), dtype=np.float64)
+        actual = self.predict(X)
+        single = np.array([self.predict(row.reshape(1, -1))[0] for row in np.asarray(X)[:16]])
+        error = max(
+            float(np.max(np.abs(actual - expected), initial=0.0)),
+            float(np.max(np.abs(single - expected[:16]), initial=0.0))
+        )
+        scale = max(1.0, float(np.max(np.abs(expected), initial=0.0)))
+        if error > tolerance * scale:
+            logger.warning(f"Compiled model deviates from sklearn by {error:.3g}")
+            return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the node arrays"""
+        return sum(array.nbytes for array in (
+            self.feature, self.threshold, self.left, self.right, self.value, self.roots
+        ))
@@ -0,0 +1,296 @@
+import os
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from quote_ai.core.models import CustomerPricingFeatures, ProductSpecification, Quote
+from quote_ai.services.feature_encoder import CUSTOMER_FEATURES, MISSING_CUSTOMER_FEATURE
+from quote_ai.services.training_data_export import ACCEPTED_STATUSES
+from quote_ai.utils.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Quote history snapshot written next to the training bundle, for point-in-time features
+CUSTOMER_HISTORY_FILE = "customer_history.npz"
+COUNTER_COLUMNS = ('quote_count', 'priced_quote_count', 'price_per_kg_sum', 'accepted_quote_count')
+SECONDS_PER_DAY = 86400.0
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive UTC datetimes, PostgreSQL aware ones
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@dataclass(frozen=True)
+class QuoteContribution:
+    """What one quote adds to its customer's aggregates"""
+    customer_id: Optional[int]
+    price_per_kg: Optional[float]
+    accepted: bool
+    created_at: Optional[datetime]
+    quote_id: Optional[int] = None
+
+    @classmethod
+    def of(cls, quote: Quote, specs: Optional[Iterable[ProductSpecification]] = None) -> "QuoteContribution":
+        specs = quote.product_specs if specs is None else specs
+        kg = sum(
+            spec.weight_per_meter * spec.total_length for spec in specs
+            if spec.weight_per_meter is not None and spec.total_length is not None
+        )
+        price = quote.final_price if quote.final_price is not None else quote.predicted_price
+        return cls(
+            customer_id=quote.customer_id,
+            price_per_kg=price / kg if price is not None and kg > 0 else None,
+            accepted=quote.status in ACCEPTED_STATUSES,
+            created_at=_naive_utc(quote.created_at),
+            quote_id=quote.id
+        )
+
+@dataclass(frozen=True)
+class _Counters:
+    quote_count: int
+    priced_quote_count: int
+    price_per_kg_sum: float
+    accepted_quote_count: int
+    last_quote_at: Optional[datetime]
+
+    def features(self, now: datetime) -> Dict[str, float]:
+        return {
+            'customer_quote_count': float(self.quote_count),
+            'customer_avg_price_per_kg': (self.price_per_kg_sum / self.priced_quote_count
+                                          if self.priced_quote_count else MISSING_CUSTOMER_FEATURE),
+            'customer_acceptance_rate': (self.accepted_quote_count / self.quote_count
+                                         if self.quote_count else MISSING_CUSTOMER_FEATURE),
+            'customer_days_since_last_quote': ((now - self.last_quote_at).total_seconds() / SECONDS_PER_DAY
+                                               if self.last_quote_at else MISSING_CUSTOMER_FEATURE)
+        }
+
+MISSING_FEATURES = {column: MISSING_CUSTOMER_FEATURE for column in CUSTOMER_FEATURES}
+
+class CustomerFeatureStore:
+    """Per-customer pricing features, maintained on quote writes and served from memory.
+
+    Quote create, update and delete endpoints call apply() inside their
+    transaction; it turns the quote's old and new contribution into SQL-side
+    increments of the customer's row in customer_pricing_features, so the only
+    aggregate query is re-reading last_quote_at when a customer's latest quote
+    is deleted or moved to another customer. Reads go through a bounded in-process cache of
+    the counters (recency is derived at read time). Writes in this process
+    refresh their entries, entries written by other workers expire after ttl
+    and are re-read with a primary key lookup.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], ttl: float = 60.0, maxsize: int = 100_000):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._cache: Dict[int, Tuple[float, Optional[_Counters]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, db: Session, before: Optional[QuoteContribution],
+              after: Optional[QuoteContribution]) -> List[int]:
+        """Move a customer's counters from a quote's old contribution to its new one, without committing"""
+        deltas: Dict[int, Dict[str, float]] = {}
+
+        def add(contribution: Optional[QuoteContribution], sign: int):
+            if contribution is None or contribution.customer_id is None:
+                return
+            delta = deltas.setdefault(contribution.customer_id, dict.fromkeys(COUNTER_COLUMNS, 0))
+            delta['quote_count'] += sign
+            if contribution.price_per_kg is not None:
+                delta['priced_quote_count'] += sign
+                delta['price_per_kg_sum'] += sign * contribution.price_per_kg
+            if contribution.accepted:
+                delta['accepted_quote_count'] += sign
+
+        add(before, -1)
+        add(after, 1)
+        for customer_id, delta in deltas.items():
+            row = db.get(CustomerPricingFeatures, customer_id)
+            if row is None:
+                row = CustomerPricingFeatures(customer_id=customer_id, **dict.fromkeys(COUNTER_COLUMNS, 0))
+                db.add(row)
+                db.flush()
+            for column, value in delta.items():
+                if value:
+                    # Evaluated by the database, concurrent writers cannot lose each other's updates
+                    setattr(row, column, getattr(CustomerPricingFeatures, column) + value)
+            if (before is not None and before.customer_id == customer_id and before.created_at is not None
+                    and (after is None or after.customer_id != customer_id)
+                    and row.last_quote_at is not None and before.created_at >= _naive_utc(row.last_quote_at)):
+                # The customer's latest quote left, the latest of the rest takes its place
+                row.last_quote_at = db.query(func.max(Quote.created_at)).filter(
+                    Quote.customer_id == customer_id, Quote.id != before.quote_id
+                ).scalar()
+            created_at = after.created_at if after is not None and after.customer_id == customer_id else None
+            if created_at is not None and (row.last_quote_at is None or created_at > _naive_utc(row.last_quote_at)):
+                row.last_quote_at = created_at
+        return list(deltas)
+
+    def refresh(self, db: Session, customer_ids: Iterable[int]):
+        """Re-read customers' rows after the transaction that changed them committed"""
+        for customer_id in customer_ids:
+            row = db.get(CustomerPricingFeatures, customer_id, populate_existing=True)
+            self._put(customer_id, self._counters(row))
+
+    def features_for(self, customer_id: Optional[int]) -> Dict[str, float]:
+        """Model inputs for a customer, all missing for unknown customers or on lookup failure"""
+        if customer_id is None or (isinstance(customer_id, float) and np.isnan(customer_id)):
+            return MISSING_FEATURES
+        customer_id = int(customer_id)
+        entry = self._cache.get(customer_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            counters = entry[1]
+        else:
+            self.misses += 1
+            counters = self._load(customer_id)
+        return counters.features(datetime.utcnow()) if counters is not None else MISSING_FEATURES
+
+    def join_frame(self, specs: pd.DataFrame) -> pd.DataFrame:
+        """Specs with the customer feature columns added, one lookup per distinct customer"""
+        customer_ids = specs['customer_id'] if 'customer_id' in specs else pd.Series(None, index=specs.index)
+        features = {
+            customer_id: self.features_for(customer_id)
+            for customer_id in customer_ids.dropna().unique()
+        }
+        columns = {
+            column: customer_ids.map(lambda customer_id: features.get(customer_id, MISSING_FEATURES)[column])
+                                .fillna(MISSING_CUSTOMER_FEATURE).astype(float)
+            for column in CUSTOMER_FEATURES
+        }
+        return specs.assign(**columns)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._cache), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def _load(self, customer_id: int) -> Optional[_Counters]:
+        try:
+            db = self.session_factory()
+            try:
+                counters = self._counters(db.get(CustomerPricingFeatures, customer_id))
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"Customer feature lookup failed for customer {customer_id}: {str(e)}")
+            return None
+        self._put(customer_id, counters)
+        return counters
+
+    def _put(self, customer_id: int, counters: Optional[_Counters]):
+        with self._lock:
+            self._cache.pop(customer_id, None)
+            while len(self._cache) >= self.maxsize:
+                # Oldest insertion first, dicts keep insertion order
+                del self._cache[next(iter(self._cache))]
+            self._cache[customer_id] = (time.monotonic() + self.ttl, counters)
+
+    @staticmethod
+    def _counters(row: Optional[CustomerPricingFeatures]) -> Optional[_Counters]:
+        if row is None:
+            return None
+        return _Counters(
+            quote_count=row.quote_count,
+            priced_quote_count=row.priced_quote_count,
+            price_per_kg_sum=row.price_per_kg_sum,
+            accepted_quote_count=row.accepted_quote_count,
+            last_quote_at=_naive_utc(row.last_quote_at)
+        )
+
+def customer_history_frame(db: Session) -> pd.DataFrame:
+    """Every quote of a known customer with what it contributes to the aggregates, in one query"""
+    kg = (
+        select(
+            ProductSpecification.quote_id,
+            func.sum(ProductSpecification.weight_per_meter * ProductSpecification.total_length).label('kg')
+        )
+        .group_by(ProductSpecification.quote_id)
+        .subquery()
+    )
+    stmt = (
+        select(Quote.id, Quote.customer_id, Quote.created_at, Quote.status,
+               func.coalesce(Quote.final_price, Quote.predicted_price), kg.c.kg)
+        .outerjoin(kg, kg.c.quote_id == Quote.id)
+        .where(Quote.customer_id.isnot(None), Quote.created_at.isnot(None))
+    )
+    rows = db.execute(stmt).all()
+    history = pd.DataFrame(rows, columns=['quote_id', 'customer_id', 'created_at', 'status', 'price', 'kg'])
+    price = pd.to_numeric(history['price'], errors='coerce')
+    kg_values = pd.to_numeric(history['kg'], errors='coerce')
+    return pd.DataFrame({
+        'quote_id': history['quote_id'].astype(np.int64),
+        'customer_id': history['customer_id'].astype(np.int64),
+        'created_at': pd.to_datetime(history['created_at'].map(_naive_utc)),
+        'accepted': history['status'].isin(ACCEPTED_STATUSES),
+        'price_per_kg': (price / kg_values).where(kg_values > 0)
+    })
+
+def point_in_time_features(history: pd.DataFrame) -> pd.DataFrame:
+    """Customer features of every quote as they were just before it was created, indexed by quote_id.
+
+    Training on today's aggregates would let a quote see its own outcome.
+    """
+    h = history.sort_values(['customer_id', 'created_at', 'quote_id']).reset_index(drop=True)
+    h['priced'] = h['price_per_kg'].notna().astype(int)
+    h['price_per_kg_value'] = h['price_per_kg'].fillna(0.0)
+    h['accepted_count'] = h['accepted'].astype(int)
+    groups = h.groupby('customer_id', sort=False)
+    prior_quotes = groups.cumcount()
+    prior_priced = groups['priced'].cumsum() - h['priced']
+    prior_price_sum = groups['price_per_kg_value'].cumsum() - h['price_per_kg_value']
+    prior_accepted = groups['accepted_count'].cumsum() - h['accepted_count']
+    gap = (h['created_at'] - groups['created_at'].shift()).dt.total_seconds() / SECONDS_PER_DAY
+
+    features = pd.DataFrame({
+        'customer_quote_count': prior_quotes.astype(float),
+        'customer_avg_price_per_kg': (prior_price_sum / prior_priced).where(prior_priced > 0),
+        'customer_acceptance_rate': (prior_accepted / prior_quotes).where(prior_quotes > 0),
+        'customer_days_since_last_quote': gap
+    }).fillna(MISSING_CUSTOMER_FEATURE)
+    features.index = h['quote_id'].to_numpy()
+    features.index.name = 'quote_id'
+    return features
+
+def save_customer_history(export_dir: str, history: pd.DataFrame):
+    os.makedirs(export_dir, exist_ok=True)
+    np.savez_compressed(
+        os.path.join(export_dir, CUSTOMER_HISTORY_FILE),
+        quote_id=history['quote_id'].to_numpy(np.int64),
+        customer_id=history['customer_id'].to_numpy(np.int64),
+        created_at=history['created_at'].to_numpy('datetime64[us]').astype(np.int64),
+        accepted=history['accepted'].to_numpy(bool),
+        price_per_kg=history['price_per_kg'].to_numpy(np.float64)
+    )
+
+def load_customer_history(export_dir: str) -> Optional[pd.DataFrame]:
+    path = os.path.join(export_dir, CUSTOMER_HISTORY_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        history = pd.DataFrame({name: arrays[name] for name in arrays.files})
+    history['created_at'] = pd.to_datetime(history['created_at'], unit='us')
+    return history
+
+# Initialize store as None
+_feature_store = None
+
+def get_customer_feature_store(settings: Optional[Settings] = None) -> CustomerFeatureStore:
+    """Get or create the process-wide customer feature store"""
+    global _feature_store
+    if _feature_store is None:
+        from quote_ai.db.database import SessionLocal
+        settings = settings or get_settings()
+        _feature_store = CustomerFeatureStore(
+            SessionLocal,
+            ttl=settings.customer_feature_cache_ttl,
+            maxsize=settings.customer_feature_cache_size
+        )
+    return _feature_store
@@ -0,0 +1,221 @@
+import os
+import math
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from quote_ai.services.feature_encoder import COMPLEXITY_MAP, encode_complexity, known_categories
+
+NUMERIC_DRIFT_FEATURES = ('weight_per_meter', 'total_length')
+CATEGORICAL_DRIFT_FEATURES = ('alloy', 'surface_treatment', 'machining_complexity')
+# Quantile bins of the training distribution, each holds about a tenth of the reference
+DRIFT_BINS = 10
+# Bucket for categories the model was not trained on
+OTHER_CATEGORY = '__other__'
+# Floor for empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+# Conventional PSI reading: below 0.1 is stable, above 0.25 needs a retrain
+PSI_MODERATE = 0.1
+PSI_DRIFTED = 0.25
+# Scores over fewer observations than this are flagged as unreliable
+MIN_OBSERVATIONS = 100
+
+def drift_reference_path_for(model_path: str) -> str:
+    """Where the drift reference of a joblib model is stored"""
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.drift.json"
+
+def _categories(column: str) -> List[str]:
+    if column == 'machining_complexity':
+        return [str(code) for code in sorted(set(COMPLEXITY_MAP.values()))]
+    return known_categories(column)
+
+def _category_of(column: str, value: Any) -> str:
+    if column != 'machining_complexity':
+        return str(value)
+    try:
+        return str(int(encode_complexity(value)))
+    except (TypeError, ValueError):
+        return OTHER_CATEGORY
+
+class DriftReference:
+    """Input distributions of a model's training data, saved with the model.
+
+    Numeric features are summarized by quantile bin edges and the share of
+    training rows per bin, categorical ones by the share of each category.
+    """
+
+    def __init__(self, edges: Dict[str, List[float]], numeric: Dict[str, List[float]],
+                 categorical: Dict[str, Dict[str, float]], rows: int):
+        self.edges = edges
+        self.numeric = numeric
+        self.categorical = categorical
+        self.rows = rows
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, bins: int = DRIFT_BINS) -> "DriftReference":
+        edges, numeric, categorical = {}, {}, {}
+        for column in NUMERIC_DRIFT_FEATURES:
+            values = pd.to_numeric(df[column], errors='coerce').dropna().to_numpy(dtype=float)
+            cuts = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])) if len(values) else np.empty(0)
+            counts = np.bincount(np.searchsorted(cuts, values, side='right'), minlength=len(cuts) + 1)
+            edges[column] = cuts.tolist()
+            numeric[column] = (counts / max(len(values), 1)).tolist()
+        for column in CATEGORICAL_DRIFT_FEATURES:
+            observed = df[column].map(lambda value: _category_of(column, value)).value_counts(normalize=True)
+            categories = _categories(column)
+            shares = {category: float(observed.get(category, 0.0)) for category in categories}
+            shares[OTHER_CATEGORY] = float(observed[~observed.index.isin(categories)].sum())
+            categorical[column] = shares
+        return cls(edges, numeric, categorical, rows=len(df))
+
+    @classmethod
+    def from_dict(cls, values: Optional[Dict[str, Any]]) -> Optional["DriftReference"]:
+        if not values:
+            return None
+        return cls(values['edges'], values['numeric'], values['categorical'], values['rows'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'edges': self.edges, 'numeric': self.numeric, 'categorical': self.categorical, 'rows': self.rows}
+
+class _DriftCounts:
+    """Histograms of the inputs seen since one model version went live"""
+
+    def __init__(self, version: str, reference: DriftReference):
+        self.version = version
+        self.reference = reference
+        self.since = datetime.utcnow()
+        self.observations = 0
+        self.numeric = {column: [0] * (len(edges) + 1) for column, edges in reference.edges.items()}
+        self.category_index = {
+            column: {category: i for i, category in enumerate(shares)}
+            for column, shares in reference.categorical.items()
+        }
+        self.categorical = {column: [0] * len(index) for column, index in self.category_index.items()}
+
+    def observe(self, spec: Dict[str, Any]):
+        self.observations += 1
+        for column, edges in self.reference.edges.items():
+            try:
+                value = float(spec[column])
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.numeric[column][bisect_right(edges, value)] += 1
+        for column, index in self.category_index.items():
+            if column not in spec:
+                continue
+            category = _category_of(column, spec[column])
+            self.categorical[column][index.get(category, index[OTHER_CATEGORY])] += 1
+
+    def observe_frame(self, specs: pd.DataFrame):
+        self.observations += len(specs)
+        for column, edges in self.reference.edges.items():
+            values = pd.to_numeric(specs[column], errors='coerce').dropna().to_numpy(dtype=float)
+            counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+            histogram = self.numeric[column]
+            for i, count in enumerate(counts.tolist()):
+                histogram[i] += count
+        for column, index in self.category_index.items():
+            histogram = self.categorical[column]
+            other = index[OTHER_CATEGORY]
+            for category, count in specs[column].map(lambda value: _category_of(column, value)).value_counts().items():
+                histogram[index.get(category, other)] += int(count)
+
+class DriftMonitor:
+    """Online comparison of model inputs against the live model's training distributions.
+
+    Every observation is a few list increments into fixed-size histograms
+    (a bisect over the bin edges for numeric features), so memory is constant
+    and nothing is locked on the prediction path. Concurrent increments can
+    occasionally lose a count, which does not matter for distribution scores.
+    Counts restart whenever a different model version is swapped in.
+    """
+
+    def __init__(self):
+        self._counts: Optional[_DriftCounts] = None
+
+    def reset(self, version: str, reference: Optional[DriftReference]):
+        """Start counting against a new model's reference, or stop without one"""
+        self._counts = _DriftCounts(version, reference) if reference is not None else None
+
+    def observe(self, spec: Dict[str, Any]):
+        counts = self._counts
+        if counts is not None:
+            counts.observe(spec)
+
+    def observe_frame(self, specs: pd.DataFrame):
+        counts = self._counts
+        if counts is not None and len(specs):
+            counts.observe_frame(specs)
+
+    def report(self) -> Dict[str, Any]:
+        """PSI per feature, plus a binned KS statistic for the numeric ones"""
+        counts = self._counts
+        if counts is None:
+            return {"enabled": False, "model_version": None, "observations": 0, "features": {}}
+        reference = counts.reference
+        features = {}
+        for column, edges in reference.edges.items():
+            expected = reference.numeric[column]
+            observed = list(counts.numeric[column])
+            features[column] = {
+                **_scores(expected, observed),
+                "ks": _binned_ks(expected, observed),
+                "edges": edges,
+                "reference": expected,
+                "observed": observed
+            }
+        for column, shares in reference.categorical.items():
+            expected = list(shares.values())
+            observed = list(counts.categorical[column])
+            features[column] = {
+                **_scores(expected, observed),
+                "categories": list(shares),
+                "reference": expected,
+                "observed": observed
+            }
+        return {
+            "enabled": True,
+            "model_version": counts.version,
+            "since": counts.since.isoformat(),
+            "observations": counts.observations,
+            "reference_rows": reference.rows,
+            "sufficient_data": counts.observations >= MIN_OBSERVATIONS,
+            "features": features
+        }
+
+def _scores(expected: List[float], observed: List[int]) -> Dict[str, Any]:
+    psi = _psi(expected, observed)
+    if psi is None:
+        status = None
+    elif psi >= PSI_DRIFTED:
+        status = "drifted"
+    elif psi >= PSI_MODERATE:
+        status = "moderate"
+    else:
+        status = "stable"
+    return {"psi": psi, "status": status}
+
+def _psi(expected: List[float], observed: List[int]) -> Optional[float]:
+    total = sum(observed)
+    if total == 0:
+        return None
+    psi = 0.0
+    for reference_share, count in zip(expected, observed):
+        e = max(reference_share, PSI_EPSILON)
+        a = max(count / total, PSI_EPSILON)
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+def _binned_ks(expected: List[float], observed: List[int]) -> Optional[float]:
+    """Largest CDF gap at the bin edges, a lower bound on the exact KS statistic"""
+    total = sum(observed)
+    if total == 0:
+        return None
+    gap = expected_cdf = observed_cdf = 0.0
+    for reference_share, count in zip(expected, observed):
+        expected_cdf += reference_share
+        observed_cdf += count / total
+        gap = max(gap, abs(observed_cdf - expected_cdf))
+    return gap
@@ -0,0 +1,48 @@
+import numpy as np
+from quote_ai.services.feature_encoder import FeatureEncoder
+
+class FallbackPricer:
+    """Deterministic rule-of-thumb pricer used until a trained model is available.
+
+    Price is the profile's total weight times a per-kg rate for the alloy, scaled
+    by surface treatment and machining complexity. It exposes the same predict /
+    feature_names_in_ surface as the sklearn model so it slots into the registry.
+    """
+
+    # Conservative confidence so the quote margin stays wide while we guess
+    CONFIDENCE = 0.5
+
+    RATE_PER_KG = {'6060': 5.5, '6063': 5.8, '6082': 6.5}  # SEK
+    TREATMENT_FACTOR = {'raw': 1.0, 'anodized': 1.15, 'painted': 1.2}
+    COMPLEXITY_FACTOR = {1: 1.0, 2: 1.1, 3: 1.25}
+    DEFAULT_RATE_PER_KG = 6.0
+
+    def __init__(self):
+        encoder = FeatureEncoder.default()
+        self.feature_names_in_ = np.asarray(encoder.feature_names, dtype=object)
+        self.n_features_in_ = encoder.n_features
+        index = {name: i for i, name in enumerate(encoder.feature_names)}
+        self._weight = index['weight_per_meter']
+        self._length = index['total_length']
+        self._complexity = index['machining_complexity']
+        self._alloys = np.array([index[f"alloy_{alloy}"] for alloy in self.RATE_PER_KG])
+        self._alloy_rates = np.array(list(self.RATE_PER_KG.values()))
+        self._treatments = np.array([index[f"surface_treatment_{t}"] for t in self.TREATMENT_FACTOR])
+        self._treatment_factors = np.array(list(self.TREATMENT_FACTOR.values()))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Price each encoded row with the rule of thumb"""
+        X = np.asarray(X, dtype=np.float64)
+        weight = X[:, self._weight] * X[:, self._length]
+
+        alloy_hot = X[:, self._alloys]
+        rate = alloy_hot @ self._alloy_rates
+        rate = np.where(alloy_hot.sum(axis=1) > 0, rate, self.DEFAULT_RATE_PER_KG)
+
+        treatment_hot = X[:, self._treatments]
+        treatment = np.where(treatment_hot.sum(axis=1) > 0, treatment_hot @ self._treatment_factors, 1.0)
+
+        complexity = np.clip(np.rint(X[:, self._complexity]), 1, 3)
+        complexity_factor = np.choose(complexity.astype(int) - 1, list(self.COMPLEXITY_FACTOR.values()))
+
+        return weight * rate * treatment * complexity_factor
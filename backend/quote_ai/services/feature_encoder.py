@@ -0,0 +1,194 @@
+import warnings
+from typing import Any, Dict, List, Optional, Sequence, Tuple, get_args
+import numpy as np
+import pandas as pd
+from quote_ai.core.schemas import ProductSpecificationBase
+
+COMPLEXITY_MAP = {'low': 1, 'medium': 2, 'high': 3}
+DEFAULT_COMPLEXITY = 2
+
+NUMERIC_FEATURES = ['weight_per_meter', 'total_length', 'machining_complexity']
+CATEGORICAL_FEATURES = ['surface_treatment', 'alloy']
+# Optional per-customer aggregates, see services.customer_features
+CUSTOMER_FEATURES = [
+    'customer_quote_count', 'customer_avg_price_per_kg',
+    'customer_acceptance_rate', 'customer_days_since_last_quote'
+]
+# Value of a customer feature that is unknown, e.g. a new or anonymous customer
+MISSING_CUSTOMER_FEATURE = -1.0
+
+def encode_complexity(complexity: Any) -> float:
+    """Encode machining complexity into numerical values"""
+    if isinstance(complexity, str):
+        return COMPLEXITY_MAP.get(complexity.lower(), DEFAULT_COMPLEXITY)
+    return float(complexity)
+
+def predict_encoded(model: Any, X: np.ndarray) -> np.ndarray:
+    """Score a feature matrix built by a FeatureEncoder.
+
+    Models are fitted on named frames but scored on plain arrays, whose column
+    order the encoder already guarantees, so sklearn's feature name warning is
+    silenced for this call only.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+        return model.predict(X)
+
+def known_categories(column: str) -> List[str]:
+    """Allowed values of a categorical spec field, taken from the API schema"""
+    return list(get_args(ProductSpecificationBase.model_fields[column].annotation))
+
+class FeatureEncoder:
+    """Maps product specifications straight onto a model's feature columns.
+
+    The column layout is resolved once from the model's feature names, so encoding
+    a spec is a handful of indexed writes into a copy of a preallocated row instead
+    of building a DataFrame and running get_dummies per request. A categorical field
+    is one-hot encoded as `<field>_<value>` columns, or ordinal encoded (unknown
+    values become NaN) when the layout has a column named after the field itself.
+    Customer feature columns are filled from the spec when the layout has them,
+    missing values become MISSING_CUSTOMER_FEATURE.
+    """
+
+    def __init__(self, feature_names: Sequence[str]):
+        self.feature_names = [str(name) for name in feature_names]
+        self.n_features = len(self.feature_names)
+        index = {name: i for i, name in enumerate(self.feature_names)}
+
+        self._numeric = [(column, index[column]) for column in NUMERIC_FEATURES if column in index]
+        # Value -> column index for each one-hot encoded categorical field
+        self._one_hot: Dict[str, Dict[str, int]] = {}
+        # Column index and value -> code for each ordinal encoded categorical field
+        self._ordinal: Dict[str, Tuple[int, Dict[str, int]]] = {}
+        for column in CATEGORICAL_FEATURES:
+            if column in index:
+                codes = {value: code for code, value in enumerate(known_categories(column))}
+                self._ordinal[column] = (index[column], codes)
+                self._one_hot[column] = {}
+                continue
+            prefix = f"{column}_"
+            self._one_hot[column] = {
+                name[len(prefix):]: i for name, i in index.items() if name.startswith(prefix)
+            }
+        self._customer = [(column, index[column]) for column in CUSTOMER_FEATURES if column in index]
+        self._template = np.zeros((1, self.n_features), dtype=np.float64)
+        for _, i in self._customer:
+            self._template[0, i] = MISSING_CUSTOMER_FEATURE
+
+    @classmethod
+    def default(cls, customer_features: bool = False) -> "FeatureEncoder":
+        """Encoder for the canonical training layout, with every known category"""
+        feature_names = list(NUMERIC_FEATURES)
+        for column in CATEGORICAL_FEATURES:
+            feature_names.extend(f"{column}_{value}" for value in known_categories(column))
+        if customer_features:
+            feature_names.extend(CUSTOMER_FEATURES)
+        return cls(feature_names)
+
+    @classmethod
+    def ordinal(cls, customer_features: bool = False) -> "FeatureEncoder":
+        """Encoder with one integer-coded column per categorical field, for native categorical support"""
+        return cls(NUMERIC_FEATURES + CATEGORICAL_FEATURES + (CUSTOMER_FEATURES if customer_features else []))
+
+    @property
+    def uses_customer_features(self) -> bool:
+        """Whether the model was trained with per-customer aggregates"""
+        return bool(self._customer)
+
+    @property
+    def categorical_mask(self) -> List[bool]:
+        """Which columns hold ordinal category codes"""
+        ordinal_columns = {i for i, _ in self._ordinal.values()}
+        return [i in ordinal_columns for i in range(self.n_features)]
+
+    @classmethod
+    def from_model(cls, model: Any) -> Optional["FeatureEncoder"]:
+        """Build the encoder matching a fitted model's feature columns"""
+        if model is None:
+            return None
+        feature_names = getattr(model, 'feature_names_in_', None)
+        if feature_names is None:
+            # Fitted on a bare array, assume it used the canonical layout
+            return cls.default()
+        return cls(list(feature_names))
+
+    def encode(self, spec: Dict[str, Any]) -> np.ndarray:
+        """Encode a single spec dict into a (1, n_features) row"""
+        row = self._template.copy()
+        for column, i in self._numeric:
+            value = spec[column]
+            row[0, i] = encode_complexity(value) if column == 'machining_complexity' else float(value)
+        for column, columns in self._one_hot.items():
+            i = columns.get(str(spec[column]))
+            if i is not None:
+                row[0, i] = 1.0
+        for column, (i, codes) in self._ordinal.items():
+            row[0, i] = codes.get(str(spec[column]), np.nan)
+        for column, i in self._customer:
+            value = spec.get(column)
+            if value is not None and not np.isnan(value):
+                row[0, i] = float(value)
+        return row
+
+    def encode_frame(self, specs: pd.DataFrame) -> np.ndarray:
+        """Encode a frame of specs into an (n_rows, n_features) matrix in one pass"""
+        features = np.zeros((len(specs), self.n_features), dtype=np.float64)
+        for column, i in self._numeric:
+            values = specs[column]
+            if column == 'machining_complexity' and not pd.api.types.is_numeric_dtype(values):
+                values = values.astype(str).str.lower().map(COMPLEXITY_MAP).fillna(DEFAULT_COMPLEXITY)
+            features[:, i] = values.to_numpy(dtype=np.float64)
+        rows = np.arange(len(specs))
+        for column, columns in self._one_hot.items():
+            positions = specs[column].astype(str).map(columns).to_numpy(dtype=np.float64)
+            known = ~np.isnan(positions)
+            features[rows[known], positions[known].astype(np.intp)] = 1.0
+        for column, (i, codes) in self._ordinal.items():
+            features[:, i] = specs[column].astype(str).map(codes).to_numpy(dtype=np.float64)
+        for column, i in self._customer:
+            if column in specs:
+                values = pd.to_numeric(specs[column], errors='coerce').fillna(MISSING_CUSTOMER_FEATURE)
+                features[:, i] = values.to_numpy(dtype=np.float64)
+            else:
+                features[:, i] = MISSING_CUSTOMER_FEATURE
+        return features
+
+    def decode_frame(self, features: np.ndarray) -> pd.DataFrame:
+        """Recover spec values from encoded rows, so another layout can re-encode them.
+
+        Categories the encoder did not know come back as None.
+        """
+        specs = pd.DataFrame({column: features[:, i] for column, i in self._numeric})
+        for column, columns in self._one_hot.items():
+            if column in self._ordinal:
+                continue
+            values = np.full(len(features), None, dtype=object)
+            for value, i in columns.items():
+                values[features[:, i] == 1.0] = value
+            specs[column] = values
+        for column, (i, codes) in self._ordinal.items():
+            categories = np.array(list(codes), dtype=object)
+            values = np.full(len(features), None, dtype=object)
+            known = ~np.isnan(features[:, i])
+            values[known] = categories[features[known, i].astype(np.intp)]
+            specs[column] = values
+        for column, i in self._customer:
+            specs[column] = features[:, i]
+        return specs
+
+    def sample_rows(self, n_rows: int, seed: int = 0) -> np.ndarray:
+        """Random but plausible encoded rows, used to verify alternative inference engines"""
+        rng = np.random.default_rng(seed)
+        specs = pd.DataFrame({
+            'weight_per_meter': rng.uniform(0.1, 10.0, n_rows),
+            'total_length': rng.uniform(1.0, 1000.0, n_rows),
+            'machining_complexity': rng.integers(1, 4, n_rows),
+        })
+        for column in CATEGORICAL_FEATURES:
+            values = list(self._one_hot[column]) or known_categories(column)
+            specs[column] = rng.choice(values, n_rows)
+        return self.encode_frame(specs)
+
+    def to_frame(self, features: np.ndarray) -> pd.DataFrame:
+        """Wrap an encoded matrix with column names, for fitting sklearn models"""
+        return pd.DataFrame(features, columns=self.feature_names)
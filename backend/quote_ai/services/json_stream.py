@@ -0,0 +1,117 @@
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\r\n"
+
+class JSONObjectStreamParser:
+    """Parses a JSON object as it streams in, reporting each top-level field once its value is complete.
+
+    Feed it text pieces in order; feed() returns the (key, value) pairs that
+    completed within them. Anything before the opening brace (a code fence, a
+    sentence of preamble) is skipped, and nested values are reported whole
+    once their closing bracket arrives. Values that do not parse are logged
+    and skipped.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self.started = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # What comes next at the top level: key, colon, value, string_value, scalar, nested or comma
+        self._expect = "key"
+        self._key: Optional[str] = None
+        self._start = 0
+
+    def feed(self, piece: str) -> List[Tuple[str, Any]]:
+        fields: List[Tuple[str, Any]] = []
+        self._text += piece
+        text = self._text
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            char = text[i]
+            self._pos += 1
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._expect == "key":
+                        self._key = self._load(text[self._start:i + 1])
+                        self._expect = "colon"
+                    elif self._expect == "string_value":
+                        self._complete(text[self._start:i + 1], fields)
+                continue
+            if self._expect == "nested":
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._complete(text[self._start:i + 1], fields)
+                continue
+            if self._expect == "scalar":
+                if char in ",}" or char in _WHITESPACE:
+                    self._complete(text[self._start:i].strip(), fields)
+                    self._after_value(char)
+                continue
+            if char in _WHITESPACE:
+                continue
+            if self._expect in ("key", "comma"):
+                if char == '"' and self._expect == "key":
+                    self._in_string = True
+                    self._start = i
+                elif char == ",":
+                    self._expect = "key"
+                elif char == "}":
+                    self.done = True
+            elif self._expect == "colon":
+                if char == ":":
+                    self._expect = "value"
+            elif self._expect == "value":
+                self._start = i
+                if char == '"':
+                    self._in_string = True
+                    self._expect = "string_value"
+                elif char in "{[":
+                    self._depth += 1
+                    self._expect = "nested"
+                else:
+                    self._expect = "scalar"
+        return fields
+
+    def _complete(self, raw: str, fields: List[Tuple[str, Any]]):
+        try:
+            fields.append((self._key, json.loads(raw)))
+        except ValueError:
+            logger.warning(f"Skipping unparseable value of streamed field {self._key!r}: {raw[:80]}")
+        self._key = None
+        self._expect = "comma"
+
+    def _after_value(self, char: str):
+        if char == ",":
+            self._expect = "key"
+        elif char == "}":
+            self.done = True
+
+    @staticmethod
+    def _load(raw: str) -> Optional[str]:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
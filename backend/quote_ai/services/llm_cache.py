@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+from quote_ai.utils.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Evict down to this share of max_entries so a full cache does not evict on every store
+EVICTION_TARGET = 0.9
+
+class LLMResponseCache:
+    """Disk-backed cache of LLM completions, in a local SQLite file.
+
+    Keys hash the provider, model, temperature and the prompt with whitespace
+    normalized, so re-indented or re-wrapped prompts share an entry. Entries
+    expire after ttl seconds; when more than max_entries are stored the least
+    recently read ones are evicted. Only temperature 0 calls are cached unless
+    cache_nondeterministic is set, since sampled completions are meant to vary.
+    The database is opened on first use.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 10000,
+                 cache_nondeterministic: bool = False):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_nondeterministic = cache_nondeterministic
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bypassed = 0
+        self.uncacheable = 0
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, temperature: Optional[float]) -> str:
+        normalized = " ".join(prompt.split())
+        prompt_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return hashlib.sha256(json.dumps([provider, model, prompt_hash, temperature]).encode("utf-8")).hexdigest()
+
+    def cacheable(self, temperature: Optional[float]) -> bool:
+        """Whether calls at this temperature may be answered from the cache"""
+        if temperature == 0 or self.cache_nondeterministic:
+            return True
+        self.uncacheable += 1
+        return False
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] + self.ttl < now:
+                if row is not None:
+                    connection.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE llm_responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, provider: str, model: str, temperature: Optional[float], response: str):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_responses "
+                "(key, provider, model, temperature, response, created_at, accessed_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, provider, model, temperature, response, now, now)
+            )
+            self.stores += 1
+            count = connection.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - int(self.max_entries * EVICTION_TARGET)
+                # Expired entries go first, then the least recently read
+                connection.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    "SELECT key FROM llm_responses ORDER BY created_at + ? < ? DESC, accessed_at LIMIT ?)",
+                    (self.ttl, now, excess)
+                )
+                self.evictions += excess
+
+    def clear(self) -> int:
+        with self._lock:
+            return self._connect().execute("DELETE FROM llm_responses").rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = (
+                self._connection.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+                if self._connection is not None else None
+            )
+        return {
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bypassed": self.bypassed,
+            "uncacheable": self.uncacheable
+        }
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit, every statement is its own transaction
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, provider TEXT, model TEXT, temperature REAL, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_accessed_at ON llm_responses (accessed_at)")
+            self._connection = connection
+        return self._connection
+
+# Initialize cache as None
+_llm_cache = None
+
+def get_llm_cache(settings: Optional[Settings] = None) -> Optional[LLMResponseCache]:
+    """Get or create the process-wide LLM response cache, None when disabled"""
+    global _llm_cache
+    settings = settings or get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache(
+            settings.llm_cache_path,
+            ttl=settings.llm_cache_ttl,
+            max_entries=settings.llm_cache_max_entries,
+            cache_nondeterministic=settings.llm_cache_nondeterministic
+        )
+    return _llm_cache
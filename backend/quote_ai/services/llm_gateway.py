@@ -0,0 +1,276 @@
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+import aiohttp
+import openai
+from quote_ai.utils.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Provider responses worth retrying: overload, rate limiting and gateway failures
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Transport and server side failures of the OpenAI SDK, its own retries are disabled
+RETRYABLE_OPENAI_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+class LLMUnavailableError(Exception):
+    """The gateway refused an LLM call without sending it: queue full, wait timed out or circuit open"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMProviderError(Exception):
+    """An LLM provider answered with an error status"""
+
+    def __init__(self, provider: str, status: int, detail: str):
+        super().__init__(f"{provider} returned {status}: {detail}")
+        self.provider = provider
+        self.status = status
+        self.detail = detail
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRYABLE_STATUSES
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an LLM call failure is transient, and so also counts against the provider's health"""
+    if isinstance(error, LLMProviderError):
+        return error.retryable
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError) + RETRYABLE_OPENAI_ERRORS)
+
+class CircuitBreaker:
+    """Stops calling a provider after consecutive transient failures.
+
+    Closed until failure_threshold failures in a row, then open (every call
+    refused) for reset_timeout seconds, then half open: one probe call goes
+    through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 1.0)
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+                logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """A call let through ended without an outcome (cancelled), let the next one probe"""
+        if self.state == "half_open":
+            self.state = "open"
+
+class _ProviderGate:
+    def __init__(self, max_concurrency: int, max_queue: int, breaker: CircuitBreaker):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.short_circuited = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "short_circuited": self.short_circuited,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "circuit_opened": self.breaker.opened
+        }
+
+class LLMGateway:
+    """Admission control in front of every LLM call.
+
+    Each provider gets a semaphore sized to what it can serve at once (a local
+    Ollama only runs a few generations in parallel) and a bounded wait queue;
+    calls beyond that, or waiting longer than queue_timeout, are refused with
+    LLMUnavailableError instead of piling up. Transient failures are retried
+    with full-jitter exponential backoff, sleeping outside the semaphore, and
+    feed a per-provider circuit breaker.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.max_attempts = settings.llm_max_attempts
+        self.backoff_base = settings.llm_backoff_base
+        self.backoff_max = settings.llm_backoff_max
+        self.queue_timeout = settings.llm_queue_timeout
+        self._gates: Dict[str, _ProviderGate] = {}
+
+    async def call(self, provider: str, operation: Callable[[], Awaitable[T]]) -> T:
+        """Run one LLM request through the provider's gate, retrying transient failures"""
+        gate = self._gate(provider)
+        for attempt in range(self.max_attempts):
+            self._admit(provider, gate)
+            outcome_recorded = False
+            try:
+                async with self._slot(provider, gate):
+                    result = await operation()
+                gate.breaker.record_success()
+                outcome_recorded = True
+                gate.completed += 1
+                return result
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                outcome_recorded = True
+                if not is_retryable(e):
+                    # The provider answered, the request itself was bad
+                    gate.breaker.record_success()
+                    gate.failed += 1
+                    raise
+                gate.breaker.record_failure()
+                if attempt == self.max_attempts - 1:
+                    gate.failed += 1
+                    raise
+                delay = self._backoff(attempt)
+                gate.retries += 1
+                logger.warning(
+                    f"{provider} call failed ({str(e) or type(e).__name__}), "
+                    f"retry {attempt + 1}/{self.max_attempts - 1} in {delay:.2f}s"
+                )
+            finally:
+                if not outcome_recorded:
+                    gate.breaker.abandon()
+            await asyncio.sleep(delay)
+
+    async def stream(self, provider: str, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Relay a streamed LLM response, holding a slot until it ends.
+
+        Opening the stream is retried like call(); once a piece was relayed a
+        failure is raised as is, since the consumer already has partial output.
+        """
+        gate = self._gate(provider)
+        for attempt in range(self.max_attempts):
+            self._admit(provider, gate)
+            started = outcome_recorded = False
+            try:
+                async with self._slot(provider, gate):
+                    async for piece in open_stream():
+                        started = True
+                        yield piece
+                gate.breaker.record_success()
+                outcome_recorded = True
+                gate.completed += 1
+                return
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                outcome_recorded = True
+                if not is_retryable(e):
+                    gate.breaker.record_success()
+                    gate.failed += 1
+                    raise
+                gate.breaker.record_failure()
+                if started or attempt == self.max_attempts - 1:
+                    gate.failed += 1
+                    raise
+                delay = self._backoff(attempt)
+                gate.retries += 1
+                logger.warning(f"{provider} stream failed to start ({str(e) or type(e).__name__}), retrying in {delay:.2f}s")
+            finally:
+                if not outcome_recorded:
+                    gate.breaker.abandon()
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {provider: gate.to_dict() for provider, gate in self._gates.items()}
+
+    def _gate(self, provider: str) -> _ProviderGate:
+        gate = self._gates.get(provider)
+        if gate is None:
+            concurrency = {
+                "openai": self.settings.llm_max_concurrency_openai,
+                "ollama": self.settings.llm_max_concurrency_ollama
+            }
+            gate = self._gates[provider] = _ProviderGate(
+                concurrency.get(provider, 1),
+                self.settings.llm_max_queue,
+                CircuitBreaker(self.settings.llm_breaker_failures, self.settings.llm_breaker_reset_seconds)
+            )
+        return gate
+
+    def _admit(self, provider: str, gate: _ProviderGate):
+        if not gate.breaker.allow():
+            gate.short_circuited += 1
+            raise LLMUnavailableError(f"{provider} circuit is open after repeated failures",
+                                      retry_after=gate.breaker.retry_after())
+
+    @asynccontextmanager
+    async def _slot(self, provider: str, gate: _ProviderGate):
+        if gate.semaphore.locked():
+            if gate.queued >= gate.max_queue:
+                gate.rejected += 1
+                raise LLMUnavailableError(f"{provider} is at capacity, {gate.queued} calls already waiting",
+                                          retry_after=self.backoff_max)
+            gate.queued += 1
+            try:
+                await asyncio.wait_for(gate.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                gate.rejected += 1
+                raise LLMUnavailableError(f"Timed out waiting {self.queue_timeout:.0f}s for a {provider} slot",
+                                          retry_after=self.backoff_max) from None
+            finally:
+                gate.queued -= 1
+        else:
+            await gate.semaphore.acquire()
+        gate.in_flight += 1
+        try:
+            yield
+        finally:
+            gate.in_flight -= 1
+            gate.semaphore.release()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform over [0, base * 2^attempt], capped, so retries spread out"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+# Initialize gateway as None
+_llm_gateway = None
+
+def get_llm_gateway(settings: Optional[Settings] = None) -> LLMGateway:
+    """Get or create the process-wide LLM gateway"""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway(settings or get_settings())
+    return _llm_gateway
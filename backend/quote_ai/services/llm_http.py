@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+import aiohttp
+import httpx
+from quote_ai.utils.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+class LLMHttpClients:
+    """App-scoped keep-alive HTTP clients for the LLM providers.
+
+    Ollama calls share one aiohttp session and OpenAI calls one httpx client,
+    so requests and retries reuse pooled connections instead of paying TCP
+    (and TLS) setup every time. Both are opened on startup and closed on
+    shutdown; the aiohttp session is bound to the event loop it was created
+    on and is recreated if used from another one.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._ollama: Optional[aiohttp.ClientSession] = None
+        self._ollama_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._openai: Optional[httpx.AsyncClient] = None
+        self.ollama_requests = 0
+        self.ollama_connections_opened = 0
+        self.ollama_connections_reused = 0
+        self.openai_requests = 0
+
+    async def start(self):
+        """Open the pools up front so the first LLM call does not pay for it"""
+        await self.ollama_session()
+        self.openai_http_client()
+
+    async def close(self):
+        if self._ollama is not None and not self._ollama.closed:
+            await self._ollama.close()
+        self._ollama = self._ollama_loop = None
+        if self._openai is not None and not self._openai.is_closed:
+            await self._openai.aclose()
+        self._openai = None
+
+    async def ollama_session(self) -> aiohttp.ClientSession:
+        """The shared Ollama session, created on first use"""
+        loop = asyncio.get_running_loop()
+        if self._ollama is None or self._ollama.closed or self._ollama_loop is not loop:
+            if self._ollama is not None and not self._ollama.closed and self._ollama_loop is not loop:
+                logger.warning("Ollama session used from a different event loop, opening a new one")
+            self._ollama = self._create_ollama_session()
+            self._ollama_loop = loop
+        return self._ollama
+
+    def openai_http_client(self) -> httpx.AsyncClient:
+        """The shared httpx client handed to AsyncOpenAI"""
+        if self._openai is None or self._openai.is_closed:
+            self._openai = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.settings.llm_max_connections,
+                    # OpenAI is a single host, so the per-host limit caps the idle pool
+                    max_keepalive_connections=self.settings.llm_max_connections_per_host,
+                    keepalive_expiry=self.settings.llm_keepalive_seconds
+                ),
+                timeout=httpx.Timeout(self.settings.llm_request_timeout, connect=10.0),
+                event_hooks={"request": [self._count_openai_request]}
+            )
+        return self._openai
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limits": {
+                "max_connections": self.settings.llm_max_connections,
+                "max_connections_per_host": self.settings.llm_max_connections_per_host,
+                "keepalive_seconds": self.settings.llm_keepalive_seconds
+            },
+            "ollama": self._ollama_stats(),
+            "openai": self._openai_stats()
+        }
+
+    def _create_ollama_session(self) -> aiohttp.ClientSession:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_ollama_request)
+        trace.on_connection_create_end.append(self._on_ollama_connection_created)
+        trace.on_connection_reuseconn.append(self._on_ollama_connection_reused)
+        connector = aiohttp.TCPConnector(
+            limit=self.settings.llm_max_connections,
+            limit_per_host=self.settings.llm_max_connections_per_host,
+            keepalive_timeout=self.settings.llm_keepalive_seconds
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.settings.llm_request_timeout),
+            trace_configs=[trace]
+        )
+
+    async def _on_ollama_request(self, session, context, params):
+        self.ollama_requests += 1
+
+    async def _on_ollama_connection_created(self, session, context, params):
+        self.ollama_connections_opened += 1
+
+    async def _on_ollama_connection_reused(self, session, context, params):
+        self.ollama_connections_reused += 1
+
+    async def _count_openai_request(self, request: httpx.Request):
+        self.openai_requests += 1
+
+    def _ollama_stats(self) -> Dict[str, Any]:
+        session = self._ollama
+        stats = {
+            "open": session is not None and not session.closed,
+            "requests": self.ollama_requests,
+            "connections_opened": self.ollama_connections_opened,
+            "connections_reused": self.ollama_connections_reused
+        }
+        connector = session.connector if stats["open"] else None
+        if connector is not None:
+            # Private aiohttp bookkeeping, reported best effort
+            idle = getattr(connector, '_conns', {})
+            stats["idle_connections"] = sum(len(connections) for connections in idle.values())
+            stats["active_connections"] = len(getattr(connector, '_acquired', ()))
+        return stats
+
+    def _openai_stats(self) -> Dict[str, Any]:
+        client = self._openai
+        stats = {"open": client is not None and not client.is_closed, "requests": self.openai_requests}
+        # Private httpx/httpcore bookkeeping, reported best effort
+        pool = getattr(getattr(client, '_transport', None), '_pool', None) if stats["open"] else None
+        connections = getattr(pool, 'connections', None)
+        if connections is not None:
+            idle = sum(1 for connection in connections if connection.is_idle())
+            stats["idle_connections"] = idle
+            stats["active_connections"] = len(connections) - idle
+        return stats
+
+# Initialize clients as None
+_llm_clients = None
+
+def get_llm_clients(settings: Optional[Settings] = None) -> LLMHttpClients:
+    """Get or create the process-wide LLM HTTP clients"""
+    global _llm_clients
+    if _llm_clients is None:
+        _llm_clients = LLMHttpClients(settings or get_settings())
+    return _llm_clients
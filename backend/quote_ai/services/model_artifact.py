@@ -0,0 +1,356 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import joblib
+from quote_ai.services.compiled_model import CompiledEnsemble
+from quote_ai.services.feature_encoder import FeatureEncoder, predict_encoded
+from quote_ai.services.prediction_intervals import IntervalModel, interval_path_for
+from quote_ai.services.drift_monitor import drift_reference_path_for
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+# Model paths with these suffixes are single pickled files rather than artifact directories
+LEGACY_SUFFIXES = ('.joblib', '.pkl')
+ENSEMBLE_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+# Models the flat-array engine cannot represent are stored pickled inside the version
+PICKLED_FILES = {'model': 'model.joblib', 'intervals': 'intervals.joblib'}
+# The fitted sklearn estimators behind flattened arrays, served unless the compiled engine is enabled
+ESTIMATOR_FILES = {'model': 'estimator.joblib', 'intervals': 'interval_estimators.joblib'}
+# Sample rows whose sklearn predictions go into the manifest, to check the arrays against on load
+VERIFICATION_ROWS = 16
+
+def is_legacy_path(model_path: str) -> bool:
+    """Whether a model path names a joblib file rather than a versioned artifact directory"""
+    return model_path.endswith(LEGACY_SUFFIXES)
+
+def legacy_path_for(model_path: str) -> str:
+    """The joblib file served for a model path when no versioned artifact exists yet"""
+    return model_path if is_legacy_path(model_path) else f"{os.path.normpath(model_path)}.joblib"
+
+def save_model(model_path: str, model: Any, intervals: Optional[IntervalModel] = None,
+               metrics: Optional[Dict[str, Any]] = None,
+               training_watermark: Optional[Dict[str, Any]] = None,
+               drift_reference: Optional[Dict[str, Any]] = None,
+               retention: Optional[int] = None) -> str:
+    """Persist a trained model in the format its path calls for, returning where it went"""
+    if is_legacy_path(model_path):
+        # Companions first so a watching registry never sees a new model next to stale intervals
+        os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+        if intervals is not None:
+            joblib.dump(intervals, interval_path_for(model_path))
+        if drift_reference is not None:
+            with open(drift_reference_path_for(model_path), 'w') as f:
+                json.dump(drift_reference, f)
+        joblib.dump(model, model_path)
+        return model_path
+    store = ModelArtifactStore(model_path, retention=retention)
+    manifest = store.save(model, intervals=intervals, metrics=metrics, training_watermark=training_watermark,
+                          drift_reference=drift_reference)
+    return store.version_dir(manifest['version'])
+
+class ModelArtifactStore:
+    """Versioned model artifacts that load with mmap_mode.
+
+    Every version is a directory of raw .npy arrays (the model flattened by
+    CompiledEnsemble) next to a manifest with its content hash, feature names,
+    training metrics, training data watermark, input distributions for drift
+    monitoring and creation time. A LATEST file names the live version
+    and is replaced atomically. With the compiled inference engine, workers
+    serve straight from the memory-mapped read-only arrays and share them
+    through the OS page cache, nothing is unpickled. The fitted sklearn
+    estimators are kept next to the arrays for the sklearn engine, which
+    unpickles a private copy in every worker, and for warm start retraining.
+    Models CompiledEnsemble cannot flatten are kept as uncompressed joblib
+    pickles in the version, whose numpy buffers still load memory-mapped.
+
+        <root>/LATEST
+        <root>/<version>/manifest.json
+        <root>/<version>/<ensemble>.<array>.npy   (or model.joblib, intervals.joblib)
+        <root>/<version>/estimator.joblib
+        <root>/<version>/interval_estimators.joblib
+
+    With a retention count, each save prunes all but that many of the newest
+    versions; the version LATEST points at is always kept.
+    """
+
+    def __init__(self, root: str, retention: Optional[int] = None):
+        self.root = root
+        self.retention = retention
+
+    @property
+    def latest_path(self) -> str:
+        return os.path.join(self.root, LATEST_FILE)
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.root, version)
+
+    def latest(self) -> Optional[str]:
+        """The version LATEST points at, or None when nothing was saved yet"""
+        try:
+            with open(self.latest_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def manifest(self, version: Optional[str] = None) -> Dict[str, Any]:
+        version = version or self._require_latest()
+        with open(os.path.join(self.version_dir(version), MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def save(self, model: Any, intervals: Optional[IntervalModel] = None,
+             metrics: Optional[Dict[str, Any]] = None,
+             training_watermark: Optional[Dict[str, Any]] = None,
+             drift_reference: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Write a new version and point LATEST at it"""
+        ensembles = self._flatten(model, intervals)
+        feature_names = getattr(model, 'feature_names_in_', None)
+        feature_names = [str(name) for name in feature_names] if feature_names is not None else None
+        interval_meta = None
+        if intervals is not None:
+            interval_meta = {'alpha': intervals.alpha, 'correction': intervals.correction}
+        verification = None
+        if ensembles is not None and not isinstance(model, CompiledEnsemble):
+            verification = self._verification(model, intervals)
+
+        os.makedirs(self.root, exist_ok=True)
+        # Build the version off to the side, readers only ever see complete directories
+        staging = os.path.join(self.root, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            headers = None
+            if ensembles is not None:
+                headers = {
+                    name: {
+                        'init_value': ensemble.init_value,
+                        'max_depth': ensemble.max_depth,
+                        'n_features': ensemble.n_features_in_
+                    }
+                    for name, ensemble in ensembles.items()
+                }
+                files = {
+                    f"{name}.{field}.npy": getattr(ensemble, field)
+                    for name, ensemble in ensembles.items() for field in ENSEMBLE_ARRAYS
+                }
+                for file_name, array in files.items():
+                    np.save(os.path.join(staging, file_name), array)
+            else:
+                files = {PICKLED_FILES['model']: model}
+                if intervals is not None:
+                    files[PICKLED_FILES['intervals']] = intervals
+                for file_name, obj in files.items():
+                    joblib.dump(obj, os.path.join(staging, file_name))
+
+            # The version is a hash of everything that affects predictions
+            digest = hashlib.sha256(json.dumps(
+                {'headers': headers, 'intervals': interval_meta, 'feature_names': feature_names},
+                sort_keys=True
+            ).encode())
+            for file_name in sorted(files):
+                digest.update(file_name.encode())
+                with open(os.path.join(staging, file_name), 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(block)
+            sha256 = digest.hexdigest()
+            version = sha256[:12]
+
+            manifest = {
+                'format': ARTIFACT_FORMAT,
+                'version': version,
+                'sha256': sha256,
+                'created_at': datetime.utcnow().isoformat(),
+                'model_type': type(model).__name__,
+                'engine': 'arrays' if ensembles is not None else 'joblib',
+                'feature_names': feature_names,
+                'metrics': metrics or {},
+                'ensembles': headers,
+                'intervals': interval_meta,
+                # Newest training row the model has seen, where incremental retraining resumes
+                'training_watermark': training_watermark,
+                'drift_reference': drift_reference,
+                'verification': verification
+            }
+            target = self.version_dir(version)
+            if os.path.isdir(target):
+                # Same arrays as an earlier save, but the metrics and watermark are this run's
+                if verification is None:
+                    manifest['verification'] = self.manifest(version).get('verification')
+                self._write_manifest(target, manifest)
+            else:
+                if ensembles is not None and not isinstance(model, CompiledEnsemble):
+                    joblib.dump(model, os.path.join(staging, ESTIMATOR_FILES['model']))
+                    if intervals is not None and not isinstance(intervals.lower, CompiledEnsemble):
+                        joblib.dump(intervals, os.path.join(staging, ESTIMATOR_FILES['intervals']))
+                self._write_manifest(staging, manifest)
+                os.rename(staging, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._point_latest_at(version)
+        logger.info(f"Saved model artifact version {version} to {target}")
+        if self.retention:
+            self.prune(self.retention)
+        return manifest
+
+    def versions(self) -> List[str]:
+        """Saved versions, oldest first"""
+        created = []
+        for name in os.listdir(self.root):
+            if name.startswith('.') or not os.path.isfile(os.path.join(self.version_dir(name), MANIFEST_FILE)):
+                continue
+            created.append((self.manifest(name).get('created_at', ''), name))
+        return [name for _, name in sorted(created)]
+
+    def prune(self, keep: int) -> List[str]:
+        """Delete all but the newest keep versions and the live one, returning what was deleted"""
+        latest = self.latest()
+        versions = self.versions()
+        stale = [version for version in versions[:max(len(versions) - keep, 0)] if version != latest]
+        for version in stale:
+            # Workers still serving a deleted version keep their open memory maps
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
+        if stale:
+            logger.info(f"Pruned {len(stale)} old model artifact versions from {self.root}")
+        return stale
+
+    def load(self, version: Optional[str] = None,
+             mmap_mode: Optional[str] = 'r') -> Tuple[Dict[str, Any], Any, Optional[IntervalModel]]:
+        """Load a version (LATEST by default) into its fitted sklearn model and intervals"""
+        version = version or self._require_latest()
+        manifest = self._checked_manifest(version)
+        directory = self.version_dir(version)
+        files = PICKLED_FILES if manifest.get('engine', 'arrays') == 'joblib' else ESTIMATOR_FILES
+        if not os.path.exists(os.path.join(directory, files['model'])):
+            # Saved from a CompiledEnsemble, the flat arrays are all there is
+            model, intervals = self.load_compiled(version, mmap_mode)
+            return manifest, model, intervals
+
+        model = joblib.load(os.path.join(directory, files['model']), mmap_mode=mmap_mode)
+        intervals = None
+        if manifest.get('intervals') is not None:
+            if os.path.exists(os.path.join(directory, files['intervals'])):
+                intervals = joblib.load(os.path.join(directory, files['intervals']), mmap_mode=mmap_mode)
+            else:
+                intervals = self.load_compiled(version, mmap_mode)[1]
+        return manifest, model, intervals
+
+    def load_compiled(self, version: Optional[str] = None,
+                      mmap_mode: Optional[str] = 'r') -> Tuple[Optional[CompiledEnsemble], Optional[IntervalModel]]:
+        """Memory-map a version's flat arrays into the compiled engine, (None, None) for pickled models"""
+        version = version or self._require_latest()
+        manifest = self._checked_manifest(version)
+        if manifest.get('engine', 'arrays') == 'joblib':
+            return None, None
+
+        directory = self.version_dir(version)
+        feature_names = manifest.get('feature_names')
+        ensembles = {}
+        for name, header in manifest['ensembles'].items():
+            arrays = {
+                field: np.load(os.path.join(directory, f"{name}.{field}.npy"), mmap_mode=mmap_mode)
+                for field in ENSEMBLE_ARRAYS
+            }
+            ensembles[name] = CompiledEnsemble(feature_names=feature_names, **arrays, **header)
+
+        intervals = None
+        if manifest.get('intervals') is not None:
+            intervals = IntervalModel(ensembles['lower'], ensembles['upper'], **manifest['intervals'])
+        return ensembles['model'], intervals
+
+    @staticmethod
+    def verify(manifest: Dict[str, Any], model: CompiledEnsemble, intervals: Optional[IntervalModel] = None,
+               tolerance: float = 1e-6) -> bool:
+        """Check loaded flat arrays against the sklearn predictions recorded when the version was saved"""
+        verification = manifest.get('verification')
+        if verification is None:
+            return False
+        rows = np.asarray(verification['rows'], dtype=np.float64)
+        ensembles = {'model': model}
+        if intervals is not None:
+            ensembles.update(lower=intervals.lower, upper=intervals.upper)
+        for name, ensemble in ensembles.items():
+            if name not in verification:
+                return False
+            expected = np.asarray(verification[name], dtype=np.float64)
+            error = float(np.max(np.abs(ensemble.predict(rows) - expected), initial=0.0))
+            if error > tolerance * max(1.0, float(np.max(np.abs(expected), initial=0.0))):
+                return False
+        return True
+
+    def load_estimator(self, version: Optional[str] = None) -> Any:
+        """The fitted sklearn estimator of a version, fully in memory so it can keep training"""
+        version = version or self._require_latest()
+        directory = self.version_dir(version)
+        engine = self.manifest(version).get('engine', 'arrays')
+        path = os.path.join(directory, PICKLED_FILES['model'] if engine == 'joblib' else ESTIMATOR_FILES['model'])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model artifact version {version} has no trainable estimator")
+        return joblib.load(path)
+
+    @staticmethod
+    def _flatten(model: Any, intervals: Optional[IntervalModel]) -> Optional[Dict[str, CompiledEnsemble]]:
+        """The flat-array ensembles to store, or None when the model has to be pickled"""
+        if not (isinstance(model, CompiledEnsemble) or CompiledEnsemble.supports(model)):
+            return None
+        ensembles = {'model': model if isinstance(model, CompiledEnsemble) else CompiledEnsemble.compile(model)}
+        if intervals is not None:
+            compiled_intervals = intervals if isinstance(intervals.lower, CompiledEnsemble) else intervals.compiled()
+            if compiled_intervals is None:
+                return None
+            ensembles['lower'] = compiled_intervals.lower
+            ensembles['upper'] = compiled_intervals.upper
+        return ensembles
+
+    def _checked_manifest(self, version: str) -> Dict[str, Any]:
+        manifest = self.manifest(version)
+        if manifest.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported model artifact format {manifest.get('format')} in {version}")
+        return manifest
+
+    @staticmethod
+    def _verification(model: Any, intervals: Optional[IntervalModel]) -> Dict[str, Any]:
+        rows = FeatureEncoder.from_model(model).sample_rows(VERIFICATION_ROWS)
+        verification = {'rows': rows, 'model': predict_encoded(model, rows)}
+        if intervals is not None:
+            verification['lower'] = predict_encoded(intervals.lower, rows)
+            verification['upper'] = predict_encoded(intervals.upper, rows)
+        return verification
+
+    @staticmethod
+    def _write_manifest(directory: str, manifest: Dict[str, Any]):
+        # Written aside and renamed over, readers never see a half-written manifest
+        temp_path = os.path.join(directory, f".{MANIFEST_FILE}-{uuid.uuid4().hex}")
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, default=_json_default)
+        os.replace(temp_path, os.path.join(directory, MANIFEST_FILE))
+
+    def _require_latest(self) -> str:
+        version = self.latest()
+        if version is None:
+            raise FileNotFoundError(f"No model artifact found in {self.root}")
+        return version
+
+    def _point_latest_at(self, version: str):
+        temp_path = os.path.join(self.root, f".{LATEST_FILE}-{uuid.uuid4().hex}")
+        with open(temp_path, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.latest_path)
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars show up in metrics and best_params
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
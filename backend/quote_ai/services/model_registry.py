@@ -0,0 +1,372 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import joblib
+from quote_ai.utils.config import Settings, get_settings
+from quote_ai.services.feature_encoder import FeatureEncoder
+from quote_ai.services.compiled_model import CompiledEnsemble
+from quote_ai.services.prediction_intervals import IntervalModel, interval_path_for
+from quote_ai.services.fallback_pricer import FallbackPricer
+from quote_ai.services.model_artifact import ModelArtifactStore, MANIFEST_FILE, is_legacy_path, legacy_path_for
+from quote_ai.services.shadow_scoring import ShadowScorer
+from quote_ai.services.drift_monitor import DriftMonitor, DriftReference, drift_reference_path_for
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """An immutable view of the model that is currently being served"""
+    model: Any
+    version: str
+    loaded_at: datetime
+    source: Optional[str] = None
+    mtime: Optional[float] = None
+    encoder: Optional[FeatureEncoder] = None
+    compiled: Optional[CompiledEnsemble] = None
+    intervals: Optional[IntervalModel] = None
+    compiled_intervals: Optional[IntervalModel] = None
+    drift_reference: Optional[DriftReference] = None
+
+    @property
+    def fallback(self) -> bool:
+        """Whether this is the rule-of-thumb pricer rather than a trained model"""
+        return isinstance(self.model, FallbackPricer)
+
+class ModelRegistry:
+    """Process-wide holder for the live price prediction model.
+
+    Readers grab the current snapshot without locking; reloads build a new
+    snapshot off to the side and swap it in with a single assignment, so
+    in-flight predictions keep using the model they started with.
+
+    A shadow model can be loaded next to the live one. It is never served,
+    but scores the same encoded features in the background so its prices
+    can be compared against production traffic before it is promoted.
+    """
+
+    def __init__(self, model_path: str, reload_interval: Optional[float] = None,
+                 inference_engine: str = "sklearn", shadow_queue_size: int = 1024):
+        self.logger = logging.getLogger(__name__)
+        self.model_path = model_path
+        # Directory paths hold versioned mmap artifacts, existing joblib files still load
+        self.artifact_store = None if is_legacy_path(model_path) else ModelArtifactStore(model_path)
+        self.legacy_path = legacy_path_for(model_path)
+        self.reload_interval = reload_interval
+        self.inference_engine = inference_engine
+        self._snapshot: Optional[ModelSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+        self._memory_versions = 0
+        self._listeners: List[Callable[[ModelSnapshot], None]] = []
+        self._shadow: Optional[ModelSnapshot] = None
+        self.shadow_scorer = ShadowScorer(queue_size=shadow_queue_size)
+        # Inputs seen by the live model against the distributions it was trained on
+        self.drift_monitor = DriftMonitor()
+
+    @property
+    def snapshot(self) -> Optional[ModelSnapshot]:
+        """The published snapshot, without checking the artifact for changes"""
+        return self._snapshot
+
+    @property
+    def ready(self) -> bool:
+        """Whether a trained model (not the fallback pricer) is being served"""
+        snapshot = self._snapshot
+        return snapshot is not None and snapshot.model is not None and not snapshot.fallback
+
+    def current(self) -> Optional[ModelSnapshot]:
+        """Return the live snapshot, scheduling a reload if the artifact changed"""
+        if self.reload_interval is not None:
+            now = time.monotonic()
+            if now - self._last_check >= self.reload_interval:
+                self._last_check = now
+                self._check_for_update()
+        return self._snapshot
+
+    def subscribe(self, listener: Callable[[ModelSnapshot], None]):
+        """Call listener with the new snapshot whenever a different model is swapped in"""
+        self._listeners.append(listener)
+
+    def load(self) -> ModelSnapshot:
+        """Load the model artifact from disk and publish it"""
+        with self._reload_lock:
+            return self._load_from_disk()
+
+    def publish(self, model: Any, source: Optional[str] = None,
+                intervals: Optional[IntervalModel] = None,
+                drift_reference: Optional[DriftReference] = None) -> ModelSnapshot:
+        """Swap in an already loaded model, e.g. one that was just trained"""
+        if source is not None and os.path.isdir(source):
+            # Artifact version directories are named after their content hash
+            version = os.path.basename(os.path.normpath(source))
+            mtime = None
+        elif source is not None and os.path.exists(source):
+            version = self._file_version(source)
+            mtime = os.path.getmtime(source)
+        elif isinstance(model, FallbackPricer):
+            version = "fallback"
+            mtime = None
+        else:
+            self._memory_versions += 1
+            version = f"memory-{self._memory_versions}"
+            mtime = None
+        snapshot = self._make_snapshot(model, version, source, mtime, intervals, drift_reference)
+        self._swap(snapshot)
+        self.logger.info(f"Published price model version {version}")
+        return snapshot
+
+    @property
+    def shadow(self) -> Optional[ModelSnapshot]:
+        return self._shadow
+
+    def load_shadow(self, path: str) -> ModelSnapshot:
+        """Load a shadow model from a joblib file, an artifact directory or one of its versions"""
+        if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            store = ModelArtifactStore(os.path.dirname(os.path.normpath(path)))
+            version = os.path.basename(os.path.normpath(path))
+            snapshot = self._artifact_snapshot(store, version, path, None)
+        else:
+            snapshot = ModelRegistry(path, inference_engine=self.inference_engine).load()
+        self._shadow = snapshot
+        self.logger.info(f"Loaded shadow price model version {snapshot.version} from {path}")
+        return snapshot
+
+    def load_shadow_version(self, version: str) -> ModelSnapshot:
+        """Shadow a version saved in this registry's artifact store, e.g. one that was never promoted"""
+        if self.artifact_store is None:
+            raise FileNotFoundError("Model path is not a versioned artifact directory")
+        path = self.artifact_store.version_dir(version)
+        # Plain version names only, never a path out of the store
+        if os.path.basename(version) != version or not os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            raise FileNotFoundError(f"No model artifact version {version}")
+        return self.load_shadow(path)
+
+    def clear_shadow(self):
+        self._shadow = None
+        self.logger.info("Shadow price model unloaded")
+
+    def submit_shadow(self, live: ModelSnapshot, features, live_prices):
+        """Hand features the live model just scored to the shadow scorer, never blocks"""
+        shadow = self._shadow
+        if shadow is None or live.fallback:
+            return
+        self.shadow_scorer.submit(live, shadow, features, live_prices)
+
+    def shadow_status(self) -> Dict[str, Any]:
+        shadow = self._shadow
+        return {
+            "loaded": shadow is not None,
+            "version": shadow.version if shadow else None,
+            "source": shadow.source if shadow else None,
+            "loaded_at": shadow.loaded_at.isoformat() if shadow else None,
+            **self.shadow_scorer.stats()
+        }
+
+    def _watched_path(self) -> str:
+        """The file whose mtime signals a new model: LATEST, or the joblib artifact"""
+        if self.artifact_store is not None and os.path.exists(self.artifact_store.latest_path):
+            return self.artifact_store.latest_path
+        return self.legacy_path
+
+    def _load_from_disk(self) -> ModelSnapshot:
+        if self.artifact_store is not None and self.artifact_store.latest() is not None:
+            return self._load_artifact()
+
+        mtime = os.path.getmtime(self.legacy_path)
+        version = self._file_version(self.legacy_path)
+        current = self._snapshot
+        if current is not None and current.version == version:
+            # Touched but not changed, keep the model we already have
+            self._snapshot = replace(current, mtime=mtime)
+            return self._snapshot
+
+        model = joblib.load(self.legacy_path)
+        intervals = self._load_intervals()
+        snapshot = self._make_snapshot(model, version, self.legacy_path, mtime, intervals,
+                                       self._load_drift_reference())
+        self._swap(snapshot)
+        self.logger.info(f"Loaded price model version {version} from {self.legacy_path}")
+        return snapshot
+
+    def _load_artifact(self) -> ModelSnapshot:
+        """Load the version LATEST points at"""
+        mtime = os.path.getmtime(self.artifact_store.latest_path)
+        version = self.artifact_store.latest()
+        current = self._snapshot
+        if current is not None and current.version == version:
+            self._snapshot = replace(current, mtime=mtime)
+            return self._snapshot
+
+        source = self.artifact_store.version_dir(version)
+        snapshot = self._artifact_snapshot(self.artifact_store, version, source, mtime)
+        self._swap(snapshot)
+        self.logger.info(f"Loaded price model version {version} from {source}")
+        return snapshot
+
+    def _artifact_snapshot(self, store: ModelArtifactStore, version: str, source: str,
+                           mtime: Optional[float]) -> ModelSnapshot:
+        """Snapshot of an artifact version.
+
+        With the compiled engine the memory-mapped flat arrays serve on their
+        own once they match the predictions recorded at save time; nothing is
+        unpickled, so workers share the pages. Otherwise the fitted estimators
+        are unpickled into this worker's memory.
+        """
+        manifest = store.manifest(version)
+        drift_reference = DriftReference.from_dict(manifest.get('drift_reference'))
+        if self.inference_engine == "compiled":
+            compiled, compiled_intervals = store.load_compiled(version)
+            if compiled is not None:
+                if store.verify(manifest, compiled, compiled_intervals):
+                    return self._make_snapshot(compiled, version, source, mtime, compiled_intervals, drift_reference)
+                self.logger.warning(f"Model artifact {version} failed verification, serving with sklearn")
+        _, model, intervals = store.load(version)
+        return self._make_snapshot(model, version, source, mtime, intervals, drift_reference)
+
+    def _load_intervals(self) -> Optional[IntervalModel]:
+        """Load the interval companions saved next to the model, if there are any"""
+        intervals_path = interval_path_for(self.legacy_path)
+        if not os.path.exists(intervals_path):
+            return None
+        intervals = joblib.load(intervals_path)
+        if not isinstance(intervals, IntervalModel):
+            self.logger.warning(f"Ignoring unexpected interval artifact at {intervals_path}")
+            return None
+        return intervals
+
+    def _load_drift_reference(self) -> Optional[DriftReference]:
+        """Training distributions saved next to a joblib model, older models have none"""
+        try:
+            with open(drift_reference_path_for(self.legacy_path)) as f:
+                return DriftReference.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable drift reference: {str(e)}")
+            return None
+
+    def _swap(self, snapshot: ModelSnapshot):
+        self._snapshot = snapshot
+        self.drift_monitor.reset(snapshot.version, snapshot.drift_reference)
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                self.logger.error(f"Model swap listener failed: {str(e)}")
+
+    def _make_snapshot(self, model: Any, version: str, source: Optional[str],
+                       mtime: Optional[float], intervals: Optional[IntervalModel] = None,
+                       drift_reference: Optional[DriftReference] = None) -> ModelSnapshot:
+        """Build everything a snapshot needs before it becomes visible to readers"""
+        encoder = FeatureEncoder.from_model(model)
+        if isinstance(model, CompiledEnsemble):
+            # Memory-mapped from an artifact, it already is the flat-array engine
+            compiled = model
+            compiled_intervals = None
+            if intervals is not None and isinstance(intervals.lower, CompiledEnsemble):
+                compiled_intervals = intervals
+        else:
+            compiled = self._compile(model, encoder)
+            if compiled is not None and intervals is not None:
+                compiled_intervals = self._compile_intervals(intervals, encoder)
+            else:
+                compiled_intervals = None
+        return ModelSnapshot(
+            model=model,
+            version=version,
+            loaded_at=datetime.utcnow(),
+            source=source,
+            mtime=mtime,
+            encoder=encoder,
+            compiled=compiled,
+            intervals=intervals,
+            compiled_intervals=compiled_intervals,
+            drift_reference=drift_reference
+        )
+
+    def _compile(self, model: Any, encoder: Optional[FeatureEncoder]) -> Optional[CompiledEnsemble]:
+        """Compile the model for the flat-array engine if enabled, verified against sklearn"""
+        if self.inference_engine != "compiled" or not CompiledEnsemble.supports(model):
+            return None
+        try:
+            compiled = CompiledEnsemble.compile(model)
+            if not compiled.verify(model, encoder.sample_rows(256)):
+                self.logger.warning("Compiled model failed verification, serving with sklearn")
+                return None
+            return compiled
+        except Exception as e:
+            self.logger.error(f"Error compiling price model: {str(e)}")
+            return None
+
+    def _compile_intervals(self, intervals: IntervalModel,
+                           encoder: FeatureEncoder) -> Optional[IntervalModel]:
+        try:
+            compiled = intervals.compiled()
+            if compiled is None:
+                return None
+            rows = encoder.sample_rows(256)
+            if not (compiled.lower.verify(intervals.lower, rows) and compiled.upper.verify(intervals.upper, rows)):
+                self.logger.warning("Compiled interval models failed verification, serving with sklearn")
+                return None
+            return compiled
+        except Exception as e:
+            self.logger.error(f"Error compiling interval models: {str(e)}")
+            return None
+
+    def _check_for_update(self):
+        """Start a background reload if the artifact's mtime moved"""
+        try:
+            mtime = os.path.getmtime(self._watched_path())
+        except OSError:
+            return
+        current = self._snapshot
+        if current is not None and current.mtime == mtime:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            # Another reload is already in progress
+            return
+        thread = threading.Thread(target=self._reload_in_background, daemon=True)
+        thread.start()
+
+    def _reload_in_background(self):
+        try:
+            self._load_from_disk()
+        except Exception as e:
+            self.logger.error(f"Error reloading price model: {str(e)}")
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def _file_version(path: str) -> str:
+        """Content hash of the artifact, used as the model version"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()[:12]
+
+# Initialize registry as None
+_registry = None
+
+def get_model_registry(settings: Optional[Settings] = None) -> ModelRegistry:
+    """Get the process-wide model registry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        settings = settings or get_settings()
+        _registry = ModelRegistry(
+            settings.model_path,
+            reload_interval=settings.model_reload_interval,
+            inference_engine=settings.inference_engine,
+            shadow_queue_size=settings.shadow_queue_size
+        )
+        if settings.shadow_model_path:
+            try:
+                _registry.load_shadow(settings.shadow_model_path)
+            except Exception as e:
+                # A broken candidate must never keep the live model from serving
+                _registry.logger.error(f"Error loading shadow price model: {str(e)}")
+    return _registry
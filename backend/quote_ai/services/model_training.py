@@ -1,22 +1,79 @@
 import os
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, GridSearchCV
+from scipy.stats import loguniform, randint
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401, enables the Halving*SearchCV imports
+from sklearn.model_selection import train_test_split, GridSearchCV, HalvingGridSearchCV, HalvingRandomSearchCV
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 from datetime import datetime
 from quote_ai.utils.config import Settings
+from quote_ai.services.feature_encoder import (
+    CUSTOMER_FEATURES, MISSING_CUSTOMER_FEATURE, FeatureEncoder, encode_complexity
+)
+from quote_ai.services.prediction_intervals import IntervalModel
+from quote_ai.services.model_artifact import ModelArtifactStore, is_legacy_path, legacy_path_for, save_model
+from quote_ai.services.training_data_export import TrainingDataExporter
+from quote_ai.services.drift_monitor import DriftReference
+from quote_ai.services.customer_features import (
+    customer_history_frame, load_customer_history, point_in_time_features, save_customer_history
+)
+from sqlalchemy.orm import Session
+
+SEARCH_STRATEGIES = ('grid', 'halving_grid', 'halving_random')
+ESTIMATORS = ('gradient_boosting', 'hist_gradient_boosting')
+# Same number of candidates as the exhaustive grid, halving 27 -> 9 -> 3 -> 1
+HALVING_RANDOM_CANDIDATES = 27
+INCREMENTAL_MODES = ('warm_start', 'window')
+
+PARAM_GRIDS = {
+    'gradient_boosting': {
+        'n_estimators': [50, 100, 200],
+        'learning_rate': [0.01, 0.1, 0.2],
+        'max_depth': [3, 4, 5]
+    },
+    'hist_gradient_boosting': {
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63],
+        'min_samples_leaf': [5, 20, 50]
+    }
+}
+
+PARAM_DISTRIBUTIONS = {
+    'gradient_boosting': {
+        'n_estimators': randint(50, 300),
+        'learning_rate': loguniform(0.01, 0.3),
+        'max_depth': randint(2, 7)
+    },
+    'hist_gradient_boosting': {
+        'learning_rate': loguniform(0.02, 0.3),
+        'max_leaf_nodes': randint(8, 128),
+        'min_samples_leaf': randint(5, 60),
+        'l2_regularization': loguniform(1e-4, 1.0)
+    }
+}
+
+class ModelTrainingError(Exception):
+    """Training or evaluating the price model failed"""
 
 class ModelTrainingService:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, n_jobs: int = -1):
         self.settings = settings
+        # Parallelism of the hyperparameter search, training jobs pass their CPU budget
+        self.n_jobs = n_jobs
         self.logger = logging.getLogger(__name__)
         self.model_path = settings.model_path
         self.training_data_path = "data/training_data.csv"
+        self.training_exporter = TrainingDataExporter(
+            settings.training_export_dir,
+            chunk_size=settings.training_export_chunk_size
+        )
         self.model = None
+        self.saved_path: Optional[str] = None
 
     def prepare_training_data(self, quotes: List[Dict[str, Any]]) -> pd.DataFrame:
         """Prepare training data from historical quotes"""
@@ -43,64 +100,252 @@ class ModelTrainingService:
             self.logger.error(f"Error preparing training data: {str(e)}")
             raise
 
-    def train_model(self, df: pd.DataFrame = None) -> Dict[str, float]:
+    def export_training_data(self, db: Session) -> Dict[str, Any]:
+        """Stream approved quotes changed since the last export into the columnar bundle"""
+        try:
+            manifest = self.training_exporter.export(db)
+            # Small (one row per quote), rewritten whole so point-in-time features see every quote
+            save_customer_history(self.training_exporter.export_dir, customer_history_frame(db))
+            return manifest
+        except Exception as e:
+            self.logger.error(f"Error exporting training data: {str(e)}")
+            raise
+
+    def load_training_data(self) -> pd.DataFrame:
+        """The exported training bundle if there is one, else the prepared CSV"""
+        if self.training_exporter.manifest()['parts']:
+            return self.training_exporter.load_frame()
+        return pd.read_csv(self.training_data_path)
+
+    def with_customer_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add each quote's customer features as they were when it was created"""
+        history = load_customer_history(self.training_exporter.export_dir) if 'quote_id' in df else None
+        if history is None or history.empty:
+            self.logger.warning("No customer history exported, training with missing customer features")
+            return df.assign(**{column: MISSING_CUSTOMER_FEATURE for column in CUSTOMER_FEATURES})
+        features = point_in_time_features(history)
+        df = df.drop(columns=[column for column in CUSTOMER_FEATURES if column in df])
+        df = df.join(features, on='quote_id')
+        return df.fillna({column: MISSING_CUSTOMER_FEATURE for column in CUSTOMER_FEATURES})
+
+    def train_model(self, df: pd.DataFrame = None, search: Optional[str] = None,
+                    estimator: Optional[str] = None) -> Dict[str, float]:
         """Train the price prediction model"""
         try:
+            search = search or self.settings.training_search
+            estimator = estimator or self.settings.training_estimator
+            if search not in SEARCH_STRATEGIES:
+                raise ValueError(f"Unsupported search strategy: {search}")
+            if estimator not in ESTIMATORS:
+                raise ValueError(f"Unsupported estimator: {estimator}")
+
             if df is None:
-                df = pd.read_csv(self.training_data_path)
+                df = self.load_training_data()
+            customer_features = self.settings.training_customer_features
+            if customer_features:
+                df = self.with_customer_features(df)
 
-            # Feature engineering
-            X = pd.get_dummies(df[['weight_per_meter', 'total_length', 'machining_complexity',
-                                 'surface_treatment', 'alloy']])
+            # Feature engineering, shared with serving so both encode identically.
+            # Histogram boosting handles categoricals natively, so it skips the one-hot expansion
+            if estimator == 'hist_gradient_boosting':
+                encoder = FeatureEncoder.ordinal(customer_features)
+            else:
+                encoder = FeatureEncoder.default(customer_features)
+            X = encoder.to_frame(encoder.encode_frame(df))
             y = df['price']
 
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
             # Hyperparameter tuning
-            param_grid = {
-                'n_estimators': [50, 100, 200],
-                'learning_rate': [0.01, 0.1, 0.2],
-                'max_depth': [3, 4, 5]
-            }
+            base_estimator = self._build_estimator(estimator, encoder)
+            param_search = self._build_search(search, estimator, base_estimator)
+            param_search.fit(X_train, y_train)
+            self.model = param_search.best_estimator_
 
-            grid_search = GridSearchCV(
-                GradientBoostingRegressor(),
-                param_grid,
-                cv=5,
-                scoring='neg_mean_squared_error',
-                n_jobs=-1
-            )
-
-            grid_search.fit(X_train, y_train)
-            self.model = grid_search.best_estimator_
+            # Quantile companions for prediction intervals, with the same hyperparameters
+            params = {**base_estimator.get_params(), **param_search.best_params_}
+            intervals = IntervalModel.fit(X_train, y_train, params, estimator=type(base_estimator))
 
             # Evaluate model
             y_pred = self.model.predict(X_test)
             mse = mean_squared_error(y_test, y_pred)
             r2 = r2_score(y_test, y_pred)
 
-            # Save model
-            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            joblib.dump(self.model, self.model_path)
-
-            return {
+            metrics = {
                 "mse": mse,
                 "r2": r2,
-                "best_params": grid_search.best_params_
+                "interval_coverage": intervals.coverage(X_test, y_test),
+                "best_params": param_search.best_params_,
+                "search": search,
+                "estimator": estimator,
+                "customer_features": customer_features
             }
+            self.saved_path = save_model(
+                self.model_path, self.model, intervals, metrics=metrics,
+                training_watermark=_watermark_of(df),
+                drift_reference=DriftReference.from_frame(df).to_dict(),
+                retention=self.settings.model_artifact_retention
+            )
+            return metrics
         except Exception as e:
             self.logger.error(f"Error training model: {str(e)}")
-            raise
+            raise ModelTrainingError(f"Error training model: {str(e)}") from e
+
+    def train_incremental(self, mode: Optional[str] = None, df: pd.DataFrame = None) -> Dict[str, Any]:
+        """Retrain on quotes finalized since the last training run, promoting only if holdout error does not regress.
+
+        warm_start adds boosting rounds to the live model, fitted to its residuals on
+        the new quotes only; window refits from scratch with the live model's
+        hyperparameters on the sliding window of the last training_window_rows
+        quotes, which ends with the new ones. Prediction intervals are refit on that
+        window in both modes. The newest
+        share of the new quotes is held out and scored by both the live model and the
+        candidate; the candidate is saved only if its RMSE is no worse than allowed by
+        training_max_regression. Held out quotes stay past the saved watermark, so the
+        next run trains on them.
+        """
+        try:
+            mode = mode or self.settings.training_incremental_mode
+            if mode not in INCREMENTAL_MODES:
+                raise ValueError(f"Unsupported incremental mode: {mode}")
+            if is_legacy_path(self.model_path):
+                raise ValueError("Incremental retraining needs a versioned artifact model_path")
+            store = ModelArtifactStore(self.model_path)
+            if store.latest() is None:
+                raise ValueError("No trained model to continue from, run a full training first")
+            manifest = store.manifest()
+            current = store.load_estimator(manifest['version'])
+
+            if df is None:
+                df = self.training_exporter.load_frame()
+            if 'changed_at' not in df or 'spec_id' not in df:
+                raise ValueError("Incremental retraining needs the exported training bundle")
+            # Only prices customers agreed to, in the order they were finalized
+            if 'is_final' in df:
+                df = df[df['is_final'].astype(bool)]
+            df = df.sort_values(['changed_at', 'spec_id'], kind='stable').reset_index(drop=True)
+            encoder = FeatureEncoder.from_model(current)
+            if encoder.uses_customer_features:
+                df = self.with_customer_features(df)
+
+            new_rows = df[_after_watermark(df, manifest.get('training_watermark'))]
+            result = {
+                "mode": mode,
+                "new_rows": len(new_rows),
+                "promoted": False,
+                "version": manifest['version']
+            }
+            n_holdout = int(np.ceil(len(new_rows) * self.settings.training_holdout_fraction))
+            if len(new_rows) - n_holdout < 1 or n_holdout < 1:
+                self.logger.info(f"Only {len(new_rows)} quotes finalized since the last training run, nothing to retrain")
+                return result
+            train_new, holdout = new_rows.iloc[:-n_holdout], new_rows.iloc[-n_holdout:]
+            # Everything up to the last new training quote, the sliding window ends there too
+            history = df.iloc[:train_new.index[-1] + 1].tail(self.settings.training_window_rows)
+
+            def encode(frame: pd.DataFrame) -> pd.DataFrame:
+                return encoder.to_frame(encoder.encode_frame(frame))
+
+            # Score the live model before warm starting continues boosting it in place
+            X_holdout, y_holdout = encode(holdout), holdout['price']
+            current_rmse = float(np.sqrt(mean_squared_error(y_holdout, current.predict(X_holdout))))
+            params = current.get_params()
+            if mode == 'warm_start':
+                train = train_new
+                candidate = self._continue_boosting(current, encode(train), train['price'])
+            else:
+                train = history
+                candidate = clone(current).fit(encode(train), train['price'])
+            intervals = IntervalModel.fit(encode(history), history['price'], params, estimator=type(current))
+
+            y_pred = candidate.predict(X_holdout)
+            candidate_mse = mean_squared_error(y_holdout, y_pred)
+            candidate_rmse = float(np.sqrt(candidate_mse))
+            promoted = candidate_rmse <= current_rmse * (1 + self.settings.training_max_regression)
+            result.update({
+                "promoted": promoted,
+                "train_rows": len(train),
+                "holdout_rows": n_holdout,
+                "holdout_rmse_current": current_rmse,
+                "holdout_rmse_candidate": candidate_rmse
+            })
+            if not promoted:
+                self.logger.warning(
+                    f"Incremental {mode} model not promoted, holdout RMSE {candidate_rmse:.2f} "
+                    f"against {current_rmse:.2f} for version {manifest['version']}"
+                )
+                return result
+
+            metrics = {
+                **manifest.get('metrics', {}),
+                "mse": candidate_mse,
+                "r2": r2_score(y_holdout, y_pred) if n_holdout > 1 else None,
+                "interval_coverage": intervals.coverage(X_holdout, y_holdout),
+                "incremental": mode,
+                "parent_version": manifest['version']
+            }
+            self.model = candidate
+            self.saved_path = save_model(
+                self.model_path, candidate, intervals, metrics=metrics,
+                training_watermark=_watermark_of(train_new),
+                drift_reference=DriftReference.from_frame(history).to_dict(),
+                retention=self.settings.model_artifact_retention
+            )
+            result["version"] = os.path.basename(self.saved_path)
+            self.logger.info(
+                f"Promoted incremental {mode} model {result['version']}, holdout RMSE "
+                f"{candidate_rmse:.2f} against {current_rmse:.2f}"
+            )
+            return result
+        except Exception as e:
+            self.logger.error(f"Error retraining model incrementally: {str(e)}")
+            raise ModelTrainingError(f"Error retraining model incrementally: {str(e)}") from e
+
+    def _continue_boosting(self, model, X: pd.DataFrame, y: pd.Series):
+        """Add training_warm_start_rounds boosting rounds, fitted on X and y, to a fitted model in place"""
+        rounds = self.settings.training_warm_start_rounds
+        if isinstance(model, HistGradientBoostingRegressor):
+            model.set_params(warm_start=True, max_iter=model.n_iter_ + rounds)
+        else:
+            model.set_params(warm_start=True, n_estimators=model.n_estimators_ + rounds)
+        model.fit(X, y)
+        # Saved models train from scratch again unless a later run asks otherwise
+        model.set_params(warm_start=False)
+        return model
+
+    def _build_estimator(self, estimator: str, encoder: FeatureEncoder):
+        if estimator == 'hist_gradient_boosting':
+            return HistGradientBoostingRegressor(
+                categorical_features=encoder.categorical_mask,
+                max_iter=500,
+                early_stopping=True,
+                validation_fraction=0.1,
+                n_iter_no_change=10,
+                random_state=42
+            )
+        return GradientBoostingRegressor()
+
+    def _build_search(self, search: str, estimator: str, base_estimator):
+        """Exhaustive grid search, or successive halving that only gives full data to the best candidates"""
+        common = {'cv': 5, 'scoring': 'neg_mean_squared_error', 'n_jobs': self.n_jobs}
+        if search == 'halving_grid':
+            return HalvingGridSearchCV(base_estimator, PARAM_GRIDS[estimator], factor=3, random_state=42, **common)
+        if search == 'halving_random':
+            return HalvingRandomSearchCV(
+                base_estimator, PARAM_DISTRIBUTIONS[estimator], n_candidates=HALVING_RANDOM_CANDIDATES,
+                min_resources='exhaust', factor=3, random_state=42, **common
+            )
+        return GridSearchCV(base_estimator, PARAM_GRIDS[estimator], **common)
 
     def evaluate_model(self, test_data: pd.DataFrame = None) -> Dict[str, float]:
         """Evaluate the model's performance"""
         try:
             if test_data is None:
-                test_data = pd.read_csv(self.training_data_path)
+                test_data = self.load_training_data()
 
-            X = pd.get_dummies(test_data[['weight_per_meter', 'total_length', 'machining_complexity',
-                                        'surface_treatment', 'alloy']])
+            encoder = FeatureEncoder.from_model(self.model)
+            X = encoder.to_frame(encoder.encode_frame(test_data))
             y = test_data['price']
 
             y_pred = self.model.predict(X)
@@ -119,26 +364,46 @@ class ModelTrainingService:
 
     def _encode_complexity(self, complexity: str) -> int:
         """Encode machining complexity into numerical values"""
-        complexity_map = {
-            'low': 1,
-            'medium': 2,
-            'high': 3
-        }
-        return complexity_map.get(complexity.lower(), 2)
+        return encode_complexity(complexity)
 
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model"""
         try:
-            if self.model is None:
-                self.model = joblib.load(self.model_path)
+            store = None if is_legacy_path(self.model_path) else ModelArtifactStore(self.model_path)
+            if store is not None and store.latest() is not None:
+                manifest, model, _ = store.load()
+                if self.model is None:
+                    self.model = model
+                last_trained = manifest['created_at']
+                version = manifest['version']
+            else:
+                legacy_path = legacy_path_for(self.model_path)
+                if self.model is None:
+                    self.model = joblib.load(legacy_path)
+                last_trained = datetime.fromtimestamp(os.path.getmtime(legacy_path)).isoformat()
+                version = None
 
             return {
                 "model_type": type(self.model).__name__,
                 "n_features": self.model.n_features_in_ if hasattr(self.model, 'n_features_in_') else None,
                 "n_estimators": self.model.n_estimators if hasattr(self.model, 'n_estimators') else None,
-                "last_trained": datetime.fromtimestamp(os.path.getmtime(self.model_path)).isoformat(),
-                "model_path": self.model_path
+                "last_trained": last_trained,
+                "model_path": self.model_path,
+                "version": version
             }
         except Exception as e:
             self.logger.error(f"Error getting model info: {str(e)}")
-            raise 
\ No newline at end of file
+            raise 
+
+def _watermark_of(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """(change time, spec id) of the newest exported row, None for frames not from the bundle"""
+    if df is None or df.empty or 'changed_at' not in df or 'spec_id' not in df:
+        return None
+    last = df.sort_values(['changed_at', 'spec_id']).iloc[-1]
+    return {'changed_at': pd.Timestamp(last['changed_at']).isoformat(), 'spec_id': int(last['spec_id'])}
+
+def _after_watermark(df: pd.DataFrame, watermark: Optional[Dict[str, Any]]) -> pd.Series:
+    if watermark is None:
+        return pd.Series(True, index=df.index)
+    since = pd.Timestamp(watermark['changed_at'])
+    return (df['changed_at'] > since) | ((df['changed_at'] == since) & (df['spec_id'] > watermark['spec_id']))
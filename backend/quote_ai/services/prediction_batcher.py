@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper edges of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class PredictionBatcher:
+    """Coalesces concurrent price predictions into vectorized model calls.
+
+    Callers await predict() on the event loop. The first request of a batch
+    opens a window of max_wait_ms (closed early once max_batch_size requests
+    are queued), then the whole batch is scored with one predict_many call in
+    a worker thread and every caller's future is resolved in order.
+    """
+
+    def __init__(self, predict_many: Callable[[List[dict]], List[dict]],
+                 max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.predict_many = predict_many
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram["+Inf"] = 0
+
+    async def predict(self, spec: dict) -> dict:
+        """Queue one spec for the next batch and wait for its prediction"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((spec, future))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._batch_full.set()
+        return await future
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        # First use, or the previous loop went away (e.g. between test cases)
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._batch_full = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() + 1 < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_full.clear()
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._score(batch)
+
+    async def _score(self, batch: List[Tuple[dict, asyncio.Future]]):
+        self._record(len(batch))
+        specs = [spec for spec, _ in batch]
+        try:
+            results = await self._loop.run_in_executor(None, self.predict_many, specs)
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch, error=e)
+                return
+            # One bad spec shouldn't fail its neighbours, score them one by one
+            logger.warning(f"Batch prediction failed, retrying items individually: {str(e)}")
+            for item in batch:
+                try:
+                    result = await self._loop.run_in_executor(None, self.predict_many, [item[0]])
+                    self._resolve([item], results=result)
+                except Exception as item_error:
+                    self._resolve([item], error=item_error)
+            return
+        self._resolve(batch, results=results)
+
+    @staticmethod
+    def _resolve(batch: List[Tuple[dict, asyncio.Future]], results: Optional[List[dict]] = None,
+                 error: Optional[Exception] = None):
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                # The caller was cancelled while we were scoring
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.items += size
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_histogram[bucket] += 1
+                return
+        self.batch_size_histogram["+Inf"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {str(bucket): count for bucket, count in self.batch_size_histogram.items()}
+        }
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from quote_ai.services.feature_encoder import encode_complexity
+
+class PredictionCache:
+    """Bounded LRU cache with a TTL for price predictions.
+
+    Keys combine the model version with the spec fields the model actually
+    reads, converted exactly as FeatureEncoder converts them, so two quotes that
+    only differ in description share an entry and nothing the encoder tells
+    apart ever does.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model_version: str, spec: Dict[str, Any], per_customer: bool = False) -> Tuple:
+        """Turn the spec fields used by the price model into a hashable key"""
+        key = (
+            model_version,
+            str(spec['alloy']),
+            str(spec['surface_treatment']),
+            encode_complexity(spec['machining_complexity']),
+            float(spec['weight_per_meter']),
+            float(spec['total_length'])
+        )
+        # Models with customer features price the same spec differently per customer
+        return key + (spec.get('customer_id'),) if per_customer else key
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: Tuple, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after a new model was swapped in"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,98 @@
+import os
+import logging
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.model_selection import train_test_split
+from quote_ai.services.compiled_model import CompiledEnsemble
+from quote_ai.services.feature_encoder import predict_encoded
+
+logger = logging.getLogger(__name__)
+
+# Nominal miscoverage, i.e. the companions bracket a 90% prediction interval
+DEFAULT_ALPHA = 0.1
+# Below this many rows there is no point holding data back for calibration
+MIN_CALIBRATION_ROWS = 10
+
+def interval_path_for(model_path: str) -> str:
+    """Where the interval companions of a model artifact are stored"""
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.intervals.joblib"
+
+def quantile_regressor(estimator: type, quantile: float, params: Dict[str, Any]) -> Any:
+    """An unfitted quantile-loss regressor of the same family as the main model"""
+    if issubclass(estimator, HistGradientBoostingRegressor):
+        return HistGradientBoostingRegressor(loss='quantile', quantile=quantile, **params)
+    return GradientBoostingRegressor(loss='quantile', alpha=quantile, **params)
+
+class IntervalModel:
+    """Quantile gradient-boosting companions that bound the main price model.
+
+    Lower and upper quantile models are fitted with the main model's
+    hyperparameters, then widened by a split-conformal correction so that
+    the interval reaches its nominal coverage on held-out data.
+    """
+
+    def __init__(self, lower: Any, upper: Any, alpha: float = DEFAULT_ALPHA, correction: float = 0.0):
+        self.lower = lower
+        self.upper = upper
+        self.alpha = alpha
+        self.correction = correction
+
+    @classmethod
+    def fit(cls, X: pd.DataFrame, y: pd.Series, params: Optional[Dict[str, Any]] = None,
+            alpha: float = DEFAULT_ALPHA, random_state: int = 42,
+            estimator: type = GradientBoostingRegressor) -> "IntervalModel":
+        """Fit both quantile companions and calibrate them on a held-out slice"""
+        params = dict(params or {})
+        for name in ('loss', 'alpha', 'quantile'):
+            params.pop(name, None)
+
+        if len(X) >= MIN_CALIBRATION_ROWS:
+            X_fit, X_cal, y_fit, y_cal = train_test_split(X, y, test_size=0.25, random_state=random_state)
+        else:
+            X_fit, X_cal, y_fit, y_cal = X, None, y, None
+
+        lower = quantile_regressor(estimator, alpha / 2, params).fit(X_fit, y_fit)
+        upper = quantile_regressor(estimator, 1 - alpha / 2, params).fit(X_fit, y_fit)
+        model = cls(lower, upper, alpha=alpha)
+
+        if X_cal is not None:
+            # Conformalized quantile regression: widen by the finite-sample quantile of the misses
+            low, high = model.predict(np.asarray(X_cal, dtype=np.float64))
+            y_cal = np.asarray(y_cal, dtype=np.float64)
+            scores = np.maximum(low - y_cal, y_cal - high)
+            level = min(1.0, np.ceil((len(scores) + 1) * (1 - alpha)) / len(scores))
+            model.correction = float(np.quantile(scores, level))
+        return model
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Lower and upper price bounds for each row"""
+        lower = np.asarray(predict_encoded(self.lower, X), dtype=np.float64) - self.correction
+        upper = np.asarray(predict_encoded(self.upper, X), dtype=np.float64) + self.correction
+        # Independently fitted quantiles can cross, keep the bounds ordered
+        return np.minimum(lower, upper), np.maximum(lower, upper)
+
+    def confidence(self, predicted: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        """Confidence as one minus the interval's half-width relative to the prediction"""
+        half_width = (upper - lower) / 2
+        scale = np.maximum(np.abs(predicted), 1e-9)
+        return np.clip(1 - half_width / scale, 0.0, 1.0)
+
+    def coverage(self, X: np.ndarray, y: np.ndarray) -> float:
+        """Share of observed prices that fall inside the interval"""
+        lower, upper = self.predict(X)
+        y = np.asarray(y, dtype=np.float64)
+        return float(np.mean((y >= lower) & (y <= upper)))
+
+    def compiled(self) -> Optional["IntervalModel"]:
+        """The same companions running on the flat-array tree engine"""
+        if not (CompiledEnsemble.supports(self.lower) and CompiledEnsemble.supports(self.upper)):
+            return None
+        return IntervalModel(
+            CompiledEnsemble.compile(self.lower),
+            CompiledEnsemble.compile(self.upper),
+            alpha=self.alpha,
+            correction=self.correction
+        )
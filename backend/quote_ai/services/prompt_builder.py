@@ -0,0 +1,104 @@
+import re
+import logging
+import textwrap
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from quote_ai.services.tokens import get_encoder
+
+logger = logging.getLogger(__name__)
+
+# Smallest useful remainder of a trimmed section, below this the section is dropped
+MIN_SECTION_TOKENS = 32
+# Tokens reserved for the omission marker left in a trimmed section
+OMISSION_MARKER_TOKENS = 12
+# Share of a trimmed section's kept tokens taken from its start, the rest comes from its end
+TRIM_HEAD_SHARE = 0.67
+
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+@dataclass(frozen=True)
+class PromptSection:
+    name: str
+    text: str
+    priority: int = 0  # lower is trimmed first
+    static: bool = False  # the same for every request
+    trimmable: bool = True
+
+@dataclass(frozen=True)
+class BuiltPrompt:
+    text: str
+    tokens: int
+    trimmed: Tuple[str, ...] = ()
+    dropped: Tuple[str, ...] = ()
+
+def compact(text: str) -> str:
+    """Dedent, strip trailing spaces and collapse blank-line runs, which cost tokens and carry nothing"""
+    text = _TRAILING_SPACE.sub("\n", textwrap.dedent(text).strip())
+    return _BLANK_LINES.sub("\n\n", text)
+
+class PromptBuilder:
+    """Assembles an LLM prompt from sections under a token budget.
+
+    Static sections go first, in the order added, so providers that cache
+    prompt prefixes can reuse them across requests; dynamic sections follow
+    in the order added. While the prompt is over max_tokens, trimmable
+    sections are cut, lowest priority first: their start and end are kept
+    around an omission marker, and a section that would keep less than
+    MIN_SECTION_TOKENS is dropped.
+    """
+
+    def __init__(self, max_tokens: int, model: Optional[str] = None):
+        self.max_tokens = max_tokens
+        self.model = model
+        self._sections: List[PromptSection] = []
+
+    def add(self, name: str, text: str, priority: int = 0, static: bool = False,
+            trimmable: bool = True) -> "PromptBuilder":
+        text = compact(text)
+        if text:
+            self._sections.append(PromptSection(name, text, priority, static, trimmable))
+        return self
+
+    def build(self) -> BuiltPrompt:
+        encoder = get_encoder(self.model)
+        sections = [section for section in self._sections if section.static]
+        sections += [section for section in self._sections if not section.static]
+        encoded = [encoder.encode(section.text) for section in sections]
+        texts: List[Optional[str]] = [section.text for section in sections]
+        # Sections are joined with a blank line, about one token each
+        total = sum(len(tokens) for tokens in encoded) + max(len(sections) - 1, 0)
+        trimmed, dropped = [], []
+        # Lowest priority first, of equal priority the later section first
+        for i in sorted(range(len(sections)), key=lambda i: (sections[i].priority, -i)):
+            if total <= self.max_tokens:
+                break
+            if not sections[i].trimmable:
+                continue
+            tokens = encoded[i]
+            keep = len(tokens) - (total - self.max_tokens) - OMISSION_MARKER_TOKENS
+            if keep < MIN_SECTION_TOKENS:
+                texts[i] = None
+                total -= len(tokens) + 1
+                dropped.append(sections[i].name)
+                continue
+            head = int(keep * TRIM_HEAD_SHARE)
+            omitted = len(tokens) - keep
+            texts[i] = (
+                f"{encoder.decode(tokens[:head]).rstrip()}\n"
+                f"[... {omitted} tokens omitted ...]\n"
+                f"{encoder.decode(tokens[head - keep:]).lstrip()}"
+            )
+            total -= omitted - OMISSION_MARKER_TOKENS
+            trimmed.append(sections[i].name)
+
+        text = "\n\n".join(text for text in texts if text is not None)
+        prompt = BuiltPrompt(text, len(encoder.encode(text)), tuple(trimmed), tuple(dropped))
+        if prompt.tokens > self.max_tokens:
+            logger.warning(f"Prompt is {prompt.tokens} tokens after trimming, over its {self.max_tokens} token budget")
+        elif trimmed or dropped:
+            logger.info(
+                f"Prompt trimmed to {prompt.tokens} tokens (budget {self.max_tokens}), "
+                f"trimmed {list(trimmed)}, dropped {list(dropped)}"
+            )
+        return prompt
@@ -7,8 +7,15 @@ class QuoteGenerationService:
         self.ai_service = ai_service
 
     async def generate_quote(self, product_spec: ProductSpecification, context: Dict[str, Any]) -> Quote:
-        # Use AI service to predict price
-        predicted_price = await self.ai_service.predict_price(product_spec)
+        # Use AI service to predict price, batched with any concurrent requests
+        prediction = await self.ai_service.predict_price_async({
+            'alloy': product_spec.alloy,
+            'weight_per_meter': product_spec.weight_per_meter,
+            'total_length': product_spec.total_length,
+            'surface_treatment': product_spec.surface_treatment,
+            'machining_complexity': product_spec.machining_complexity
+        })
+        predicted_price = prediction['predicted_price']
         
         # Create quote with predicted price
         quote = Quote(
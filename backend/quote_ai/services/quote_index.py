@@ -0,0 +1,231 @@
+import re
+import math
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+from openai import OpenAI
+from sqlalchemy.orm import Session, selectinload
+from quote_ai.core.models import Quote
+from quote_ai.utils.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+class HashingEmbedder:
+    """Deterministic offline embeddings: signed feature hashing of words and word pairs.
+
+    Needs no model or network, so it is the default and what tests use; texts
+    sharing vocabulary land close together, which is enough to find quotes
+    for the same kind of profile and request. Vectors are L2-normalized.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text: str) -> List[float]:
+        words = _WORD.findall(text.lower())
+        counts: Dict[str, int] = {}
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            counts[term] = counts.get(term, 0) + 1
+        vector = [0.0] * self.dimension
+        for term, count in counts.items():
+            digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:7], "little") % self.dimension
+            # Sublinear term frequency, so a repeated word does not dominate
+            vector[bucket] += (1.0 + math.log(count)) * (1.0 if digest[7] & 1 else -1.0)
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API"""
+
+    def __init__(self, settings: Settings):
+        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.model = settings.embedding_model
+        self.name = settings.embedding_model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in response.data]
+
+def quote_document(product_specs: List[Any], communication_contexts: List[Any]) -> str:
+    """The text a quote is embedded by: its product specifications and communication context.
+
+    Takes the ORM rows or their request schemas alike, so a search embeds a
+    new request the same way its matches were indexed.
+    """
+    parts = []
+    for spec in product_specs:
+        parts.append(" ".join(str(value) for value in (
+            spec.description, spec.profile_type, f"alloy {spec.alloy}",
+            f"{spec.surface_treatment} surface", f"{spec.machining_complexity} machining complexity"
+        ) if value))
+    for context in communication_contexts:
+        parts.extend(value for value in (
+            context.context_text, context.custom_requests, context.past_agreements
+        ) if value)
+    return "\n".join(parts)
+
+def quote_metadata(quote: Quote) -> Dict[str, Any]:
+    """What a search hit reports without going back to the database"""
+    metadata = {
+        "quote_id": quote.id,
+        "reference_number": quote.reference_number,
+        "customer_id": quote.customer_id,
+        "final_price": quote.final_price,
+        "predicted_price": quote.predicted_price,
+        "status": quote.status,
+        "created_at": quote.created_at.isoformat() if quote.created_at else None
+    }
+    # Chroma metadata values cannot be null
+    return {key: value for key, value in metadata.items() if value is not None}
+
+class QuoteIndex:
+    """Approximate nearest neighbour index of past quotes in a local Chroma collection.
+
+    Each quote is stored with its embedding and the metadata a caller needs
+    (final price, status, reference), so a search is one HNSW lookup and no
+    database query. Quotes are indexed as they are created or changed; rebuild()
+    backfills an existing database. The collection is named after the
+    embedder, so switching embedders starts a fresh index instead of mixing
+    vector spaces.
+    """
+
+    def __init__(self, path: str, embedder):
+        self.path = path
+        self.embedder = embedder
+        self._collection = None
+        self._lock = threading.Lock()
+        self.indexed = 0
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    def upsert(self, quote_ids: List[int], documents: List[str], metadatas: List[Dict[str, Any]]):
+        if not quote_ids:
+            return
+        embeddings = self.embedder.embed(documents)
+        with self._lock:
+            self._open().upsert(
+                ids=[str(quote_id) for quote_id in quote_ids],
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas
+            )
+        self.indexed += len(quote_ids)
+
+    def add_quote(self, quote: Quote):
+        self.upsert([quote.id], [quote_document(quote.product_specs, quote.communication_contexts)],
+                    [quote_metadata(quote)])
+
+    def remove(self, quote_id: int):
+        with self._lock:
+            self._open().delete(ids=[str(quote_id)])
+
+    def search(self, text: str, k: int = 5, exclude_quote_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The k indexed quotes most similar to text, best first"""
+        started = time.perf_counter()
+        embedding = self.embedder.embed([text])[0]
+        with self._lock:
+            collection = self._open()
+            available = collection.count()
+            if not available:
+                return []
+            # One extra in case the quote searched for is among the hits
+            n_results = min(k + (1 if exclude_quote_id is not None else 0), available)
+            result = collection.query(
+                query_embeddings=[embedding], n_results=n_results, include=["metadatas", "distances"]
+            )
+        hits = [
+            {**metadata, "similarity": 1.0 - distance}
+            for metadata, distance in zip(result["metadatas"][0], result["distances"][0])
+            if metadata.get("quote_id") != exclude_quote_id
+        ][:k]
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - started
+        return hits
+
+    def rebuild(self, db: Session, batch_size: int = 500) -> int:
+        """Index every quote in the database, in batches"""
+        count = 0
+        last_id = 0
+        while True:
+            quotes = (
+                db.query(Quote)
+                .options(selectinload(Quote.product_specs), selectinload(Quote.communication_contexts))
+                .filter(Quote.id > last_id)
+                .order_by(Quote.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not quotes:
+                break
+            self.upsert(
+                [quote.id for quote in quotes],
+                [quote_document(quote.product_specs, quote.communication_contexts) for quote in quotes],
+                [quote_metadata(quote) for quote in quotes]
+            )
+            count += len(quotes)
+            last_id = quotes[-1].id
+        logger.info(f"Indexed {count} quotes for similarity search")
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._collection.count() if self._collection is not None else None
+        return {
+            "path": self.path,
+            "embedder": self.embedder.name,
+            "entries": entries,
+            "indexed": self.indexed,
+            "searches": self.searches,
+            "avg_search_ms": 1000 * self.search_seconds / self.searches if self.searches else None
+        }
+
+    def _open(self):
+        if self._collection is None:
+            client = chromadb.PersistentClient(path=self.path, settings=ChromaSettings(anonymized_telemetry=False))
+            self._collection = client.get_or_create_collection(
+                f"quotes-{self.embedder.name}",
+                metadata={"hnsw:space": "cosine"},
+                # Embeddings are always passed in, Chroma's default model is never loaded
+                embedding_function=None
+            )
+        return self._collection
+
+def index_snapshot(quote_id: int, document: str, metadata: Dict[str, Any]):
+    """Index a quote from data read while its session was open, for use as a background task"""
+    try:
+        get_quote_index().upsert([quote_id], [document], [metadata])
+    except Exception as e:
+        # The index is derived data, a miss here is fixed by the next update or a rebuild
+        logger.error(f"Failed to index quote {quote_id}: {str(e)}")
+
+def remove_from_index(quote_id: int):
+    try:
+        get_quote_index().remove(quote_id)
+    except Exception as e:
+        logger.error(f"Failed to remove quote {quote_id} from the index: {str(e)}")
+
+# Initialize index as None
+_quote_index = None
+
+def get_quote_index(settings: Optional[Settings] = None) -> QuoteIndex:
+    """Get or create the process-wide quote similarity index"""
+    global _quote_index
+    if _quote_index is None:
+        settings = settings or get_settings()
+        if settings.embedding_provider == "openai":
+            embedder = OpenAIEmbedder(settings)
+        else:
+            embedder = HashingEmbedder(settings.vector_dimension)
+        _quote_index = QuoteIndex(settings.quote_index_path, embedder)
+    return _quote_index
@@ -0,0 +1,152 @@
+import queue
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from quote_ai.services.feature_encoder import predict_encoded
+
+logger = logging.getLogger(__name__)
+
+class ShadowStats:
+    """Running differences between a shadow model's prices and the live model's.
+
+    There is no agreed price yet when a request is scored, so the live
+    prediction is the reference: diff is shadow minus live.
+    """
+
+    def __init__(self, live_version: str, shadow_version: str):
+        self.live_version = live_version
+        self.shadow_version = shadow_version
+        self.since = datetime.utcnow()
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.sum_diff = 0.0
+        self.sum_abs_diff = 0.0
+        self.sum_squared_diff = 0.0
+        self.sum_abs_pct_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.shadow_higher = 0
+        self.scoring_seconds = 0.0
+
+    def record(self, live_prices: np.ndarray, shadow_prices: np.ndarray, seconds: float):
+        diff = shadow_prices - live_prices
+        abs_diff = np.abs(diff)
+        self.batches += 1
+        self.rows += len(diff)
+        self.sum_diff += float(diff.sum())
+        self.sum_abs_diff += float(abs_diff.sum())
+        self.sum_squared_diff += float(np.square(diff).sum())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = abs_diff / np.abs(live_prices)
+        self.sum_abs_pct_diff += float(pct[np.isfinite(pct)].sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(abs_diff.max(initial=0.0)))
+        self.shadow_higher += int((diff > 0).sum())
+        self.scoring_seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        rows = self.rows or 1
+        return {
+            "live_version": self.live_version,
+            "shadow_version": self.shadow_version,
+            "since": self.since.isoformat(),
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "mean_diff": self.sum_diff / rows,
+            "mean_abs_diff": self.sum_abs_diff / rows,
+            "rmse_diff": float(np.sqrt(self.sum_squared_diff / rows)),
+            "mean_abs_pct_diff": self.sum_abs_pct_diff / rows,
+            "max_abs_diff": self.max_abs_diff,
+            "shadow_higher_share": self.shadow_higher / rows,
+            "mean_scoring_ms": 1000 * self.scoring_seconds / (self.batches or 1)
+        }
+
+class ShadowScorer:
+    """Scores a shadow model on live traffic from a background thread.
+
+    Requests only pay for a non-blocking put of references to the features
+    they already encoded. The queue is bounded and anything that does not fit
+    is dropped and counted, so a slow shadow model can never back up serving.
+    Statistics restart whenever the live or shadow version changes.
+    """
+
+    def __init__(self, queue_size: int = 1024):
+        self.queue_size = queue_size
+        self._queue: "queue.Queue[Tuple[Any, Any, np.ndarray, np.ndarray]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stats: Optional[ShadowStats] = None
+        self.submitted = 0
+        self.dropped = 0
+
+    def submit(self, live, shadow, features: np.ndarray, live_prices: np.ndarray) -> bool:
+        """Queue one scored batch for the shadow model, False if it was dropped"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((live, shadow, features, live_prices))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = self._stats.to_dict() if self._stats is not None else None
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "comparison": stats
+        }
+
+    def join(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far was scored, for tests and benchmarks"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _ensure_started(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            live, shadow, features, live_prices = self._queue.get()
+            try:
+                self._score(live, shadow, features, live_prices)
+            finally:
+                self._queue.task_done()
+
+    def _score(self, live, shadow, features: np.ndarray, live_prices: np.ndarray):
+        with self._lock:
+            stats = self._stats
+            if stats is None or (stats.live_version, stats.shadow_version) != (live.version, shadow.version):
+                stats = self._stats = ShadowStats(live.version, shadow.version)
+        try:
+            start = time.perf_counter()
+            if shadow.encoder.feature_names != live.encoder.feature_names:
+                # Different layouts (e.g. one-hot vs ordinal), go back to spec values first
+                features = shadow.encoder.encode_frame(live.encoder.decode_frame(features))
+            shadow_prices = np.asarray(predict_encoded(shadow.model, features), dtype=float)
+            seconds = time.perf_counter() - start
+            with self._lock:
+                stats.record(np.asarray(live_prices, dtype=float), shadow_prices, seconds)
+        except Exception as e:
+            with self._lock:
+                stats.errors += 1
+                stats.last_error = str(e)
+            logger.error(f"Shadow model {shadow.version} failed to score: {str(e)}")
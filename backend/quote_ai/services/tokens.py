@@ -0,0 +1,79 @@
+import re
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Encoding of the GPT-3.5/4 family, also a fair estimate for Ollama models
+DEFAULT_ENCODING = "cl100k_base"
+
+# Words and punctuation with their leading whitespace, roughly BPE granularity
+_APPROXIMATE_TOKEN = re.compile(r"\s*\w+|\s*[^\w\s]|\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+class ApproximateEncoding:
+    """Offline stand-in for a tiktoken encoding, one token per word or punctuation mark.
+
+    Used when the BPE ranks cannot be downloaded (air-gapped hosts, tests).
+    Counts come out somewhat lower than the real encoder's for prose, so
+    budgets sized for tiktoken keep a little headroom with it.
+    """
+
+    name = "approximate"
+
+    def encode(self, text: str) -> List[str]:
+        return _APPROXIMATE_TOKEN.findall(text)
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+@lru_cache(maxsize=16)
+def get_encoder(model: Optional[str] = None):
+    """The tiktoken encoding for a model, loaded once per process.
+
+    Unknown models (Ollama's) use DEFAULT_ENCODING; when that cannot be
+    loaded either, an ApproximateEncoding is returned.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({type(e).__name__}), approximating token counts")
+        return ApproximateEncoding()
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return len(get_encoder(model).encode(text))
+
+def split_by_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """Split text into chunks of at most max_tokens tokens.
+
+    Whole paragraphs are packed together while they fit; a paragraph longer
+    than max_tokens is cut on token boundaries.
+    """
+    encoder = get_encoder(model)
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = encoder.encode(paragraph)
+        # Paragraphs are joined with a blank line, about one token
+        if current and current_tokens + 1 + len(tokens) > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if len(tokens) > max_tokens:
+            pieces = [tokens[i:i + max_tokens] for i in range(0, len(tokens), max_tokens)]
+            chunks.extend(encoder.decode(piece).strip() for piece in pieces[:-1])
+            tokens = pieces[-1]
+            paragraph = encoder.decode(tokens).strip()
+        current.append(paragraph)
+        current_tokens += len(tokens) + (1 if len(current) > 1 else 0)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -0,0 +1,189 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+from quote_ai.core.models import Quote, ProductSpecification
+from quote_ai.services.feature_encoder import encode_complexity
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+# Quotes in these states carry a price the customer actually agreed to, the app marks them "approved"
+ACCEPTED_STATUSES = ("approved",)
+DICTIONARY_COLUMNS = ('surface_treatment', 'alloy')
+EXPORT_COLUMNS = (
+    'spec_id', 'quote_id', 'changed_at',
+    'weight_per_meter', 'total_length', 'machining_complexity',
+    'surface_treatment', 'alloy', 'price', 'is_final'
+)
+
+class TrainingDataExporter:
+    """Streams approved quotes and their product specs into a columnar training bundle.
+
+    Rows are read with a server-side cursor in chunks of chunk_size and every
+    chunk becomes one compressed .npz part, so memory stays flat however large
+    the quote history is. Categorical columns are dictionary-encoded against
+    append-only dictionaries kept in the manifest, together with the watermark
+    of the last exported row; the next export only reads quotes changed since.
+
+        <export_dir>/manifest.json
+        <export_dir>/part-00000.npz
+    """
+
+    def __init__(self, export_dir: str, chunk_size: int = 5000):
+        self.export_dir = export_dir
+        self.chunk_size = chunk_size
+        self.manifest_path = os.path.join(export_dir, MANIFEST_FILE)
+
+    def manifest(self) -> Dict[str, Any]:
+        """The export manifest, or an empty one before the first export"""
+        if not os.path.exists(self.manifest_path):
+            return {
+                'format': EXPORT_FORMAT,
+                'columns': list(EXPORT_COLUMNS),
+                'dictionaries': {column: [] for column in DICTIONARY_COLUMNS},
+                'parts': [],
+                'rows': 0,
+                'watermark': None
+            }
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != EXPORT_FORMAT:
+            raise ValueError(f"Unsupported training export format {manifest.get('format')}")
+        return manifest
+
+    def export(self, db: Session) -> Dict[str, Any]:
+        """Append every approved spec changed since the last watermark, returning export stats"""
+        manifest = self.manifest()
+        os.makedirs(self.export_dir, exist_ok=True)
+
+        changed_at = func.coalesce(Quote.updated_at, Quote.created_at)
+        price = func.coalesce(Quote.final_price, Quote.predicted_price)
+        stmt = (
+            select(
+                ProductSpecification.id, Quote.id, changed_at,
+                ProductSpecification.weight_per_meter, ProductSpecification.total_length,
+                ProductSpecification.machining_complexity, ProductSpecification.surface_treatment,
+                ProductSpecification.alloy, price, Quote.final_price.isnot(None)
+            )
+            .join(Quote, ProductSpecification.quote_id == Quote.id)
+            .where(Quote.status.in_(ACCEPTED_STATUSES), price.isnot(None))
+            .order_by(changed_at, ProductSpecification.id)
+            .execution_options(yield_per=self.chunk_size, stream_results=True)
+        )
+        watermark = manifest['watermark']
+        if watermark is not None:
+            # Quotes approved after an earlier export keep their old spec ids, so the
+            # watermark is the (change time, spec id) of the last row written
+            since = datetime.fromisoformat(watermark['changed_at'])
+            stmt = stmt.where(or_(
+                changed_at > since,
+                and_(changed_at == since, ProductSpecification.id > watermark['spec_id'])
+            ))
+
+        exported = 0
+        result = db.execute(stmt)
+        for rows in result.partitions():
+            part = self._encode_chunk(rows, manifest['dictionaries'])
+            last = rows[-1]
+            manifest['watermark'] = {'changed_at': last[2].isoformat(), 'spec_id': last[0]}
+            count = len(part['spec_id'])
+            if count:
+                name = f"part-{len(manifest['parts']):05d}.npz"
+                np.savez_compressed(os.path.join(self.export_dir, name), **part)
+                manifest['parts'].append({'file': name, 'rows': count, 'watermark': manifest['watermark']})
+                manifest['rows'] += count
+                exported += count
+            # The manifest only ever references complete parts, so a crash mid-export
+            # resumes from the last committed chunk
+            self._write_manifest(manifest)
+
+        logger.info(f"Exported {exported} training rows to {self.export_dir}")
+        return {'rows_exported': exported, 'rows_total': manifest['rows'],
+                'parts': len(manifest['parts']), 'watermark': manifest['watermark']}
+
+    def iter_frames(self) -> Iterator[pd.DataFrame]:
+        """Decode the bundle one part at a time"""
+        manifest = self.manifest()
+        dictionaries = {
+            column: pd.Index(values, dtype=object)
+            for column, values in manifest['dictionaries'].items()
+        }
+        for part in manifest['parts']:
+            with np.load(os.path.join(self.export_dir, part['file'])) as arrays:
+                frame = pd.DataFrame({column: arrays[column] for column in EXPORT_COLUMNS})
+            for column, values in dictionaries.items():
+                frame[column] = values.take(frame[column].to_numpy()).astype(object)
+            frame['changed_at'] = pd.to_datetime(frame['changed_at'], unit='us', utc=True)
+            yield frame
+
+    def load_frame(self) -> pd.DataFrame:
+        """The whole bundle as a training frame, keeping the latest export of each spec"""
+        frames = list(self.iter_frames())
+        if not frames:
+            return pd.DataFrame(columns=list(EXPORT_COLUMNS))
+        df = pd.concat(frames, ignore_index=True)
+        # A quote re-priced after it was exported shows up again in a later part
+        return df.drop_duplicates(subset='spec_id', keep='last').reset_index(drop=True)
+
+    def _encode_chunk(self, rows: List[Any], dictionaries: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+        columns = list(zip(*rows)) if rows else [()] * len(EXPORT_COLUMNS)
+        raw = dict(zip(EXPORT_COLUMNS, columns))
+        numeric = {
+            'weight_per_meter': np.asarray(raw['weight_per_meter'], dtype=np.float64),
+            'total_length': np.asarray(raw['total_length'], dtype=np.float64),
+            'price': np.asarray(raw['price'], dtype=np.float64)
+        }
+        # Specs missing a model input are useless for training, like prepare_training_data
+        keep = np.ones(len(rows), dtype=bool)
+        for values in numeric.values():
+            keep &= ~np.isnan(values)
+        for column in DICTIONARY_COLUMNS + ('machining_complexity',):
+            keep &= np.array([value is not None for value in raw[column]], dtype=bool)
+
+        part = {
+            'spec_id': np.asarray(raw['spec_id'], dtype=np.int64)[keep],
+            'quote_id': np.asarray(raw['quote_id'], dtype=np.int64)[keep],
+            'changed_at': np.array([_epoch_micros(value) for value in raw['changed_at']], dtype=np.int64)[keep],
+            'machining_complexity': np.array(
+                [encode_complexity(value) if value is not None else np.nan for value in raw['machining_complexity']],
+                dtype=np.float32
+            )[keep],
+            # Whether the price is the agreed final price rather than our own prediction
+            'is_final': np.asarray(raw['is_final'], dtype=bool)[keep]
+        }
+        for column, values in numeric.items():
+            part[column] = values[keep]
+        for column in DICTIONARY_COLUMNS:
+            part[column] = self._dictionary_encode(np.asarray(raw[column], dtype=object)[keep], dictionaries[column])
+        return part
+
+    @staticmethod
+    def _dictionary_encode(values: np.ndarray, dictionary: List[str]) -> np.ndarray:
+        """Codes into the append-only dictionary, growing it with unseen values"""
+        uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+        index = {value: i for i, value in enumerate(dictionary)}
+        for value in uniques:
+            if value not in index:
+                index[value] = len(dictionary)
+                dictionary.append(value)
+        codes = np.array([index[value] for value in uniques], dtype=np.int32)
+        return codes[inverse].astype(np.uint16 if len(dictionary) <= np.iinfo(np.uint16).max else np.int32)
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+def _epoch_micros(value: datetime) -> int:
+    # SQLite hands back naive datetimes, they are stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000)
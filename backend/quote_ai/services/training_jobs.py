@@ -0,0 +1,252 @@
+import os
+import uuid
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+import numpy as np
+from quote_ai.utils.config import Settings, get_settings
+from quote_ai.services.model_registry import ModelRegistry, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around for GET /models/jobs/{id}
+MAX_FINISHED_JOBS = 100
+MAX_LOG_LINES = 200
+# Training runs below the API workers' priority
+WORKER_NICENESS = 10
+
+@dataclass
+class TrainingJob:
+    """State of one training run, updated from the worker's progress messages"""
+    id: str
+    params: Dict[str, Any]
+    status: str = "queued"  # queued, running, succeeded or failed
+    stage: str = "queued"
+    progress: float = 0.0
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    metrics: Optional[Dict[str, Any]] = None
+    model_version: Optional[str] = None
+    error: Optional[str] = None
+    logs: Deque[str] = field(default_factory=lambda: deque(maxlen=MAX_LOG_LINES))
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "params": self.params,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "metrics": self.metrics,
+            "model_version": self.model_version,
+            "error": self.error,
+            "logs": list(self.logs)
+        }
+
+class TrainingJobManager:
+    """Runs model training in a separate process pool and tracks the jobs.
+
+    Workers are spawned (never forked from the threaded API process), run at a
+    lower priority and cap both the search's n_jobs and the native BLAS/OpenMP
+    thread pools at cpu_budget, so a grid search cannot starve request handling.
+    Progress and log lines come back over a queue drained by a listener thread.
+    On success the new artifact is loaded into the live model registry.
+    """
+
+    def __init__(self, settings: Settings, model_registry: ModelRegistry,
+                 max_workers: int = 1, cpu_budget: int = 1):
+        self.settings = settings
+        self.model_registry = model_registry
+        self.max_workers = max_workers
+        self.cpu_budget = max(1, cpu_budget)
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue = None
+        self._listener: Optional[threading.Thread] = None
+
+    def submit(self, params: Optional[Dict[str, Any]] = None) -> TrainingJob:
+        """Queue a training run; params may set mode, search, estimator and export_training_data"""
+        job = TrainingJob(id=uuid.uuid4().hex, params=dict(params or {}))
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        executor = self._ensure_started()
+        future = executor.submit(
+            run_training_job, job.id, self.settings.model_dump(), job.params, self.cpu_budget
+        )
+        future.add_done_callback(lambda f: self._on_done(job, f))
+        logger.info(f"Queued training job {job.id} with {job.params}")
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs; running ones are cancelled unless wait is set"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+        if self._queue is not None:
+            self._queue.put(None)
+            self._queue = None
+
+    def _ensure_started(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context("spawn")
+                self._queue = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._queue,)
+                )
+                self._listener = threading.Thread(
+                    target=self._listen, args=(self._queue,), name="training-job-listener", daemon=True
+                )
+                self._listener.start()
+            return self._executor
+
+    def _listen(self, queue):
+        while True:
+            message = queue.get()
+            if message is None:
+                return
+            job_id, kind, payload = message
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if kind == "progress":
+                if job.finished:
+                    # Arrived after the job already completed
+                    continue
+                if job.status == "queued":
+                    job.status = "running"
+                    job.started_at = datetime.utcnow()
+                job.stage, job.progress = payload
+            elif kind == "log":
+                job.logs.append(payload)
+
+    def _on_done(self, job: TrainingJob, future: Future):
+        try:
+            result = future.result()
+            job.metrics = result["metrics"]
+            # Publishing means loading what the worker saved, exactly like the other API workers will
+            snapshot = self.model_registry.load()
+            job.model_version = snapshot.version
+            job.status = "succeeded"
+            job.stage, job.progress = "published", 1.0
+            logger.info(f"Training job {job.id} published model version {snapshot.version}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+            logger.error(f"Training job {job.id} failed: {job.error}")
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+class _QueueLogHandler(logging.Handler):
+    def __init__(self, job_id: str):
+        super().__init__(level=logging.INFO)
+        self.job_id = job_id
+        self.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    def emit(self, record: logging.LogRecord):
+        _report(self.job_id, "log", self.format(record))
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICENESS)
+
+def _report(job_id: str, kind: str, payload: Any):
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, kind, payload))
+
+def run_training_job(job_id: str, settings_values: Dict[str, Any], params: Dict[str, Any],
+                     cpu_budget: int) -> Dict[str, Any]:
+    """Entry point of a training job inside a worker process"""
+    from threadpoolctl import threadpool_limits
+    from quote_ai.services.model_training import ModelTrainingService, INCREMENTAL_MODES
+
+    handler = _QueueLogHandler(job_id)
+    package_logger = logging.getLogger("quote_ai")
+    package_logger.addHandler(handler)
+    package_logger.setLevel(logging.INFO)
+    try:
+        with threadpool_limits(limits=cpu_budget):
+            settings = Settings(**settings_values)
+            service = ModelTrainingService(settings, n_jobs=cpu_budget)
+
+            if params.get("export_training_data"):
+                from quote_ai.db.database import SessionLocal
+                _report(job_id, "progress", ("exporting training data", 0.05))
+                db = SessionLocal()
+                try:
+                    service.export_training_data(db)
+                finally:
+                    db.close()
+
+            mode = params.get("mode")
+            if mode in INCREMENTAL_MODES:
+                _report(job_id, "progress", (f"retraining on newly finalized quotes ({mode})", 0.2))
+                metrics = service.train_incremental(mode)
+                _report(job_id, "progress", ("saved" if metrics["promoted"] else "kept current model", 0.95))
+                return {"metrics": _json_safe(metrics), "saved_path": service.saved_path}
+
+            _report(job_id, "progress", ("loading training data", 0.1))
+            df = service.load_training_data()
+            _report(job_id, "progress", (f"searching hyperparameters on {len(df)} rows", 0.2))
+            metrics = service.train_model(df, search=params.get("search"), estimator=params.get("estimator"))
+            _report(job_id, "progress", ("saved", 0.95))
+            return {"metrics": _json_safe(metrics), "saved_path": service.saved_path}
+    finally:
+        package_logger.removeHandler(handler)
+
+def _json_safe(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+# Initialize manager as None
+_job_manager = None
+
+def get_training_job_manager(settings: Optional[Settings] = None) -> TrainingJobManager:
+    """Get or create the process-wide training job manager"""
+    global _job_manager
+    if _job_manager is None:
+        settings = settings or get_settings()
+        _job_manager = TrainingJobManager(
+            settings,
+            get_model_registry(settings),
+            max_workers=settings.training_max_concurrent_jobs,
+            cpu_budget=settings.training_cpu_budget
+        )
+    return _job_manager
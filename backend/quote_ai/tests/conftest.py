@@ -1,10 +1,15 @@
 import pytest
+import pytest_asyncio
 from quote_ai.core.models import Customer, Quote, ProductSpecification, CommunicationContext, Base
 from quote_ai.db.database import get_db
 from quote_ai.utils.config import Settings
 from quote_ai.services.ai_service import AIService
+from quote_ai.services.model_training import ModelTrainingService
+from quote_ai.services.llm_http import LLMHttpClients
+from quote_ai.services.llm_gateway import LLMGateway
 from quote_ai.api.routers.quotes import get_ai_service
 from fastapi.testclient import TestClient
+from unittest.mock import patch
 from datetime import datetime
 from quote_ai.api.main import app
 import uuid
@@ -16,6 +21,7 @@ import shutil
 from sklearn.ensemble import GradientBoostingRegressor
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from aiohttp import web
 from dotenv import load_dotenv
 
 # Set test environment before loading any other modules
@@ -127,12 +133,43 @@ def settings():
         log_file="logs/quote_ai_test.log"
     )
 
-@pytest.fixture(scope="session")
+@pytest.fixture
 def ai_service(settings):
-    """Session-wide AI service for testing"""
-    service = AIService(settings=settings)
+    """AI service with the OpenAI client patched out and a small model fitted on two quotes"""
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'):
+        service = AIService(settings=settings)
+        X = pd.DataFrame({
+            'weight_per_meter': [2.5, 3.0],
+            'total_length': [100.0, 150.0],
+            'machining_complexity': [2, 3],
+            'surface_treatment_anodized': [1, 0],
+            'surface_treatment_painted': [0, 1],
+            'surface_treatment_raw': [0, 0],
+            'alloy_6060': [1, 0],
+            'alloy_6063': [0, 1],
+            'alloy_6082': [0, 0]
+        })
+        y = np.array([1000.0, 1500.0])
+        service.model = GradientBoostingRegressor()
+        service.model.fit(X, y)
+        return service
+
+@pytest.fixture
+def model_training_service(settings):
+    service = ModelTrainingService(settings=settings)
     return service
 
+@pytest.fixture
+def sample_training_data():
+    return pd.DataFrame({
+        'weight_per_meter': np.random.uniform(1.0, 5.0, 100),
+        'total_length': np.random.uniform(50, 500, 100),
+        'machining_complexity': np.random.randint(1, 4, 100),
+        'surface_treatment': np.random.choice(['anodized', 'painted', 'raw'], 100),
+        'alloy': np.random.choice(['6060', '6063', '6082'], 100),
+        'price': np.random.uniform(1000, 10000, 100)
+    })
+
 @pytest.fixture
 def sample_customer(db_session):
     unique_id = str(uuid.uuid4())[:8]
@@ -195,4 +232,60 @@ def sample_quote(db_session, sample_customer, sample_product_spec, sample_commun
     db_session.commit()
     db_session.refresh(quote)
     
-    return quote 
\ No newline at end of file
+    return quote 
+
+
+class FakeOllama:
+    """Stand-in for Ollama's /api/generate, answering with whatever handler the test sets"""
+
+    def __init__(self):
+        self.url = None
+        self.handler = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self.handler(request)
+        finally:
+            self.in_flight -= 1
+
+@pytest_asyncio.fixture
+async def fake_ollama():
+    """A FakeOllama listening on a free local port for the duration of one test"""
+    server = FakeOllama()
+    app = web.Application()
+    app.router.add_post("/api/generate", server.generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    server.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    yield server
+    await runner.cleanup()
+
+@pytest_asyncio.fixture
+async def ollama_service(settings, fake_ollama):
+    """Factory for AI services talking to fake_ollama through their own pools and gateway"""
+    services = []
+
+    def build(llm_cache=None, **overrides):
+        service_settings = settings.model_copy(update={
+            'environment': 'development', 'ai_provider': 'ollama', 'ollama_base_url': fake_ollama.url,
+            'llm_cache_enabled': False, **overrides
+        })
+        with patch('quote_ai.services.ai_service.AsyncOpenAI'):
+            service = AIService(
+                settings=service_settings,
+                llm_clients=LLMHttpClients(service_settings),
+                llm_cache=llm_cache,
+                llm_gateway=LLMGateway(service_settings)
+            )
+        services.append(service)
+        return service
+
+    yield build
+    for service in services:
+        await service.llm_clients.close()
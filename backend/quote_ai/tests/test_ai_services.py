@@ -1,13 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
 import pandas as pd
-import numpy as np
-from datetime import datetime
 import os
-from quote_ai.services.ai_service import AIService
-from quote_ai.services.model_training import ModelTrainingService
 from quote_ai.utils.config import Settings
-from sklearn.ensemble import GradientBoostingRegressor
 
 @pytest.fixture
 def settings():
@@ -25,44 +20,6 @@ def mock_openai():
         mock.return_value = mock_client
         yield mock
 
-@pytest.fixture
-def ai_service(settings, mock_openai):
-    with patch('quote_ai.services.ai_service.OpenAI'), \
-         patch('quote_ai.services.ai_service.AsyncOpenAI'):
-        service = AIService(settings=settings)
-        # Create a simple trained model for testing
-        X = pd.DataFrame({
-            'weight_per_meter': [2.5, 3.0],
-            'total_length': [100.0, 150.0],
-            'machining_complexity': [2, 3],
-            'surface_treatment_anodized': [1, 0],
-            'surface_treatment_painted': [0, 1],
-            'surface_treatment_raw': [0, 0],
-            'alloy_6060': [1, 0],
-            'alloy_6063': [0, 1],
-            'alloy_6082': [0, 0]
-        })
-        y = np.array([1000.0, 1500.0])
-        service.model = GradientBoostingRegressor()
-        service.model.fit(X, y)
-        return service
-
-@pytest.fixture
-def model_training_service(settings):
-    service = ModelTrainingService(settings=settings)
-    return service
-
-@pytest.fixture
-def sample_training_data():
-    return pd.DataFrame({
-        'weight_per_meter': np.random.uniform(1.0, 5.0, 100),
-        'total_length': np.random.uniform(50, 500, 100),
-        'machining_complexity': np.random.randint(1, 4, 100),
-        'surface_treatment': np.random.choice(['anodized', 'painted', 'raw'], 100),
-        'alloy': np.random.choice(['6060', '6063', '6082'], 100),
-        'price': np.random.uniform(1000, 10000, 100)
-    })
-
 @pytest.fixture
 def sample_quotes():
     return [
@@ -90,7 +47,6 @@ def sample_quotes():
 
 def test_ai_service_initialization(ai_service):
     assert ai_service.settings is not None
-    assert ai_service.client is not None
     assert ai_service.async_client is not None
 
 def test_ai_service_predict_price(ai_service):
@@ -1,4 +1,5 @@
 import pytest
+import json
 from fastapi.testclient import TestClient
 from quote_ai.api.main import app
 from quote_ai.core.models import Customer, Quote, ProductSpecification, CommunicationContext
@@ -144,6 +145,39 @@ def test_predict_price(client, sample_product_spec):
     assert "predicted_price" in data
     assert "confidence" in data
 
+def test_predict_price_batch(client, sample_product_spec):
+    other_spec = dict(sample_product_spec, alloy="6082", machining_complexity="high")
+    response = client.post(
+        "/api/quotes/predict-price/batch",
+        json=[sample_product_spec, other_spec, sample_product_spec]
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["index"] for row in rows] == [0, 1, 2]
+    assert rows[0]["predicted_price"] == rows[2]["predicted_price"]
+
+def test_predict_price_batch_upload(client):
+    csv_content = (
+        "alloy,weight_per_meter,total_length,surface_treatment,machining_complexity\n"
+        "6060,1.5,100.0,anodized,medium\n"
+        "6063,2.0,250.0,raw,low\n"
+    )
+    response = client.post(
+        "/api/quotes/predict-price/batch/upload",
+        files={"file": ("specs.csv", csv_content.encode(), "text/csv")}
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 2
+
+    bad_content = csv_content.replace("anodized", "chromed")
+    response = client.post(
+        "/api/quotes/predict-price/batch/upload",
+        files={"file": ("specs.csv", bad_content.encode(), "text/csv")}
+    )
+    assert response.status_code == 422
+
 def test_generate_quote_pdf(client, sample_quote):
     response = client.get(f"/api/quotes/{sample_quote.id}/pdf")
     assert response.status_code == 200
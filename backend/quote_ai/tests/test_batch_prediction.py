@@ -0,0 +1,12 @@
+def test_ai_service_predict_prices_matches_single(ai_service):
+    specs = [
+        {'weight_per_meter': 2.5, 'total_length': 100.0, 'machining_complexity': 'medium',
+         'surface_treatment': 'anodized', 'alloy': '6060'},
+        {'weight_per_meter': 3.0, 'total_length': 150.0, 'machining_complexity': 'high',
+         'surface_treatment': 'painted', 'alloy': '6063'}
+    ]
+    batch = ai_service.predict_prices(specs)
+    assert len(batch) == 2
+    for spec, result in zip(specs, batch):
+        assert result == ai_service.predict_price(spec)
+    assert ai_service.predict_prices([]) == []
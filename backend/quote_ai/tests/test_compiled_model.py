@@ -0,0 +1,26 @@
+import numpy as np
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.feature_encoder import FeatureEncoder, predict_encoded
+from quote_ai.services.compiled_model import CompiledEnsemble
+from sklearn.ensemble import GradientBoostingRegressor
+
+def test_compiled_ensemble_matches_sklearn(sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    model = GradientBoostingRegressor(n_estimators=30, max_depth=4).fit(X, sample_training_data['price'])
+
+    compiled = CompiledEnsemble.compile(model)
+    rows = encoder.sample_rows(64)
+    assert compiled.verify(model, rows)
+    np.testing.assert_allclose(compiled.predict(rows), predict_encoded(model, rows), rtol=1e-9)
+    np.testing.assert_allclose(compiled.predict(rows[:1]), predict_encoded(model, rows[:1]), rtol=1e-9)
+    assert list(compiled.feature_names_in_) == encoder.feature_names
+
+def test_model_registry_compiles_when_enabled(sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    model = GradientBoostingRegressor(n_estimators=10).fit(X, sample_training_data['price'])
+
+    assert ModelRegistry("unused.joblib").publish(model).compiled is None
+    snapshot = ModelRegistry("unused.joblib", inference_engine="compiled").publish(model)
+    assert snapshot.compiled is not None
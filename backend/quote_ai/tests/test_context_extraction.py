@@ -0,0 +1,41 @@
+import pytest
+import asyncio
+import json
+
+@pytest.mark.asyncio
+async def test_extract_context_maps_chunks_concurrently_and_merges(fake_ollama, ollama_service):
+    from aiohttp import web
+    from quote_ai.services.tokens import count_tokens, split_by_tokens
+    prompts = []
+
+    async def generate(request):
+        prompt = (await request.json())['prompt']
+        prompts.append(prompt)
+        await asyncio.sleep(0.3)
+        urgent = "rush order" in prompt
+        return web.json_response({"response": json.dumps({
+            "context_text": f"Section {len(prompts)}",
+            "extracted_urgency": "High" if urgent else "Low",
+            "custom_requests": "Anodized finish" if urgent else "None",
+            "past_agreements": "Frame agreement 2023"
+        })})
+
+    fake_ollama.handler = generate
+    document = "\n\n".join(
+        [f"Paragraph {i} describes the extrusion profile and its tolerances in some detail." for i in range(8)]
+        + ["This is a rush order."]
+    )
+    chunks = split_by_tokens(document, 60)
+    assert len(chunks) >= 3 and all(count_tokens(chunk) <= 60 for chunk in chunks)
+    assert "\n\n".join(chunks) == document
+
+    service = ollama_service(llm_max_concurrency_ollama=4, context_chunk_tokens=60)
+    context = await service.extract_context(document, {"alloy": "6060"})
+    # Chunks run side by side, as many at once as the Ollama slots allow
+    assert fake_ollama.max_in_flight == min(len(chunks), 4)
+    assert len(prompts) == len(chunks) and all("alloy: 6060" in prompt for prompt in prompts)
+    assert context['extracted_urgency'] == "high"
+    assert context['custom_requests'] == "Anodized finish"
+    assert context['past_agreements'] == "Frame agreement 2023"
+    # Every chunk was requested before the first answer came back
+    assert context['context_text'] == f"Section {len(chunks)}"
@@ -0,0 +1,166 @@
+import pytest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from quote_ai.services.ai_service import AIService
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.feature_encoder import FeatureEncoder
+from quote_ai.core.models import Quote, ProductSpecification
+from datetime import timedelta
+from sklearn.ensemble import GradientBoostingRegressor
+
+def test_customer_features_are_maintained_incrementally(settings, tmp_path, db_session):
+    from sqlalchemy.orm import sessionmaker
+    from quote_ai.core.models import Customer
+    from quote_ai.services.customer_features import (
+        CustomerFeatureStore, QuoteContribution, customer_history_frame, point_in_time_features
+    )
+    customer, other = Customer(company_name="Alu GmbH"), Customer(company_name="Profil AG")
+    db_session.add_all([customer, other])
+    db_session.commit()
+    store = CustomerFeatureStore(lambda: sessionmaker(bind=db_session.connection())(), ttl=60)
+
+    start = datetime(2024, 1, 1)
+    quotes = []
+    for i, (price, status) in enumerate([(1000.0, "approved"), (3000.0, "draft"), (None, "draft")]):
+        quote = Quote(title=f"Quote {i}", reference_number=f"CUST-{i}", customer_id=customer.id,
+                      status=status, predicted_price=price)
+        quote.created_at = start + timedelta(days=10 * i)
+        spec = ProductSpecification(alloy="6060", weight_per_meter=2.0, total_length=100.0,
+                                    surface_treatment="raw", machining_complexity="low")
+        quote.product_specs = [spec]
+        db_session.add(quote)
+        db_session.flush()
+        store.refresh(db_session, store.apply(db_session, None, QuoteContribution.of(quote, [spec])))
+        db_session.commit()
+        quotes.append(quote)
+
+    features = store.features_for(customer.id)
+    assert features['customer_quote_count'] == 3
+    assert features['customer_avg_price_per_kg'] == pytest.approx(10.0)  # (5 + 15) / 2
+    assert features['customer_acceptance_rate'] == pytest.approx(1 / 3)
+    assert features['customer_days_since_last_quote'] > 0
+    assert store.stats()['misses'] == 0
+    # Unknown customers are read once from the table, then served from memory
+    assert store.features_for(other.id)['customer_quote_count'] == -1.0
+    assert store.features_for(other.id)['customer_quote_count'] == -1.0
+    assert store.stats()['misses'] == 1 and store.features_for(None)['customer_acceptance_rate'] == -1.0
+
+    # An update moves the quote's contribution, a delete removes it
+    before = QuoteContribution.of(quotes[1])
+    quotes[1].status = "approved"
+    quotes[1].final_price = 2000.0
+    store.refresh(db_session, store.apply(db_session, before, QuoteContribution.of(quotes[1])))
+    assert store.features_for(customer.id)['customer_acceptance_rate'] == pytest.approx(2 / 3)
+    assert store.features_for(customer.id)['customer_avg_price_per_kg'] == pytest.approx(7.5)
+    store.refresh(db_session, store.apply(db_session, QuoteContribution.of(quotes[0]), None))
+    db_session.delete(quotes[0])
+    db_session.commit()
+    features = store.features_for(customer.id)
+    assert features['customer_quote_count'] == 2
+    assert features['customer_avg_price_per_kg'] == pytest.approx(10.0)
+
+    # Training sees each quote's features as of just before it was created
+    history = point_in_time_features(customer_history_frame(db_session))
+    assert history.loc[quotes[1].id, 'customer_quote_count'] == 0
+    assert history.loc[quotes[1].id, 'customer_avg_price_per_kg'] == -1.0
+    assert history.loc[quotes[2].id].to_dict() == pytest.approx({
+        'customer_quote_count': 1, 'customer_avg_price_per_kg': 10.0,
+        'customer_acceptance_rate': 1.0, 'customer_days_since_last_quote': 10.0
+    })
+
+    # A model trained with customer features prices the same spec per customer
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'weight_per_meter': rng.uniform(1, 5, 300), 'total_length': rng.uniform(50, 500, 300),
+        'machining_complexity': 2, 'surface_treatment': 'raw', 'alloy': '6060',
+        'customer_avg_price_per_kg': rng.choice([-1.0, 5.0, 10.0], 300)
+    })
+    encoder = FeatureEncoder.default(customer_features=True)
+    assert encoder.uses_customer_features and not FeatureEncoder.default().uses_customer_features
+    price = frame['weight_per_meter'] * frame['total_length'] * frame['customer_avg_price_per_kg'].clip(lower=6)
+    model = GradientBoostingRegressor(n_estimators=50).fit(encoder.to_frame(encoder.encode_frame(frame)), price)
+    registry = ModelRegistry(str(tmp_path / "missing.joblib"))
+    registry.publish(model)
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'):
+        service = AIService(settings=settings, model_registry=registry, customer_features=store)
+    spec = {'weight_per_meter': 3.0, 'total_length': 300.0, 'machining_complexity': 'medium',
+            'surface_treatment': 'raw', 'alloy': '6060'}
+    anonymous = service.predict_price(spec)['predicted_price']
+    known = service.predict_price({**spec, 'customer_id': customer.id})['predicted_price']
+    assert known > anonymous * 1.3
+    batch = service.predict_frame(pd.DataFrame([spec, {**spec, 'customer_id': customer.id}]))
+    np.testing.assert_allclose(batch['predicted_price'], [anonymous, known])
+
+def test_deleting_latest_quote_rewinds_last_quote_at(db_session, sample_customer):
+    from sqlalchemy.orm import sessionmaker
+    from quote_ai.core.models import CustomerPricingFeatures
+    from quote_ai.services.customer_features import CustomerFeatureStore, QuoteContribution
+    store = CustomerFeatureStore(lambda: sessionmaker(bind=db_session.connection())(), ttl=60)
+    start = datetime(2024, 1, 1)
+    quotes = []
+    for i in range(3):
+        quote = Quote(title=f"Quote {i}", reference_number=f"LAST-{i}", customer_id=sample_customer.id,
+                      status="draft", predicted_price=1000.0)
+        quote.created_at = start + timedelta(days=10 * i)
+        db_session.add(quote)
+        db_session.flush()
+        store.apply(db_session, None, QuoteContribution.of(quote, []))
+        quotes.append(quote)
+    db_session.commit()
+
+    def last_quote_at():
+        return db_session.get(CustomerPricingFeatures, sample_customer.id, populate_existing=True).last_quote_at
+
+    # Deleting an older quote leaves it alone, deleting the latest falls back to the one before
+    store.apply(db_session, QuoteContribution.of(quotes[0], []), None)
+    db_session.delete(quotes[0])
+    db_session.commit()
+    assert last_quote_at() == start + timedelta(days=20)
+    store.apply(db_session, QuoteContribution.of(quotes[2], []), None)
+    db_session.delete(quotes[2])
+    db_session.commit()
+    assert last_quote_at() == start + timedelta(days=10)
+    store.apply(db_session, QuoteContribution.of(quotes[1], []), None)
+    db_session.delete(quotes[1])
+    db_session.commit()
+    assert last_quote_at() is None
+
+def test_customer_with_quote_history_can_be_deleted(db_session, sample_customer):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import sessionmaker
+    from quote_ai.api.routers import customers, quotes
+    from quote_ai.core.models import CustomerPricingFeatures
+    from quote_ai.db.database import get_db
+    from quote_ai.services.customer_features import CustomerFeatureStore
+
+    app = FastAPI()
+    app.include_router(customers.router, prefix="/api")
+    app.include_router(quotes.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: db_session
+    store = CustomerFeatureStore(lambda: sessionmaker(bind=db_session.connection())(), ttl=60)
+    customer_id = sample_customer.id
+    with patch('quote_ai.services.customer_features._feature_store', store), \
+         patch('quote_ai.api.routers.quotes.index_snapshot'), TestClient(app) as client:
+        for i, status in enumerate(["draft", "approved"]):
+            response = client.post("/api/quotes/", json={
+                "title": f"Quote {i}", "reference_number": f"DEL-{i}",
+                "validity_date": datetime.now().isoformat(), "customer_id": customer_id,
+                "final_price": 1000.0, "status": status,
+                "product_specs": {
+                    "description": "Frame", "profile_type": "hollow", "alloy": "6060",
+                    "weight_per_meter": 2.0, "total_length": 100.0,
+                    "surface_treatment": "raw", "machining_complexity": "low"
+                },
+                "communication_context": {"context_text": "Repeat order"}
+            })
+            assert response.status_code == 200
+        assert store.features_for(customer_id)['customer_acceptance_rate'] == pytest.approx(0.5)
+
+        response = client.delete(f"/api/customers/{customer_id}")
+        assert response.status_code == 200
+
+    assert db_session.get(CustomerPricingFeatures, customer_id) is None
+    assert store.features_for(customer_id)['customer_quote_count'] == -1.0
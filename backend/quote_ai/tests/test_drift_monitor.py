@@ -0,0 +1,37 @@
+from unittest.mock import patch
+import pandas as pd
+from quote_ai.services.ai_service import AIService
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.model_training import ModelTrainingService
+from sklearn.ensemble import GradientBoostingRegressor
+
+def test_drift_monitor_scores_inputs_against_training_data(settings, tmp_path, sample_training_data):
+    settings = settings.model_copy(update={'model_path': str(tmp_path / "price_predictor")})
+    ModelTrainingService(settings).train_model(sample_training_data, search='halving_grid',
+                                               estimator='hist_gradient_boosting')
+    registry = ModelRegistry(settings.model_path)
+    assert registry.load().drift_reference.rows == len(sample_training_data)
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'):
+        service = AIService(settings=settings, model_registry=registry)
+
+    specs = sample_training_data.drop(columns=['price'])
+    for spec in specs.to_dict(orient='records'):
+        service.predict_price(spec)
+    report = registry.drift_monitor.report()
+    assert report['observations'] == len(specs) and report['sufficient_data']
+    for name, feature in report['features'].items():
+        assert feature['status'] == 'stable', name
+        assert sum(feature['observed']) == len(specs)
+
+    service.predict_frame(specs.assign(weight_per_meter=specs['weight_per_meter'] * 10, alloy='6082'))
+    report = registry.drift_monitor.report()
+    assert report['observations'] == 2 * len(specs)
+    assert report['features']['weight_per_meter']['status'] == 'drifted'
+    assert report['features']['weight_per_meter']['ks'] > 0.4
+    assert report['features']['alloy']['status'] == 'drifted'
+    assert report['features']['total_length']['status'] == 'stable'
+
+    # A new model version starts counting from scratch
+    registry.publish(GradientBoostingRegressor(n_estimators=5).fit(
+        pd.get_dummies(specs), sample_training_data['price']))
+    assert not registry.drift_monitor.report()['enabled']
@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import patch
+from quote_ai.services.ai_service import AIService
+from quote_ai.services.feature_encoder import FeatureEncoder
+from quote_ai.services.fallback_pricer import FallbackPricer
+from quote_ai.utils.config import Settings
+
+def test_fallback_pricer_is_deterministic():
+    encoder = FeatureEncoder.default()
+    spec = {'weight_per_meter': 2.0, 'total_length': 100.0, 'machining_complexity': 'low',
+            'surface_treatment': 'raw', 'alloy': '6060'}
+    pricer = FallbackPricer()
+    price = pricer.predict(encoder.encode(spec))[0]
+    assert price == pytest.approx(2.0 * 100.0 * FallbackPricer.RATE_PER_KG['6060'])
+    painted = pricer.predict(encoder.encode(dict(spec, surface_treatment='painted')))[0]
+    assert painted == pytest.approx(price * FallbackPricer.TREATMENT_FACTOR['painted'])
+
+def test_ai_service_cold_start_serves_fallback(tmp_path):
+    settings = Settings(
+        openai_api_key="test_key",
+        model_path=str(tmp_path / "models" / "price_predictor.joblib"),
+        database_url="sqlite:///./test.db"
+    )
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'), \
+         patch.object(AIService, '_start_background_training'):
+        service = AIService(settings=settings)
+
+    assert service.model_registry.snapshot.fallback
+    assert not service.model_registry.ready
+    result = service.predict_price({'weight_per_meter': 2.0, 'total_length': 100.0,
+                                    'machining_complexity': 'medium',
+                                    'surface_treatment': 'anodized', 'alloy': '6063'})
+    assert result['confidence'] == FallbackPricer.CONFIDENCE
+    assert result['predicted_price'] > 0
+
+    # Background training swaps the trained model in without another load
+    service._start_background_training()
+    service.training_thread.join(timeout=60)
+    assert service.model_registry.ready
+    assert service.model_status()['training_in_progress'] is False
@@ -0,0 +1,26 @@
+import pandas as pd
+import numpy as np
+from quote_ai.services.feature_encoder import FeatureEncoder
+
+def test_feature_encoder_matches_get_dummies(sample_training_data):
+    df = sample_training_data.drop(columns=['price'])
+    expected = pd.get_dummies(df).astype(float)
+    encoder = FeatureEncoder(expected.columns)
+
+    np.testing.assert_array_equal(encoder.encode_frame(df), expected.to_numpy())
+    row = df.iloc[0].to_dict()
+    row['machining_complexity'] = {1: 'low', 2: 'medium', 3: 'high'}[row['machining_complexity']]
+    np.testing.assert_array_equal(encoder.encode(row)[0], expected.to_numpy()[0])
+
+def test_feature_encoder_ignores_unknown_categories():
+    encoder = FeatureEncoder.default()
+    row = encoder.encode({
+        'weight_per_meter': 2.0,
+        'total_length': 10.0,
+        'machining_complexity': 'HIGH',
+        'surface_treatment': 'chromed',
+        'alloy': '6082'
+    })
+    assert row.shape == (1, encoder.n_features)
+    assert row[0, :3].tolist() == [2.0, 10.0, 3.0]
+    assert row[0, 3:].sum() == 1.0
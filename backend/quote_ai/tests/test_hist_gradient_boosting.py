@@ -0,0 +1,32 @@
+import pytest
+import numpy as np
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.feature_encoder import FeatureEncoder, predict_encoded
+from quote_ai.services.model_training import ModelTrainingService
+from quote_ai.utils.config import Settings
+
+def test_feature_encoder_ordinal_layout(sample_training_data):
+    encoder = FeatureEncoder.ordinal()
+    assert encoder.categorical_mask == [False, False, False, True, True]
+    features = encoder.encode_frame(sample_training_data)
+    for i in range(5):
+        np.testing.assert_array_equal(encoder.encode(sample_training_data.iloc[i].to_dict())[0], features[i])
+    unknown = encoder.encode({'weight_per_meter': 1.0, 'total_length': 1.0, 'machining_complexity': 'low',
+                              'surface_treatment': 'chromed', 'alloy': '6060'})
+    assert np.isnan(unknown[0, 3])
+
+@pytest.mark.parametrize("search", ["halving_grid", "halving_random"])
+def test_model_training_hist_gradient_boosting(tmp_path, sample_training_data, search):
+    settings = Settings(openai_api_key="test_key", model_path=str(tmp_path / "price_predictor"),
+                        database_url="sqlite:///./test.db")
+    service = ModelTrainingService(settings)
+    result = service.train_model(sample_training_data, search=search, estimator='hist_gradient_boosting')
+    assert result['search'] == search
+    assert list(service.model.feature_names_in_) == FeatureEncoder.ordinal().feature_names
+
+    # The registry serves it from the versioned artifact with the matching encoder
+    snapshot = ModelRegistry(settings.model_path).load()
+    assert snapshot.intervals is not None
+    spec = sample_training_data.iloc[0].to_dict()
+    np.testing.assert_allclose(predict_encoded(snapshot.model, snapshot.encoder.encode(spec)),
+                               predict_encoded(service.model, FeatureEncoder.ordinal().encode(spec)))
@@ -0,0 +1,38 @@
+import pandas as pd
+import numpy as np
+from quote_ai.services.model_artifact import ModelArtifactStore
+from quote_ai.services.model_training import ModelTrainingService
+from quote_ai.utils.config import Settings
+
+def test_model_training_incremental_promotes_only_without_regression(tmp_path, sample_training_data):
+    df = sample_training_data.assign(
+        spec_id=np.arange(100),
+        changed_at=pd.date_range('2026-01-01', periods=100, freq='h', tz='UTC'),
+        is_final=True
+    )
+    df.loc[df.index % 10 == 0, 'is_final'] = False
+    settings = Settings(openai_api_key="test_key", model_path=str(tmp_path / "price_predictor"),
+                        database_url="sqlite:///./test.db", training_max_regression=-1.0)
+    service = ModelTrainingService(settings)
+    service.train_model(df.iloc[:70], search='halving_grid', estimator='hist_gradient_boosting')
+    store = ModelArtifactStore(settings.model_path)
+    parent = store.latest()
+    assert store.manifest()['training_watermark']['spec_id'] == 69
+
+    # A candidate that has to halve the error is never promoted
+    result = service.train_incremental('warm_start', df)
+    assert result['new_rows'] == 27
+    assert not result['promoted']
+    assert store.latest() == parent
+
+    service.settings = settings.model_copy(update={'training_max_regression': 10.0})
+    result = service.train_incremental('warm_start', df)
+    assert result['promoted']
+    # The added rounds only see the quotes finalized since the parent was trained
+    assert result['train_rows'] == result['new_rows'] - result['holdout_rows']
+    assert store.latest() == result['version'] != parent
+    manifest = store.manifest()
+    assert manifest['metrics']['parent_version'] == parent
+    # The held out quotes are trained on by the next run
+    assert manifest['training_watermark']['spec_id'] == 93
+    assert service.train_incremental('window', df.iloc[:90])['new_rows'] == 0
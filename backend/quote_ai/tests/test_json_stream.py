@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import asyncio
+import json
+
+@pytest.mark.asyncio
+async def test_stream_extract_context_emits_fields_as_they_complete(fake_ollama, ollama_service):
+    from aiohttp import web
+    from fastapi import FastAPI
+    from httpx import AsyncClient
+    from quote_ai.api.routers import quotes
+    answer = json.dumps({
+        "context_text": "Window frames for a school",
+        "extracted_urgency": "High",
+        "custom_requests": ["RAL 9010", "Protective film"]
+    })
+    release = asyncio.Event()
+
+    async def generate(request):
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        split = answer.index('"extracted_urgency"')
+        for i in range(0, len(answer), 8):
+            if i >= split:
+                # The rest of the answer waits until the first field was relayed
+                await release.wait()
+            await response.write((json.dumps({"response": answer[i:i + 8], "done": False}) + "\n").encode())
+        await response.write((json.dumps({"response": "", "done": True}) + "\n").encode())
+        return response
+
+    fake_ollama.handler = generate
+    service = ollama_service()
+    fields = service.stream_extract_context("Frames needed before the term starts", {"alloy": "6063"})
+    assert await fields.__anext__() == ("context_text", "Window frames for a school")
+    release.set()
+    rest = [item async for item in fields]
+    # Validated as they arrive, the field the model left out comes last with its default
+    assert rest == [
+        ("extracted_urgency", "high"),
+        ("custom_requests", "RAL 9010\nProtective film"),
+        ("past_agreements", "")
+    ]
+
+    # The same parser backs the non-streaming path, preamble and fences included
+    assert service._parse_context('Sure:\n```json\n{"extracted_urgency": "LOW"}\n```')['extracted_urgency'] == "low"
+    assert service._parse_context("no JSON here")['custom_requests'] == "no JSON here"
+
+    api = FastAPI()
+    api.include_router(quotes.router, prefix="/api")
+    pdf_service = MagicMock()
+    pdf_service.extract_text.return_value = "Frames needed before the term starts"
+    with patch.object(quotes, '_ai_service', service), \
+         patch.object(quotes, 'get_pdf_service', return_value=pdf_service):
+        async with AsyncClient(app=api, base_url="http://test") as client:
+            response = await client.post("/api/quotes/process-file/stream", json={
+                "file_path": "uploads/request.pdf", "product_specs": {"alloy": "6063"}
+            })
+    assert response.status_code == 200
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [json.loads(data[len("data: "):]).get("name") for event, data in events if event == "event: field"]
+    assert names == ["context_text", "extracted_urgency", "custom_requests", "past_agreements"]
+    event, data = events[-1]
+    done = json.loads(data[len("data: "):])
+    assert event == "event: done" and done['extracted_context']['extracted_urgency'] == "high"
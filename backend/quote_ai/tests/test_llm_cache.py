@@ -0,0 +1,78 @@
+import pytest
+import time
+
+def test_llm_response_cache_expires_and_evicts(tmp_path):
+    from quote_ai.services.llm_cache import LLMResponseCache
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), ttl=60, max_entries=10)
+    key = LLMResponseCache.make_key("ollama", "llama2", "Extract   the\n  context", 0.0)
+    assert key == LLMResponseCache.make_key("ollama", "llama2", "Extract the context", 0.0)
+    assert key != LLMResponseCache.make_key("ollama", "llama2", "Extract the context", 0.7)
+    assert key != LLMResponseCache.make_key("openai", "llama2", "Extract the context", 0.0)
+    assert cache.cacheable(0.0) and not cache.cacheable(0.7)
+
+    assert cache.get(key) is None
+    cache.put(key, "ollama", "llama2", 0.0, '{"urgency": "high"}')
+    assert cache.get(key) == '{"urgency": "high"}'
+    for i in range(10):
+        cache.put(f"key-{i}", "ollama", "llama2", 0.0, f"response {i}")
+        if i == 4:
+            cache.get(key)
+    # Least recently read entries go first, the one read in between survives
+    assert cache.get(key) is not None and cache.get("key-0") is None
+    stats = cache.stats()
+    assert stats['entries'] <= 10 and stats['evictions'] == 2
+    assert stats['hits'] == 3 and stats['misses'] == 2 and stats['hit_rate'] == 0.6
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get(key) is None
+    # Survives a restart
+    cache.ttl = 60
+    cache.put(key, "ollama", "llama2", 0.0, "persisted")
+    cache.close()
+    assert LLMResponseCache(str(tmp_path / "llm.sqlite3")).get(key) == "persisted"
+
+@pytest.mark.asyncio
+async def test_extract_context_is_served_from_llm_cache(fake_ollama, ollama_service, tmp_path):
+    from aiohttp import web
+    from quote_ai.services.llm_cache import LLMResponseCache
+    calls = []
+
+    async def generate(request):
+        body = await request.json()
+        calls.append(body)
+        return web.json_response({"response": '{"extracted_urgency": "high"}'})
+
+    fake_ollama.handler = generate
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"))
+    service = ollama_service(llm_cache=cache)
+    first = await service.extract_context("Delivery needed next week", {"alloy": "6060"})
+    assert await service.extract_context("Delivery needed next week", {"alloy": "6060"}) == first
+    assert len(calls) == 1 and calls[0]['options']['temperature'] == 0
+    await service.extract_context("Delivery needed next week", {"alloy": "6060"}, bypass_cache=True)
+    await service.extract_context("Delivery needed in May", {"alloy": "6060"})
+    assert len(calls) == 3
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2 and stats['bypassed'] == 1
+
+@pytest.mark.asyncio
+async def test_llm_cache_is_read_and_written_off_the_event_loop(fake_ollama, ollama_service, tmp_path):
+    import threading
+    from aiohttp import web
+    from quote_ai.services.llm_cache import LLMResponseCache
+
+    async def generate(request):
+        return web.json_response({"response": '{"extracted_urgency": "high"}'})
+
+    fake_ollama.handler = generate
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"))
+    threads = []
+    get, put = cache.get, cache.put
+    cache.get = lambda *args: threads.append(threading.get_ident()) or get(*args)
+    cache.put = lambda *args: threads.append(threading.get_ident()) or put(*args)
+    service = ollama_service(llm_cache=cache)
+    for _ in range(2):
+        await service.extract_context("Delivery needed next week", {"alloy": "6060"})
+    # A miss, a write and a hit, none of them on the loop's thread
+    assert len(threads) == 3 and threading.get_ident() not in threads
+    assert cache.stats()['hits'] == 1
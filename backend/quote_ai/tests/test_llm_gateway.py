@@ -0,0 +1,128 @@
+import pytest
+from unittest.mock import patch
+import asyncio
+
+@pytest.mark.asyncio
+async def test_llm_gateway_retries_429_and_5xx_with_backoff(fake_ollama, ollama_service):
+    from aiohttp import web
+    statuses = [429, 503]
+
+    async def generate(request):
+        if statuses:
+            return web.Response(status=statuses.pop(0), text="overloaded")
+        return web.json_response({"response": '{"extracted_urgency": "high"}'})
+
+    fake_ollama.handler = generate
+    service = ollama_service(llm_backoff_base=0.01, llm_backoff_max=0.015)
+    with patch('quote_ai.services.llm_gateway.random.uniform', side_effect=lambda low, high: high) as uniform:
+        assert (await service.extract_context("Delivery next week", {}))['extracted_urgency'] == "high"
+    # Full jitter over an exponentially growing window, capped at llm_backoff_max
+    assert [call.args for call in uniform.call_args_list] == [(0, 0.01), (0, 0.015)]
+    stats = service.llm_gateway.stats()['ollama']
+    assert stats['retries'] == 2 and stats['completed'] == 1 and stats['circuit'] == "closed"
+
+@pytest.mark.asyncio
+async def test_llm_gateway_does_not_retry_client_errors(settings):
+    from quote_ai.services.llm_gateway import LLMGateway, LLMProviderError
+    gateway = LLMGateway(settings.model_copy(update={'llm_backoff_base': 0.01}))
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise LLMProviderError("ollama", 400, "unknown model")
+
+    with pytest.raises(LLMProviderError):
+        await gateway.call("ollama", bad_request)
+    stats = gateway.stats()['ollama']
+    assert len(attempts) == 1 and stats['retries'] == 0 and stats['failed'] == 1
+    assert stats['consecutive_failures'] == 0
+
+@pytest.mark.asyncio
+async def test_llm_gateway_rejects_calls_beyond_its_queue(settings):
+    from quote_ai.services.llm_gateway import LLMGateway, LLMUnavailableError
+    gateway = LLMGateway(settings.model_copy(update={'llm_max_concurrency_ollama': 1, 'llm_max_queue': 1}))
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "done"
+
+    # One call in flight, one queued, the third is refused instead of waiting
+    running = [asyncio.create_task(gateway.call("ollama", slow)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert gateway.stats()['ollama']['in_flight'] == 1 and gateway.stats()['ollama']['queued'] == 1
+    with pytest.raises(LLMUnavailableError) as error:
+        await gateway.call("ollama", slow)
+    assert error.value.retry_after > 0
+    release.set()
+    assert await asyncio.gather(*running) == ["done", "done"]
+    stats = gateway.stats()['ollama']
+    assert stats['rejected'] == 1 and stats['completed'] == 2 and stats['queued'] == 0
+
+@pytest.mark.asyncio
+async def test_llm_gateway_circuit_recovers_through_half_open(settings):
+    from quote_ai.services.llm_gateway import LLMGateway, LLMProviderError, LLMUnavailableError
+    gateway = LLMGateway(settings.model_copy(update={
+        'llm_max_attempts': 1, 'llm_breaker_failures': 2, 'llm_breaker_reset_seconds': 0.05
+    }))
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        raise LLMProviderError("ollama", 503, "overloaded")
+
+    for _ in range(2):
+        with pytest.raises(LLMProviderError):
+            await gateway.call("ollama", failing)
+    assert gateway.stats()['ollama']['circuit'] == "open"
+    # Open: refused without calling the provider
+    with pytest.raises(LLMUnavailableError):
+        await gateway.call("ollama", failing)
+    assert len(attempts) == 2 and gateway.stats()['ollama']['short_circuited'] == 1
+
+    # Half open: a failed probe re-opens the circuit straight away
+    await asyncio.sleep(0.06)
+    with pytest.raises(LLMProviderError):
+        await gateway.call("ollama", failing)
+    assert gateway.stats()['ollama']['circuit'] == "open" and gateway.stats()['ollama']['circuit_opened'] == 2
+
+    # Only the probe goes through while half open, and its success closes the circuit
+    await asyncio.sleep(0.06)
+    release = asyncio.Event()
+
+    async def probe():
+        await release.wait()
+        return "recovered"
+
+    probing = asyncio.create_task(gateway.call("ollama", probe))
+    await asyncio.sleep(0)
+    assert gateway.stats()['ollama']['circuit'] == "half_open"
+    with pytest.raises(LLMUnavailableError):
+        await gateway.call("ollama", probe)
+    release.set()
+    assert await probing == "recovered"
+    assert gateway.stats()['ollama']['circuit'] == "closed"
+    assert await gateway.call("ollama", probe) == "recovered"
+
+@pytest.mark.asyncio
+async def test_open_circuit_answers_503_with_retry_after(fake_ollama, ollama_service):
+    from aiohttp import web
+    from fastapi import HTTPException
+    calls = []
+
+    async def generate(request):
+        calls.append(1)
+        return web.Response(status=503, text="overloaded")
+
+    fake_ollama.handler = generate
+    service = ollama_service(llm_backoff_base=0.01, llm_breaker_failures=3)
+    # Consecutive failures open the circuit, which then answers 503 without calling Ollama
+    with pytest.raises(HTTPException):
+        await service.extract_context("Delivery in May", {})
+    assert service.llm_gateway.stats()['ollama']['circuit'] == "open" and len(calls) == 3
+    with pytest.raises(HTTPException) as error:
+        await service.extract_context("Delivery in June", {})
+    assert error.value.status_code == 503 and "Retry-After" in error.value.headers
+    assert len(calls) == 3
+    stats = service.llm_gateway.stats()['ollama']
+    assert stats['short_circuited'] == 1 and stats['failed'] == 1
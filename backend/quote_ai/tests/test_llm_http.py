@@ -0,0 +1,20 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_ollama_calls_reuse_pooled_connections(fake_ollama, ollama_service):
+    from aiohttp import web
+
+    async def generate(request):
+        return web.json_response({"response": '{"extracted_urgency": "high"}'})
+
+    fake_ollama.handler = generate
+    service = ollama_service()
+    for _ in range(3):
+        await service.extract_context("Delivery needed next week", {"alloy": "6060"})
+    stats = service.llm_clients.stats()['ollama']
+    assert stats['open'] and stats['requests'] == 3
+    assert stats['connections_opened'] == 1 and stats['connections_reused'] == 2
+    assert stats['idle_connections'] == 1
+
+    await service.llm_clients.close()
+    assert not service.llm_clients.stats()['ollama']['open']
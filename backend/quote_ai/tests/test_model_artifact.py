@@ -0,0 +1,114 @@
+import pandas as pd
+import numpy as np
+import os
+from unittest.mock import patch
+import time
+import joblib
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.feature_encoder import FeatureEncoder, predict_encoded
+from quote_ai.services.compiled_model import CompiledEnsemble
+from quote_ai.services.prediction_intervals import IntervalModel
+from quote_ai.services.model_artifact import ModelArtifactStore
+from sklearn.ensemble import GradientBoostingRegressor
+
+def test_model_artifact_round_trip_is_memory_mapped(tmp_path, sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    y = sample_training_data['price']
+    model = GradientBoostingRegressor(n_estimators=20).fit(X, y)
+    intervals = IntervalModel.fit(X, y, {'n_estimators': 20})
+
+    store = ModelArtifactStore(str(tmp_path / "price_predictor"))
+    manifest = store.save(model, intervals, metrics={'r2': np.float64(0.5)})
+    assert store.latest() == manifest['version']
+    assert manifest['feature_names'] == list(encoder.feature_names)
+    assert manifest['metrics'] == {'r2': 0.5}
+    # Saving the same model again reuses the version
+    assert store.save(model, intervals)['version'] == manifest['version']
+
+    _, estimator, _ = store.load()
+    assert isinstance(estimator, GradientBoostingRegressor)
+    loaded, loaded_intervals = store.load_compiled()
+    assert isinstance(loaded.value, np.memmap)
+    rows = encoder.sample_rows(64)
+    np.testing.assert_allclose(loaded.predict(rows), predict_encoded(model, rows), rtol=1e-9)
+    for actual, expected in zip(loaded_intervals.predict(rows), intervals.predict(rows)):
+        np.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+def test_model_registry_prefers_artifact_over_joblib(tmp_path, sample_training_data):
+    model_path = str(tmp_path / "price_predictor")
+    X = pd.get_dummies(sample_training_data.drop(columns=['price']))
+    legacy = GradientBoostingRegressor(n_estimators=5).fit(X, sample_training_data['price'])
+    joblib.dump(legacy, f"{model_path}.joblib")
+
+    registry = ModelRegistry(model_path, reload_interval=0)
+    assert registry.load().model is not None
+    assert registry.snapshot.source == f"{model_path}.joblib"
+
+    manifest = ModelArtifactStore(model_path).save(
+        GradientBoostingRegressor(n_estimators=10).fit(X, sample_training_data['price'])
+    )
+    registry.current()
+    for _ in range(100):
+        if registry.snapshot.version == manifest['version']:
+            break
+        time.sleep(0.05)
+    assert registry.snapshot.version == manifest['version']
+    # The default engine serves the fitted estimator, the flat arrays are not even mapped
+    assert isinstance(registry.snapshot.model, GradientBoostingRegressor)
+    assert registry.snapshot.compiled is None
+
+def test_model_registry_maps_and_verifies_compiled_artifact(tmp_path, sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    y = sample_training_data['price']
+    model_path = str(tmp_path / "price_predictor")
+    store = ModelArtifactStore(model_path)
+    manifest = store.save(GradientBoostingRegressor(n_estimators=10).fit(X, y),
+                          IntervalModel.fit(X, y, {'n_estimators': 10}))
+
+    with patch('joblib.load', side_effect=AssertionError("unpickled")):
+        snapshot = ModelRegistry(model_path, inference_engine="compiled").load()
+    # Served straight from the shared pages, nothing was unpickled
+    assert isinstance(snapshot.model, CompiledEnsemble)
+    assert isinstance(snapshot.model.value, np.memmap)
+    assert snapshot.compiled is snapshot.model
+    assert isinstance(snapshot.compiled_intervals.lower.value, np.memmap)
+
+    # Arrays that no longer match the recorded predictions are never served
+    value_path = os.path.join(store.version_dir(manifest['version']), "model.value.npy")
+    np.save(value_path, np.load(value_path) + 1.0)
+    snapshot = ModelRegistry(model_path, inference_engine="compiled").load()
+    assert isinstance(snapshot.model, GradientBoostingRegressor)
+    assert not isinstance(snapshot.compiled.value, np.memmap)
+
+def test_model_artifact_resave_keeps_the_new_manifest(tmp_path, sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    model = GradientBoostingRegressor(n_estimators=5).fit(X, sample_training_data['price'])
+    store = ModelArtifactStore(str(tmp_path / "price_predictor"))
+    first = store.save(model, metrics={'r2': 0.4}, training_watermark={'spec_id': 10})
+    second = store.save(model, metrics={'r2': 0.5}, training_watermark={'spec_id': 20})
+
+    assert second['version'] == first['version']
+    manifest = store.manifest(first['version'])
+    assert manifest['metrics'] == {'r2': 0.5}
+    assert manifest['training_watermark'] == {'spec_id': 20}
+    assert manifest['verification'] is not None
+
+def test_model_artifact_store_prunes_old_versions(tmp_path, sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    y = sample_training_data['price']
+    store = ModelArtifactStore(str(tmp_path / "price_predictor"), retention=2)
+    versions = [
+        store.save(GradientBoostingRegressor(n_estimators=n).fit(X, y))['version']
+        for n in (3, 4, 5)
+    ]
+    assert store.versions() == versions[1:]
+    assert store.latest() == versions[-1]
+
+    # A rolled back LATEST survives pruning even when it is not among the newest
+    store._point_latest_at(versions[1])
+    assert store.prune(1) == []
+    assert store.versions() == versions[1:]
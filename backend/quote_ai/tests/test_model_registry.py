@@ -0,0 +1,45 @@
+from unittest.mock import patch
+import pandas as pd
+import os
+import time
+import joblib
+from quote_ai.services.ai_service import AIService
+from quote_ai.services.model_registry import ModelRegistry
+from sklearn.ensemble import GradientBoostingRegressor
+
+def test_model_registry_swaps_on_artifact_change(tmp_path, sample_training_data):
+    model_path = str(tmp_path / "price_predictor.joblib")
+    X = pd.get_dummies(sample_training_data.drop(columns=['price']))
+    first = GradientBoostingRegressor(n_estimators=5).fit(X, sample_training_data['price'])
+    joblib.dump(first, model_path)
+
+    registry = ModelRegistry(model_path, reload_interval=0)
+    snapshot = registry.load()
+    assert snapshot.source == model_path
+
+    second = GradientBoostingRegressor(n_estimators=10).fit(X, sample_training_data['price'])
+    joblib.dump(second, model_path)
+    os.utime(model_path, (snapshot.mtime + 10, snapshot.mtime + 10))
+
+    # The old snapshot keeps serving until the background reload swaps it
+    assert registry.current() is not None
+    for _ in range(100):
+        if registry.snapshot.version != snapshot.version:
+            break
+        time.sleep(0.05)
+    assert registry.snapshot.version != snapshot.version
+    assert registry.snapshot.model.n_estimators == 10
+
+def test_ai_service_shares_registry_model(settings, sample_training_data):
+    registry = ModelRegistry(settings.model_path)
+    X = pd.get_dummies(sample_training_data.drop(columns=['price']))
+    model = GradientBoostingRegressor(n_estimators=5).fit(X, sample_training_data['price'])
+    registry.publish(model)
+
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'), \
+         patch('joblib.load') as mock_load:
+        first = AIService(settings=settings, model_registry=registry)
+        second = AIService(settings=settings, model_registry=registry)
+        mock_load.assert_not_called()
+    assert first.model is model
+    assert second.model is model
@@ -0,0 +1,29 @@
+import pytest
+import asyncio
+from quote_ai.services.prediction_batcher import PredictionBatcher
+
+@pytest.mark.asyncio
+async def test_prediction_batcher_coalesces_concurrent_requests(ai_service):
+    ai_service.prediction_cache = None
+    batcher = PredictionBatcher(ai_service.predict_prices, max_batch_size=8, max_wait_ms=20)
+    specs = [
+        {'weight_per_meter': 1.0 + i, 'total_length': 100.0, 'machining_complexity': 'low',
+         'surface_treatment': 'raw', 'alloy': '6063'}
+        for i in range(20)
+    ]
+    results = await asyncio.gather(*(batcher.predict(spec) for spec in specs))
+
+    assert results == [ai_service.predict_price(spec) for spec in specs]
+    stats = batcher.stats()
+    assert stats['items'] == 20
+    assert stats['batches'] < 20
+    assert stats['queue_depth'] == 0
+
+@pytest.mark.asyncio
+async def test_prediction_batcher_isolates_bad_specs(ai_service):
+    batcher = PredictionBatcher(ai_service.predict_prices, max_batch_size=8, max_wait_ms=20)
+    good = {'weight_per_meter': 2.0, 'total_length': 50.0, 'machining_complexity': 'high',
+            'surface_treatment': 'painted', 'alloy': '6082'}
+    results = await asyncio.gather(batcher.predict(good), batcher.predict({}), return_exceptions=True)
+    assert results[0] == ai_service.predict_price(good)
+    assert isinstance(results[1], Exception)
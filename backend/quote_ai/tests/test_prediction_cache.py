@@ -0,0 +1,50 @@
+import pandas as pd
+from quote_ai.services.prediction_cache import PredictionCache
+from sklearn.ensemble import GradientBoostingRegressor
+
+def test_prediction_cache_hits_and_invalidates(ai_service, sample_training_data):
+    spec = {
+        'weight_per_meter': 2.5,
+        'total_length': 100.0,
+        'machining_complexity': 'medium',
+        'surface_treatment': 'anodized',
+        'alloy': '6060'
+    }
+    first = ai_service.predict_price(spec)
+    second = ai_service.predict_price(dict(spec, description='Same profile, new description'))
+    assert first == second
+    stats = ai_service.prediction_cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+    # Publishing a new model empties the cache
+    X = pd.get_dummies(sample_training_data.drop(columns=['price']))
+    ai_service.model = GradientBoostingRegressor(n_estimators=5).fit(X, sample_training_data['price'])
+    assert ai_service.prediction_cache.stats()['size'] == 0
+
+def test_prediction_cache_key_matches_the_encoding():
+    spec = {
+        'weight_per_meter': 2.5,
+        'total_length': 100.0,
+        'machining_complexity': 'medium',
+        'surface_treatment': 'anodized',
+        'alloy': '6060'
+    }
+    key = PredictionCache.make_key('v1', spec)
+    assert PredictionCache.make_key('v1', dict(spec, machining_complexity=2, total_length=100)) == key
+    # The encoder one-hot matches categories verbatim, so neither may the key fold them
+    assert PredictionCache.make_key('v1', dict(spec, surface_treatment='Anodized ')) != key
+    assert PredictionCache.make_key('v1', dict(spec, weight_per_meter=2.5000001)) != key
+
+def test_prediction_cache_lru_and_ttl():
+    cache = PredictionCache(maxsize=2, ttl=60.0)
+    cache.put(('v1', 'a'), {'predicted_price': 1.0})
+    cache.put(('v1', 'b'), {'predicted_price': 2.0})
+    assert cache.get(('v1', 'a')) == {'predicted_price': 1.0}
+    cache.put(('v1', 'c'), {'predicted_price': 3.0})
+    assert cache.get(('v1', 'b')) is None
+    assert cache.stats()['evictions'] == 1
+
+    expired = PredictionCache(maxsize=2, ttl=-1.0)
+    expired.put(('v1', 'a'), {'predicted_price': 1.0})
+    assert expired.get(('v1', 'a')) is None
@@ -0,0 +1,27 @@
+import numpy as np
+import os
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.feature_encoder import FeatureEncoder
+from quote_ai.services.prediction_intervals import IntervalModel, interval_path_for
+
+def test_interval_model_brackets_predictions(sample_training_data):
+    encoder = FeatureEncoder.default()
+    X = encoder.to_frame(encoder.encode_frame(sample_training_data))
+    y = sample_training_data['price']
+    intervals = IntervalModel.fit(X, y, {'n_estimators': 20, 'max_depth': 2})
+
+    rows = encoder.encode_frame(sample_training_data)
+    lower, upper = intervals.predict(rows)
+    assert np.all(lower <= upper)
+    assert intervals.coverage(rows, y) > 0.5
+    confidence = intervals.confidence((lower + upper) / 2, lower, upper)
+    assert np.all((confidence >= 0) & (confidence <= 1))
+
+def test_model_training_writes_interval_companions(model_training_service, sample_training_data):
+    result = model_training_service.train_model(sample_training_data)
+    assert 0.0 <= result['interval_coverage'] <= 1.0
+    assert os.path.exists(interval_path_for(model_training_service.model_path))
+
+    registry = ModelRegistry(model_training_service.model_path)
+    snapshot = registry.load()
+    assert snapshot.intervals is not None
@@ -0,0 +1,42 @@
+from quote_ai.services.ai_service import AIService
+
+def test_prompt_builder_keeps_quote_prompt_within_budget(settings):
+    from quote_ai.services.prompt_builder import PromptBuilder
+    from quote_ai.services.tokens import count_tokens
+    prompt = (
+        PromptBuilder(60)
+        .add("details", "Alloy 6060, 120 m", trimmable=False)
+        .add("notes", "Note " * 200, priority=1)
+        .add("instructions", "Write a quote.", static=True, trimmable=False)
+        .add("history", "Earlier mail " * 200, priority=0)
+        .build()
+    )
+    # Static text leads, the lowest priority section goes before the next one is touched
+    assert prompt.text.startswith("Write a quote.\n\nAlloy 6060, 120 m")
+    assert prompt.dropped == ("history",) and prompt.trimmed == ("notes",)
+    assert "tokens omitted" in prompt.text and "Earlier mail" not in prompt.text
+    assert prompt.tokens <= 60 and prompt.tokens == count_tokens(prompt.text)
+
+    service = AIService(settings=settings.model_copy(update={'quote_prompt_max_tokens': 400}))
+    quote_data = {
+        'customer': {'company_name': 'Test Company'},
+        'product_specs': {'alloy': '6063', 'total_length': 120},
+        'communication_context': {'context_text': "We discussed delivery options at length. " * 500},
+        'predicted_price': 1000.0, 'final_price': 1010.0, 'price_confidence': 0.9
+    }
+    text = service._prepare_quote_prompt(quote_data)
+    assert text.startswith("Generate a professional quote document")
+    assert count_tokens(text) <= 400
+    assert "Final Price (including margin): 1010.00 SEK" in text and "Alloy: 6063" in text
+    assert "tokens omitted" in text
+
+def test_unpriced_quote_prompt_prices_for_the_customer(ai_service):
+    from unittest.mock import patch
+    quote_data = {'customer_id': 7, 'product_specs': {'alloy': '6063', 'total_length': 120}}
+    prediction = {'predicted_price': 1000.0, 'confidence': 0.9}
+    with patch.object(ai_service, 'predict_price', return_value=prediction) as predict_price:
+        text = ai_service._prepare_quote_prompt(quote_data)
+    # Priced from the same request as _price_quote, customer included
+    assert predict_price.call_args.args[0] == AIService._price_data(quote_data)
+    assert predict_price.call_args.args[0]['customer_id'] == 7
+    assert "Predicted Base Price: 1000.00 SEK" in text
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from datetime import datetime
+import uuid
+from quote_ai.core.models import Quote
+
+def test_similar_quotes_are_indexed_on_create_and_searchable(db_session, sample_customer, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from quote_ai.api.routers import quotes
+    from quote_ai.db.database import get_db
+    from quote_ai.services.quote_index import HashingEmbedder, QuoteIndex
+
+    embedder = HashingEmbedder(256)
+    assert embedder.embed(["anodized window frame"]) == embedder.embed(["anodized window frame"])
+    customer_id = sample_customer.id
+
+    app = FastAPI()
+    app.include_router(quotes.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: db_session
+    index = QuoteIndex(str(tmp_path / "index"), embedder)
+    requests = [
+        ("Window frame", "hollow", "anodized", "Window frames for the school renovation", 12500.0),
+        ("Heat sink", "solid", "raw", "Heat sinks for power electronics, tight flatness tolerance", 48000.0),
+        ("Door frame", "hollow", "painted", "Door frames in RAL 9010 for the office building", 15300.0),
+    ]
+    created = []
+    with patch('quote_ai.services.quote_index._quote_index', index), TestClient(app) as client:
+        for i, (description, profile, surface, context, price) in enumerate(requests):
+            response = client.post("/api/quotes/", json={
+                "title": description, "reference_number": f"SIM-{uuid.uuid4().hex[:8]}",
+                "validity_date": datetime.now().isoformat(), "customer_id": customer_id,
+                "final_price": price, "status": "approved",
+                "product_specs": {
+                    "description": description, "profile_type": profile, "alloy": "6063",
+                    "weight_per_meter": 1.0 + i, "total_length": 100.0,
+                    "surface_treatment": surface, "machining_complexity": "medium"
+                },
+                "communication_context": {"context_text": context}
+            })
+            assert response.status_code == 200
+            created.append(response.json()['id'])
+        assert index.stats()['entries'] == 3
+
+        response = client.post("/api/quotes/similar", json={
+            "text": "anodized window frames for a school", "k": 2
+        })
+        assert response.status_code == 200
+        hits = response.json()
+        assert [hit['quote_id'] for hit in hits][0] == created[0] and len(hits) == 2
+        assert hits[0]['final_price'] == 12500.0 and hits[0]['similarity'] > hits[1]['similarity']
+
+        response = client.get(f"/api/quotes/{created[2]}/similar", params={"k": 1})
+        assert [hit['quote_id'] for hit in response.json()] == [created[0]]
+        assert client.post("/api/quotes/similar", json={"k": 2}).status_code == 400
+        assert client.get("/api/quotes/abc/similar").status_code == 400
+
+        # Price changes reach the index, deleted quotes leave it
+        client.put(f"/api/quotes/{created[0]}", json={"final_price": 13000.0})
+        client.delete(f"/api/quotes/{created[1]}")
+        hits = index.search("window frame", k=3)
+        assert hits[0]['final_price'] == 13000.0 and created[1] not in [hit['quote_id'] for hit in hits]
+
+    rebuilt = QuoteIndex(str(tmp_path / "rebuilt"), embedder)
+    assert rebuilt.rebuild(db_session, batch_size=1) == db_session.query(Quote).count()
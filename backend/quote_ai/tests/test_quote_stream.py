@@ -0,0 +1,64 @@
+import pytest
+import json
+from unittest.mock import patch
+from quote_ai.services.ai_service import AIService
+from quote_ai.core.models import Quote
+
+def test_generate_stream_relays_tokens_and_saves_quote(settings, db_session, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from quote_ai.api.routers import quotes
+    from sqlalchemy.orm import sessionmaker
+    from quote_ai.core.models import Customer
+
+    customer = Customer(company_name="Stream AB")
+    db_session.add(customer)
+    db_session.commit()
+    customer_id = customer.id
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'):
+        service = AIService(settings=settings)
+    app = FastAPI()
+    app.include_router(quotes.router, prefix="/api")
+    # The stream saves through a session of its own, make sure it is closed afterwards
+    sessions = []
+    session_factory = sessionmaker(bind=db_session.get_bind())
+
+    def open_session():
+        sessions.append(session_factory())
+        return sessions[-1]
+
+    request = {
+        "customer_id": customer_id,
+        "product_specs": {
+            "description": "Window frame", "profile_type": "hollow", "alloy": "6063",
+            "weight_per_meter": 2.5, "total_length": 120.0,
+            "surface_treatment": "anodized", "machining_complexity": "medium"
+        },
+        "communication_context": {"context_text": "Needed before May"}
+    }
+    from quote_ai.services.quote_index import HashingEmbedder, QuoteIndex
+    index = QuoteIndex(str(tmp_path / "index"), HashingEmbedder(64))
+    with patch.object(quotes, '_ai_service', service), patch.object(quotes, 'SessionLocal', open_session), \
+         patch('quote_ai.services.quote_index._quote_index', index), TestClient(app) as client:
+        with client.stream("POST", "/api/quotes/generate/stream", json=request) as response:
+            assert response.status_code == 200
+            assert response.headers['content-type'].startswith('text/event-stream')
+            body = "".join(response.iter_text())
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    tokens = [data['text'] for event, data in events if event == 'token']
+    assert len(tokens) > 1 and "".join(tokens) == "This is a test quote text"
+    event, done = events[-1]
+    assert event == 'done' and done['quote_text'] == "This is a test quote text"
+
+    assert len(sessions) == 1 and not sessions[0].in_transaction()
+    quote = db_session.get(Quote, done['quote_id'])
+    assert quote.quote_text == done['quote_text'] and quote.status == "draft"
+    assert quote.customer_id == customer_id
+    assert quote.final_price == pytest.approx(done['final_price']) and quote.final_price > quote.predicted_price
+    assert [spec.alloy for spec in quote.product_specs] == ["6063"]
+    assert quote.communication_contexts[0].context_text == "Needed before May"
+    assert [hit['quote_id'] for hit in index.search("anodized window frame", k=1)] == [quote.id]
@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+from quote_ai.services.ai_service import AIService
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.feature_encoder import FeatureEncoder, predict_encoded
+from quote_ai.services.model_artifact import ModelArtifactStore
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+
+def test_feature_encoder_decode_round_trips(sample_training_data):
+    one_hot = FeatureEncoder.default().encode_frame(sample_training_data)
+    specs = FeatureEncoder.default().decode_frame(one_hot)
+    np.testing.assert_array_equal(FeatureEncoder.ordinal().encode_frame(specs),
+                                  FeatureEncoder.ordinal().encode_frame(sample_training_data))
+
+def test_shadow_model_scores_live_traffic(settings, tmp_path, sample_training_data):
+    model_path = str(tmp_path / "price_predictor")
+    store = ModelArtifactStore(model_path)
+    y = sample_training_data['price']
+    ordinal = FeatureEncoder.ordinal()
+    candidate = HistGradientBoostingRegressor(max_iter=20, categorical_features=ordinal.categorical_mask)
+    shadow_version = store.save(candidate.fit(ordinal.to_frame(ordinal.encode_frame(sample_training_data)), y))['version']
+    X = pd.get_dummies(sample_training_data.drop(columns=['price']))
+    store.save(GradientBoostingRegressor(n_estimators=5).fit(X, y))
+
+    registry = ModelRegistry(model_path)
+    registry.load()
+    with pytest.raises(FileNotFoundError):
+        registry.load_shadow_version("../price_predictor")
+    registry.load_shadow_version(shadow_version)
+    with patch('quote_ai.services.ai_service.AsyncOpenAI'):
+        service = AIService(settings=settings, model_registry=registry)
+    specs = sample_training_data.drop(columns=['price']).head(20)
+    live = service.predict_frame(specs)['predicted_price']
+    service.predict_price(specs.iloc[0].to_dict())
+    assert registry.shadow_scorer.join()
+
+    status = registry.shadow_status()
+    comparison = status['comparison']
+    assert status['loaded'] and status['dropped'] == 0
+    assert comparison['shadow_version'] == shadow_version
+    assert comparison['rows'] == 21 and comparison['errors'] == 0
+    shadow_prices = predict_encoded(registry.shadow.model, ordinal.encode_frame(specs))
+    expected = np.abs(np.append(shadow_prices - live, shadow_prices[0] - live[0])).mean()
+    assert comparison['mean_abs_diff'] == pytest.approx(expected)
+
+    registry.clear_shadow()
+    service.predict_frame(specs)
+    assert registry.shadow_status()['submitted'] == 2
@@ -0,0 +1,78 @@
+import uuid
+from unittest.mock import patch
+from datetime import datetime
+from quote_ai.services.feature_encoder import FeatureEncoder
+from quote_ai.services.training_data_export import TrainingDataExporter
+from quote_ai.core.models import Quote, ProductSpecification
+from datetime import timedelta
+
+def test_training_data_export_is_incremental(tmp_path, db_session):
+    for i in range(5):
+        quote = Quote(title=f"Quote {i}", reference_number=f"EXPORT-{i}",
+                      status="approved" if i % 2 == 0 else "draft", final_price=1000.0 + i)
+        quote.product_specs = [ProductSpecification(
+            alloy="6060" if i % 3 else "6082", weight_per_meter=2.0, total_length=100.0 + i,
+            surface_treatment="anodized", machining_complexity="high"
+        )]
+        db_session.add(quote)
+    db_session.commit()
+
+    exporter = TrainingDataExporter(str(tmp_path / "export"), chunk_size=2)
+    assert exporter.export(db_session)['rows_exported'] == 3
+    assert exporter.export(db_session)['rows_exported'] == 0
+
+    # A quote approved after the last export is picked up by the next one
+    quote = db_session.query(Quote).filter_by(reference_number="EXPORT-1").one()
+    quote.status = "approved"
+    quote.updated_at = datetime.utcnow() + timedelta(seconds=1)
+    db_session.commit()
+    stats = exporter.export(db_session)
+    assert stats['rows_exported'] == 1
+    assert stats['rows_total'] == 4
+
+    df = exporter.load_frame()
+    assert sorted(df['price']) == [1000.0, 1001.0, 1002.0, 1004.0]
+    assert set(df['alloy']) == {'6060', '6082'}
+    assert (df['machining_complexity'] == 3).all()
+    assert df['is_final'].all()
+    assert FeatureEncoder.default().encode_frame(df).shape == (4, FeatureEncoder.default().n_features)
+
+def test_training_data_export_picks_up_quotes_approved_through_the_api(tmp_path, db_session, sample_customer):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from quote_ai.api.routers import quotes
+    from quote_ai.db.database import get_db
+
+    app = FastAPI()
+    app.include_router(quotes.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: db_session
+    quote_ids = []
+    with patch('quote_ai.api.routers.quotes.index_snapshot'), TestClient(app) as client:
+        for i in range(3):
+            response = client.post("/api/quotes/", json={
+                "title": f"Profile {i}", "reference_number": f"FLOW-{uuid.uuid4().hex[:8]}",
+                "validity_date": datetime.now().isoformat(), "customer_id": sample_customer.id,
+                "final_price": 2000.0 + i,
+                "product_specs": {
+                    "description": f"Profile {i}", "profile_type": "hollow",
+                    "alloy": "6063", "weight_per_meter": 1.5 + i, "total_length": 200.0,
+                    "surface_treatment": "anodized", "machining_complexity": "low"
+                },
+                "communication_context": {"context_text": "Standard delivery"}
+            })
+            assert response.status_code == 200
+            assert response.json()['status'] == "draft"
+            quote_ids.append(response.json()['id'])
+
+        exporter = TrainingDataExporter(str(tmp_path / "export"))
+        # Drafts are not training data
+        assert exporter.export(db_session)['rows_exported'] == 0
+
+        for quote_id in quote_ids[:2]:
+            response = client.put(f"/api/quotes/{quote_id}", json={"status": "approved"})
+            assert response.status_code == 200
+
+    assert exporter.export(db_session)['rows_exported'] == 2
+    df = exporter.load_frame()
+    assert sorted(df['quote_id']) == sorted(quote_ids[:2])
+    assert sorted(df['price']) == [2000.0, 2001.0]
@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+import time
+from quote_ai.services.model_registry import ModelRegistry
+from quote_ai.services.training_jobs import TrainingJobManager
+from quote_ai.services.model_training import ModelTrainingError
+from quote_ai.core.models import Quote, ProductSpecification
+from quote_ai.services.model_training import ModelTrainingService
+from quote_ai.utils.config import Settings
+
+def test_training_job_publishes_to_registry(tmp_path, db_session):
+    rng = np.random.default_rng(0)
+    for i in range(60):
+        weight, length = rng.uniform(1.0, 5.0), rng.uniform(50, 500)
+        quote = Quote(title=f"Quote {i}", reference_number=f"JOB-{i}", status="approved",
+                      final_price=float(weight * length * 6))
+        quote.product_specs = [ProductSpecification(
+            alloy=str(rng.choice(['6060', '6063', '6082'])), weight_per_meter=weight, total_length=length,
+            surface_treatment=str(rng.choice(['anodized', 'painted', 'raw'])), machining_complexity="medium"
+        )]
+        db_session.add(quote)
+    db_session.commit()
+
+    settings = Settings(openai_api_key="test_key", model_path=str(tmp_path / "price_predictor"),
+                        training_export_dir=str(tmp_path / "export"), database_url="sqlite:///./test.db")
+    ModelTrainingService(settings).export_training_data(db_session)
+    registry = ModelRegistry(settings.model_path)
+    manager = TrainingJobManager(settings, registry)
+    try:
+        job = manager.submit({'search': 'halving_random', 'estimator': 'hist_gradient_boosting'})
+        failing = manager.submit({'search': 'exhaustive'})
+        for _ in range(600):
+            if job.finished and failing.finished:
+                break
+            time.sleep(0.1)
+    finally:
+        manager.shutdown()
+
+    assert job.status == "succeeded", job.error
+    assert job.metrics['estimator'] == 'hist_gradient_boosting'
+    assert registry.snapshot.version == job.model_version
+    assert manager.get(job.id).to_dict()['progress'] == 1.0
+    assert failing.status == "failed"
+    assert "Unsupported search strategy" in failing.error
+
+def test_ai_service_train_model_raises_domain_error(ai_service, tmp_path):
+    with pytest.raises(ModelTrainingError):
+        ai_service.train_model(str(tmp_path / "missing.csv"))
@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str = ""
+    openai_model: str = "gpt-4"
     
     # Ollama Configuration
     ollama_base_url: str = "http://localhost:11434"
@@ -15,7 +16,32 @@ class Settings(BaseSettings):
     database_url: str = "sqlite:///./quotes.db"
     
     # Model Configuration
-    model_path: str = "models/price_predictor.joblib"
+    model_path: str = "models/price_predictor"  # versioned artifact directory, a .joblib file also works
+    model_reload_interval: float = 5.0  # seconds between artifact mtime checks
+    # Can be "sklearn" or "compiled". Only "compiled" serves artifacts from memory-mapped arrays that
+    # workers share; "sklearn" unpickles a private copy of the model per worker but is faster on big batches.
+    inference_engine: str = "sklearn"
+    model_artifact_retention: int = 10  # artifact versions kept on disk, 0 keeps them all
+    prediction_cache_size: int = 4096  # 0 disables the prediction cache
+    prediction_cache_ttl: float = 900.0  # seconds
+    prediction_batch_window_ms: float = 2.0  # 0 disables micro-batching
+    prediction_batch_max_size: int = 64
+    shadow_model_path: Optional[str] = None  # candidate model scored next to the live one, never served
+    shadow_queue_size: int = 1024  # pending shadow batches, more are dropped
+    training_export_dir: str = "data/training_export"
+    training_export_chunk_size: int = 5000  # rows per server-side cursor fetch and per part file
+    training_search: str = "grid"  # Can be "grid", "halving_grid" or "halving_random"
+    training_estimator: str = "gradient_boosting"  # Can be "gradient_boosting" or "hist_gradient_boosting"
+    training_max_concurrent_jobs: int = 1
+    training_cpu_budget: int = 1  # CPUs one training job may use, keep it below the host's count
+    training_incremental_mode: str = "warm_start"  # Can be "warm_start" or "window"
+    training_warm_start_rounds: int = 50  # boosting rounds added by each warm start retrain
+    training_window_rows: int = 50000  # most recent finalized quotes a window retrain refits on
+    training_holdout_fraction: float = 0.2  # newest share of the new quotes held out to gate promotion
+    training_max_regression: float = 0.0  # relative holdout RMSE increase still promoted
+    training_customer_features: bool = False  # train on per-customer aggregates as of each quote
+    customer_feature_cache_ttl: float = 60.0  # seconds before another worker's feature updates are seen
+    customer_feature_cache_size: int = 100000  # customers kept in the in-process feature cache
     
     # Security Configuration
     secret_key: str = "your_secret_key_here"
@@ -25,6 +51,28 @@ class Settings(BaseSettings):
     
     # AI Provider Configuration
     ai_provider: str = "openai"  # Can be "openai" or "ollama"
+    llm_max_connections: int = 100  # pooled connections per provider
+    llm_max_connections_per_host: int = 20
+    llm_keepalive_seconds: float = 30.0  # idle pooled connections are closed after this
+    llm_request_timeout: float = 60.0  # seconds
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "data/llm_cache.sqlite3"
+    llm_cache_ttl: float = 604800.0  # seconds, a week
+    llm_cache_max_entries: int = 10000  # least recently read completions are evicted beyond this
+    llm_cache_nondeterministic: bool = False  # also cache sampled (temperature > 0) completions
+    llm_max_concurrency_openai: int = 8  # calls in flight per provider, more wait in the queue
+    llm_max_concurrency_ollama: int = 2  # a local Ollama serves only a few generations at once
+    llm_max_queue: int = 32  # calls waiting per provider before new ones get a 503
+    llm_queue_timeout: float = 30.0  # seconds a call may wait for a slot
+    llm_max_attempts: int = 3  # tries per call, transient failures only
+    llm_backoff_base: float = 0.5  # seconds, doubled per retry with full jitter
+    llm_backoff_max: float = 8.0
+    llm_breaker_failures: int = 5  # consecutive transient failures that open the circuit
+    llm_breaker_reset_seconds: float = 30.0  # how long an open circuit refuses calls
+    context_chunk_tokens: int = 3000  # document tokens per context extraction call
+    context_max_concurrent_chunks: int = 4  # chunks of one document extracted at once
+    extraction_prompt_max_tokens: int = 4000  # context extraction prompt budget, room for one chunk
+    quote_prompt_max_tokens: int = 2000  # quote text prompt budget, the communication context is trimmed first
     
     # Rate Limiting Configuration
     rate_limit_enabled: bool = True
@@ -42,8 +90,9 @@ class Settings(BaseSettings):
     
     # Vector Database Configuration
     vector_dimension: int = 1536
-    vector_index_type: str = "ivfflat"
-    vector_index_lists: int = 100
+    quote_index_path: str = "data/quote_index"  # local Chroma store of past quote embeddings
+    embedding_provider: str = "hashing"  # Can be "hashing" (offline, deterministic) or "openai"
+    embedding_model: str = "text-embedding-ada-002"  # OpenAI embedding model, 1536 dimensions
     
     class Config:
         env_file = ".env"